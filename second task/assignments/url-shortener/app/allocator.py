@@ -0,0 +1,593 @@
+import os
+import queue
+import hashlib
+import sqlite3
+import threading
+import logging
+from typing import List
+from .config import Config
+from .utils import SAFE_CHARS
+
+logger = logging.getLogger(__name__)
+
+BASE = len(SAFE_CHARS)
+
+# Code counter kept in WAL_DIR when the write-ahead log is the durable store
+LEASE_FILE = 'code_space.db'
+
+
+def encode_code(number: int, length: int = 6) -> str:
+    """
+    Encode a non-negative integer into the short code alphabet.
+
+    Args:
+        number (int): The integer to encode
+        length (int): Minimum length of the code, left-padded (default: 6)
+
+    Returns:
+        str: The encoded short code
+    """
+    if number < 0:
+        raise ValueError("Cannot encode a negative number")
+
+    chars = []
+    while number:
+        number, remainder = divmod(number, BASE)
+        chars.append(SAFE_CHARS[remainder])
+
+    while len(chars) < length:
+        chars.append(SAFE_CHARS[0])
+
+    return ''.join(reversed(chars))
+
+
+def decode_code(code: str) -> int:
+    """
+    Decode a short code back into the integer it was encoded from.
+
+    Args:
+        code (str): The short code
+
+    Returns:
+        int: The decoded integer
+    """
+    number = 0
+    for char in code:
+        number = number * BASE + SAFE_CHARS.index(char)
+    return number
+
+
+def content_code(canonical_url: str, length: int = 6) -> str:
+    """
+    Derive a deterministic short code from a canonical URL.
+
+    The same URL always maps to the same code, which keeps deduplicated links
+    stable. Different URLs can hash to the same code, so callers must be
+    prepared to fall back to an allocated code.
+
+    Args:
+        canonical_url (str): The canonicalized URL
+        length (int): Length of the code (default: 6)
+
+    Returns:
+        str: The content-addressed short code
+    """
+    digest = hashlib.blake2b(canonical_url.encode('utf-8'), digest_size=16).digest()
+    return encode_code(int.from_bytes(digest, 'big') % BASE ** length, length)
+
+
+class FeistelPermutation:
+    """
+    Keyed bijection over the integers [0, domain).
+
+    An alternating Feistel network permutes the smallest bit space that covers
+    the domain, each round xoring one half with a keyed function of the other
+    (so the halves may differ in width by a bit). Values that land outside the
+    domain are fed through the network again (cycle walking) until they fall
+    inside it. Every step is a bijection, so distinct inputs always produce
+    distinct outputs.
+
+    The round function is a keyed 64-bit mixer rather than a cryptographic
+    hash: the goal is codes that cannot be enumerated by incrementing, at a
+    per-code cost comparable to the random generator it replaces.
+    """
+
+    ROUNDS = 4
+    _MASK64 = (1 << 64) - 1
+
+    def __init__(self, domain: int, key: bytes):
+        if domain < 2:
+            raise ValueError("Permutation domain must contain at least two values")
+
+        self.domain = domain
+        bits = (domain - 1).bit_length()
+        self._right_bits = bits // 2
+        self._right_mask = (1 << self._right_bits) - 1
+        self._left_mask = (1 << (bits - self._right_bits)) - 1
+        self._round_keys = [
+            int.from_bytes(hashlib.blake2b(bytes((i,)), key=key[:64], digest_size=8).digest(), 'big')
+            for i in range(self.ROUNDS)
+        ]
+
+    def _mix(self, value: int, round_key: int) -> int:
+        # splitmix64 finalizer over the keyed input
+        x = (value ^ round_key) * 0xBF58476D1CE4E5B9 & self._MASK64
+        x = (x ^ (x >> 27)) * 0x94D049BB133111EB & self._MASK64
+        return x ^ (x >> 31)
+
+    def _encrypt(self, value: int) -> int:
+        left = value >> self._right_bits
+        right = value & self._right_mask
+        for i, round_key in enumerate(self._round_keys):
+            if i % 2:
+                right ^= self._mix(left, round_key) & self._right_mask
+            else:
+                left ^= self._mix(right, round_key) & self._left_mask
+        return (left << self._right_bits) | right
+
+    def permute(self, value: int) -> int:
+        """
+        Map a value to its image under the permutation.
+
+        Args:
+            value (int): Value in [0, domain)
+
+        Returns:
+            int: Permuted value in [0, domain)
+        """
+        if not 0 <= value < self.domain:
+            raise ValueError(f"Value {value} outside permutation domain")
+
+        value = self._encrypt(value)
+        while value >= self.domain:
+            value = self._encrypt(value)
+        return value
+
+
+class SequenceAllocator:
+    """
+    Thread-safe short code allocator backed by a monotonic counter.
+
+    Every call hands out the next integer of the sequence encoded into the
+    short code alphabet, so codes are unique by construction and no snapshot
+    of the existing codes is needed to avoid collisions. When a permutation
+    is supplied the sequence number is scrambled before encoding, which keeps
+    codes unique while making them look random.
+
+    Codes can still be taken already, e.g. by imported links or content
+    codes in dedupe mode. The insert itself detects that, so next_code does
+    no lookup; once a code has collided, next_unused_code skips the codes
+    is_used (the store's contains) reports as taken.
+    """
+
+    def __init__(self, length: int = 6, start: int = 0, permutation: FeistelPermutation = None,
+                 is_used=None):
+        self.length = length
+        self.permutation = permutation
+        self.is_used = is_used
+        self._next = start
+        self._lock = threading.Lock()
+        logger.info(f"{type(self).__name__} initialized (length={length}, start={start}, "
+                    f"permuted={permutation is not None})")
+
+    def _next_id(self) -> int:
+        """
+        Reserve the next sequence number.
+
+        Returns:
+            int: The reserved sequence number
+        """
+        with self._lock:
+            number = self._next
+            self._next += 1
+            return number
+
+    def _next_ids(self, count: int) -> range:
+        """
+        Reserve the next count sequence numbers in one lock acquisition.
+
+        Args:
+            count (int): Number of sequence numbers to reserve
+
+        Returns:
+            range: The reserved sequence numbers
+        """
+        with self._lock:
+            start = self._next
+            self._next += count
+            return range(start, start + count)
+
+    def _encode(self, number: int) -> str:
+        if self.permutation is not None:
+            if number >= self.permutation.domain:
+                logger.error(f"Short code space of length {self.length} exhausted")
+                raise Exception("Short code space exhausted")
+            number = self.permutation.permute(number)
+
+        return encode_code(number, self.length)
+
+    def _skip_used(self, codes: List[str]) -> List[str]:
+        """Replace codes that are already stored with fresh ones."""
+        if self.is_used is None:
+            return codes
+        fresh = [code for code in codes if not self.is_used(code)]
+        skipped = len(codes) - len(fresh)
+        while len(fresh) < len(codes):
+            batch = [self._encode(number) for number in self._next_ids(len(codes) - len(fresh))]
+            unused = [code for code in batch if not self.is_used(code)]
+            skipped += len(batch) - len(unused)
+            fresh.extend(unused)
+        if skipped:
+            logger.info(f"Skipped {skipped} allocated codes already in use")
+        return fresh
+
+    def next_code(self) -> str:
+        """
+        Allocate the next short code.
+
+        Returns:
+            str: A short code that has never been handed out by this allocator
+        """
+        return self._encode(self._next_id())
+
+    def next_codes(self, count: int) -> List[str]:
+        """
+        Allocate several short codes at once.
+
+        Args:
+            count (int): Number of codes to allocate
+
+        Returns:
+            list: count short codes that have never been handed out by this allocator
+        """
+        return [self._encode(number) for number in self._next_ids(count)]
+
+    def next_unused_code(self) -> str:
+        """
+        Allocate the next short code that is not already stored.
+
+        Used to retry after a collision, when the codes that follow are
+        likely taken too.
+
+        Returns:
+            str: A short code not handed out before and not in use
+        """
+        return self.next_unused_codes(1)[0]
+
+    def next_unused_codes(self, count: int) -> List[str]:
+        """
+        Allocate several short codes that are not already stored.
+
+        Args:
+            count (int): Number of codes to allocate
+
+        Returns:
+            list: count short codes not handed out before and not in use
+        """
+        return self._skip_used(self.next_codes(count))
+
+
+class BlockLeaseAllocator(SequenceAllocator):
+    """
+    Allocator that mints codes from blocks leased from a shared SQLite file.
+
+    Each process (e.g. a gunicorn worker) leases a contiguous block of
+    sequence numbers from the lease table and hands them out locally without
+    further coordination, so workers never mint the same code and the
+    coordinator is only touched once per block.
+    """
+
+    def __init__(self, lease_path: str, block_size: int = 1000, length: int = 6,
+                 permutation: FeistelPermutation = None):
+        if block_size < 1:
+            raise ValueError("Block size must be positive")
+
+        self.lease_path = lease_path
+        self.block_size = block_size
+        self._block_end = 0
+        init_lease_table(lease_path)
+        super().__init__(length=length, permutation=permutation)
+
+    def _lease_block(self):
+        """
+        Lease the next block of sequence numbers from the coordinator.
+        Must be called with self._lock held.
+        """
+        conn = _connect_lease_db(self.lease_path)
+        try:
+            # BEGIN IMMEDIATE takes the database write lock up front, so
+            # concurrent workers serialize on the read-modify-write below
+            conn.execute('BEGIN IMMEDIATE')
+            start = conn.execute('SELECT next_id FROM code_space WHERE id = 0').fetchone()[0]
+            conn.execute('UPDATE code_space SET next_id = ? WHERE id = 0',
+                         (start + self.block_size,))
+            conn.execute('COMMIT')
+        finally:
+            conn.close()
+
+        self._next = start
+        self._block_end = start + self.block_size
+        logger.info(f"Leased code block [{start}, {self._block_end}) from {self.lease_path}")
+
+    def _next_id(self) -> int:
+        with self._lock:
+            if self._next >= self._block_end:
+                self._lease_block()
+            number = self._next
+            self._next += 1
+            return number
+
+    def _next_ids(self, count: int) -> List[int]:
+        numbers = []
+        with self._lock:
+            while len(numbers) < count:
+                if self._next >= self._block_end:
+                    self._lease_block()
+                take = min(count - len(numbers), self._block_end - self._next)
+                numbers.extend(range(self._next, self._next + take))
+                self._next += take
+        return numbers
+
+
+class CodePool:
+    """
+    Bounded queue of pre-generated short codes kept full by a background thread.
+
+    Requests pop a ready code instead of generating one inline. When the pool
+    drains to the low watermark the refill thread is woken and tops it back
+    up to the high watermark; if the pool is ever empty, the caller falls
+    back to minting a code directly so requests never block on the refill.
+    """
+
+    def __init__(self, allocator: SequenceAllocator, low_watermark: int = 100,
+                 high_watermark: int = 1000):
+        if not 0 <= low_watermark < high_watermark:
+            raise ValueError("Pool watermarks must satisfy 0 <= low < high")
+
+        self.allocator = allocator
+        self.low_watermark = low_watermark
+        self.high_watermark = high_watermark
+        self._queue = queue.Queue(maxsize=high_watermark)
+        self._refill_needed = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._metrics_lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._refills = 0
+        logger.info(f"CodePool initialized (low={low_watermark}, high={high_watermark})")
+
+    def start(self):
+        """Start the background refill thread and fill the pool."""
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._refill_loop, name='code-pool-refill',
+                                        daemon=True)
+        self._thread.start()
+        self._refill_needed.set()
+
+    def stop(self):
+        """Stop the background refill thread."""
+        if self._thread is None:
+            return
+        self._stopped.set()
+        self._refill_needed.set()
+        self._thread.join()
+        self._thread = None
+
+    def _refill_loop(self):
+        while True:
+            self._refill_needed.wait()
+            if self._stopped.is_set():
+                return
+            self._refill_needed.clear()
+
+            added = 0
+            while not self._stopped.is_set() and self._queue.qsize() < self.high_watermark:
+                try:
+                    self._queue.put_nowait(self.allocator.next_code())
+                    added += 1
+                except queue.Full:
+                    break
+                except Exception as e:
+                    logger.error(f"Code pool refill failed: {str(e)}")
+                    break
+
+            with self._metrics_lock:
+                self._refills += 1
+            logger.debug(f"Code pool refilled with {added} codes")
+
+    def next_code(self) -> str:
+        """
+        Take a pre-generated code from the pool.
+
+        Returns:
+            str: A short code
+        """
+        try:
+            code = self._queue.get_nowait()
+            hit = True
+        except queue.Empty:
+            code = self.allocator.next_code()
+            hit = False
+
+        with self._metrics_lock:
+            if hit:
+                self._hits += 1
+            else:
+                self._misses += 1
+
+        if self._queue.qsize() <= self.low_watermark:
+            self._refill_needed.set()
+
+        return code
+
+    def next_codes(self, count: int) -> List[str]:
+        """
+        Take several codes, from the pool while it lasts and minted directly
+        for the rest.
+
+        Args:
+            count (int): Number of codes
+
+        Returns:
+            list: count short codes
+        """
+        codes = []
+        try:
+            while len(codes) < count:
+                codes.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        hits = len(codes)
+        if hits < count:
+            codes.extend(self.allocator.next_codes(count - hits))
+
+        with self._metrics_lock:
+            self._hits += hits
+            self._misses += count - hits
+
+        if self._queue.qsize() <= self.low_watermark:
+            self._refill_needed.set()
+
+        return codes
+
+    def next_unused_code(self) -> str:
+        """
+        Allocate a code that is not already stored, bypassing the pool.
+
+        Pooled codes were minted ahead of the collision that triggered the
+        retry and are likely taken too, so they are left for later requests.
+
+        Returns:
+            str: A short code not in use
+        """
+        return self.allocator.next_unused_code()
+
+    def next_unused_codes(self, count: int) -> List[str]:
+        """
+        Allocate several codes that are not already stored, bypassing the pool.
+
+        Args:
+            count (int): Number of codes
+
+        Returns:
+            list: count short codes not in use
+        """
+        return self.allocator.next_unused_codes(count)
+
+    def get_metrics(self) -> dict:
+        """
+        Get fill-level and usage metrics for the pool.
+
+        Returns:
+            dict: Current size, watermarks and hit/miss/refill counters
+        """
+        with self._metrics_lock:
+            return {
+                'size': self._queue.qsize(),
+                'low_watermark': self.low_watermark,
+                'high_watermark': self.high_watermark,
+                'hits': self._hits,
+                'misses': self._misses,
+                'refills': self._refills
+            }
+
+
+def _connect_lease_db(lease_path: str) -> sqlite3.Connection:
+    return sqlite3.connect(lease_path, timeout=30, isolation_level=None)
+
+
+def init_lease_table(lease_path: str) -> bytes:
+    """
+    Create the lease table if needed and return the shared permutation key.
+
+    The key is generated once and stored alongside the sequence so that every
+    worker sharing the lease file scrambles codes the same way.
+
+    Args:
+        lease_path (str): Path to the SQLite lease file
+
+    Returns:
+        bytes: The shared permutation key
+    """
+    conn = _connect_lease_db(lease_path)
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS code_space ('
+            'id INTEGER PRIMARY KEY CHECK (id = 0), '
+            'next_id INTEGER NOT NULL, '
+            'key BLOB NOT NULL)'
+        )
+        conn.execute('INSERT OR IGNORE INTO code_space (id, next_id, key) VALUES (0, 0, ?)',
+                     (os.urandom(32),))
+        key = conn.execute('SELECT key FROM code_space WHERE id = 0').fetchone()[0]
+        conn.execute('COMMIT')
+        return key
+    finally:
+        conn.close()
+
+
+def durable_lease_path(config=Config):
+    """
+    Where to keep the code counter when the store is durable but no
+    SHORT_CODE_LEASE_PATH is set, so a restart does not hand out the codes
+    of recovered links again.
+
+    Args:
+        config: Object exposing the store settings (default: Config)
+
+    Returns:
+        str: A lease file next to the store's data, or None for an in-memory store
+    """
+    if config.STORE_BACKEND == 'sqlite':
+        if config.SQLITE_PATH and config.SQLITE_PATH != ':memory:':
+            return config.SQLITE_PATH
+        return None
+    if config.WAL_DIR:
+        os.makedirs(config.WAL_DIR, exist_ok=True)
+        return os.path.join(config.WAL_DIR, LEASE_FILE)
+    return None
+
+
+def create_allocator(config=Config) -> SequenceAllocator:
+    """
+    Build the short code allocator described by the configuration.
+
+    Args:
+        config: Object exposing the SHORT_CODE_* settings (default: Config)
+
+    Returns:
+        SequenceAllocator: The configured allocator
+    """
+    length = config.SHORT_CODE_LENGTH
+    strategy = config.SHORT_CODE_STRATEGY
+    lease_path = config.SHORT_CODE_LEASE_PATH or durable_lease_path(config)
+
+    if strategy not in ('sequential', 'permuted'):
+        raise ValueError(f"Unknown short code strategy: {strategy}")
+
+    permutation = None
+    if strategy == 'permuted':
+        key = config.SHORT_CODE_KEY
+        if key:
+            key = key.encode('utf-8')
+        elif lease_path:
+            key = init_lease_table(lease_path)
+        else:
+            logger.warning("SHORT_CODE_KEY not set, using a random per-process key")
+            key = os.urandom(32)
+        permutation = FeistelPermutation(BASE ** length, key)
+
+    if lease_path:
+        return BlockLeaseAllocator(lease_path, block_size=config.SHORT_CODE_BLOCK_SIZE,
+                                   length=length, permutation=permutation)
+
+    return SequenceAllocator(length=length, permutation=permutation)
+
+
+# Global instance - unique across processes only when SHORT_CODE_LEASE_PATH is
+# set, and across restarts whenever the store is durable
+code_allocator = create_allocator()
@@ -0,0 +1,345 @@
+import os
+import time
+import queue
+import threading
+import logging
+from typing import Callable, Dict, FrozenSet, Iterable, Optional
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+# Lookup latencies are bucketed by power of two nanoseconds
+LATENCY_BUCKETS = 32
+
+
+def normalize_domain(entry: str) -> Optional[str]:
+    """
+    Reduce a blocklist line to a bare lowercase domain.
+
+    Accepts "example.com", "*.example.com", ".example.com" and trailing
+    comments or dots; blank lines and comments give None.
+
+    Args:
+        entry (str): One line of a blocklist file
+
+    Returns:
+        str: The domain, or None if the line holds none
+    """
+    domain = entry.split('#', 1)[0].strip().lower()
+    if domain.startswith('*.'):
+        domain = domain[2:]
+    domain = domain.strip('.')
+    return domain or None
+
+
+def find_blocked(host: Optional[str], domains: FrozenSet[str]) -> Optional[str]:
+    """
+    Find the domain in a set that is, or is a parent of, a host.
+
+    Args:
+        host (str): Host name, as returned by urlsplit().hostname
+        domains (frozenset): Normalized blocklist domains
+
+    Returns:
+        str: The matching domain, or None
+    """
+    if not host:
+        return None
+    candidate = host.rstrip('.').lower()
+    while True:
+        if candidate in domains:
+            return candidate
+        dot = candidate.find('.')
+        if dot < 0:
+            return None
+        candidate = candidate[dot + 1:]
+
+
+class DomainBlocklist:
+    """
+    Refuses hosts that are, or are subdomains of, a listed domain.
+
+    The list is held as a frozenset of domains, and a host is checked by
+    probing the set with each of its label suffixes ("a.b.example.com",
+    "b.example.com", "example.com", "com"), so a lookup costs one hash per
+    label however long the list is. A reload builds a new set off to the
+    side and swaps the reference, so lookups never wait for a load and
+    always see either the old list or the new one.
+
+    With a path and reload_interval, a background thread re-reads the file
+    whenever its modification time changes. on_change, if given, is called
+    with the set of newly listed domains after every load that adds any,
+    including the first.
+    """
+
+    def __init__(self, domains: Iterable[str] = (), path: Optional[str] = None,
+                 reload_interval: float = 5.0,
+                 on_change: Optional[Callable[[FrozenSet[str]], None]] = None):
+        self.path = path
+        self.reload_interval = reload_interval
+        self.on_change = on_change
+        self._domains: FrozenSet[str] = frozenset()
+        self._loaded_mtime = None
+        self._reloads = 0
+        self._stopped = threading.Event()
+        self._thread = None
+
+        self._metrics_lock = threading.Lock()
+        self._lookups = 0
+        self._blocked = 0
+        self._latency_ns = 0
+        self._max_latency_ns = 0
+        self._latency_buckets = [0] * LATENCY_BUCKETS
+
+        if path is not None:
+            self.reload()
+        else:
+            self.replace(domains)
+
+    def replace(self, domains: Iterable[str]):
+        """
+        Swap in a new list of domains.
+
+        Args:
+            domains (iterable): Blocklist entries, in any form normalize_domain accepts
+        """
+        new = frozenset(filter(None, map(normalize_domain, domains)))
+        added = new - self._domains
+        self._domains = new
+        self._reloads += 1
+        logger.info(f"Domain blocklist loaded ({len(new)} domains, {len(added)} new)")
+        if added and self.on_change is not None:
+            self.on_change(added)
+
+    def reload(self, force: bool = False) -> bool:
+        """
+        Re-read the blocklist file if it changed since the last load.
+
+        Args:
+            force (bool): Re-read even if the modification time is unchanged
+
+        Returns:
+            bool: True if the list was reloaded
+        """
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+            if not force and mtime == self._loaded_mtime:
+                return False
+            with open(self.path, encoding='utf-8') as f:
+                self.replace(f)
+        except OSError as e:
+            logger.error(f"Failed to load domain blocklist {self.path}: {str(e)}")
+            return False
+        except Exception as e:
+            # A bad file (e.g. not UTF-8) must not kill the reload thread;
+            # keep the current list and wait for the file to change again
+            logger.error(f"Failed to load domain blocklist {self.path}: {str(e)}")
+            self._loaded_mtime = mtime
+            return False
+        self._loaded_mtime = mtime
+        return True
+
+    def start(self):
+        """Start watching the blocklist file for changes."""
+        if self._thread is not None or self.path is None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='blocklist-reloader', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop watching the blocklist file."""
+        if self._thread is not None:
+            self._stopped.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stopped.wait(self.reload_interval):
+            try:
+                self.reload()
+            except Exception as e:
+                logger.error(f"Domain blocklist reload failed: {str(e)}")
+
+    def match(self, host: Optional[str]) -> Optional[str]:
+        """
+        Find the listed domain that blocks a host.
+
+        Args:
+            host (str): Host name, as returned by urlsplit().hostname
+
+        Returns:
+            str: The matching blocklist domain, or None if the host is allowed
+        """
+        started = time.perf_counter_ns()
+        found = find_blocked(host, self._domains)
+        elapsed = time.perf_counter_ns() - started
+
+        with self._metrics_lock:
+            self._lookups += 1
+            if found is not None:
+                self._blocked += 1
+            self._latency_ns += elapsed
+            if elapsed > self._max_latency_ns:
+                self._max_latency_ns = elapsed
+            self._latency_buckets[min(elapsed.bit_length(), LATENCY_BUCKETS - 1)] += 1
+        return found
+
+    def _percentile_ns(self, fraction: float) -> int:
+        # Upper bound of the power-of-two bucket holding the percentile
+        target = self._lookups * fraction
+        seen = 0
+        for bucket, count in enumerate(self._latency_buckets):
+            seen += count
+            if count and seen >= target:
+                return 1 << bucket
+        return 0
+
+    def get_metrics(self) -> Dict:
+        """
+        Get list size, lookup counts and lookup latency.
+
+        Returns:
+            dict: Domains, reloads, lookups, blocked lookups, and mean, p50,
+                p99 and max lookup latency in nanoseconds (percentiles are
+                power-of-two upper bounds)
+        """
+        with self._metrics_lock:
+            lookups = self._lookups
+            return {
+                'domains': len(self._domains),
+                'reloads': self._reloads,
+                'lookups': lookups,
+                'blocked': self._blocked,
+                'latency_ns': {
+                    'mean': round(self._latency_ns / lookups) if lookups else 0,
+                    'p50': self._percentile_ns(0.5),
+                    'p99': self._percentile_ns(0.99),
+                    'max': self._max_latency_ns
+                }
+            }
+
+
+class BlocklistSweeper:
+    """
+    Disables existing links whose host has just been blocklisted.
+
+    Sweeps run on a background thread, one per batch of newly listed
+    domains (batches queued while a sweep runs are merged into the next
+    one). A sweep walks the store with iter_records, which takes the store
+    lock once per chunk, and disables each chunk's matches with one
+    disable_codes call, so redirects and shortens interleave with the sweep
+    instead of waiting for it. Links created during a sweep were already
+    checked against the new list by shorten_url.
+    """
+
+    def __init__(self, store, chunk_size: int = 1000):
+        self._store = store
+        self.chunk_size = chunk_size
+        self._queue = queue.Queue()
+        self._thread = None
+        self._metrics_lock = threading.Lock()
+        self._sweeps = 0
+        self._scanned = 0
+        self._disabled = 0
+        self._last_sweep_seconds = None
+
+    def submit(self, domains: Iterable[str]):
+        """
+        Queue a sweep for links on the given domains or their subdomains.
+
+        Args:
+            domains (iterable): Normalized domains
+        """
+        self._queue.put(frozenset(domains))
+
+    def start(self):
+        """Start the background sweep thread."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='blocklist-sweeper', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the sweep thread once queued sweeps are done."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while True:
+            domains = self._queue.get()
+            if domains is None:
+                return
+            # Fold everything queued meanwhile into a single pass
+            stop = False
+            while not self._queue.empty():
+                more = self._queue.get()
+                if more is None:
+                    stop = True
+                    break
+                domains |= more
+            try:
+                self.sweep(domains)
+            except Exception as e:
+                logger.error(f"Blocklist sweep failed: {str(e)}")
+            if stop:
+                return
+
+    def sweep(self, domains: FrozenSet[str]) -> int:
+        """
+        Disable every link on the given domains, in chunks.
+
+        Args:
+            domains (frozenset): Normalized domains to sweep for
+
+        Returns:
+            int: Number of links disabled
+        """
+        started = time.perf_counter()
+        scanned = 0
+        disabled = 0
+        batch = []
+        for short_code, record in self._store.iter_records(self.chunk_size):
+            scanned += 1
+            if record.disabled:
+                continue
+            try:
+                host = urlsplit(record.url).hostname
+            except ValueError:
+                continue
+            if find_blocked(host, domains) is not None:
+                batch.append(short_code)
+                if len(batch) >= self.chunk_size:
+                    disabled += self._store.disable_codes(batch)
+                    batch = []
+        if batch:
+            disabled += self._store.disable_codes(batch)
+
+        elapsed = time.perf_counter() - started
+        with self._metrics_lock:
+            self._sweeps += 1
+            self._scanned += scanned
+            self._disabled += disabled
+            self._last_sweep_seconds = round(elapsed, 3)
+        logger.info(f"Blocklist sweep for {len(domains)} domains scanned {scanned} links "
+                    f"and disabled {disabled} in {elapsed:.2f}s")
+        return disabled
+
+    def get_metrics(self) -> Dict:
+        """
+        Get sweep counters.
+
+        Returns:
+            dict: Sweeps run, links scanned and disabled, queued sweeps and
+                the duration of the last sweep in seconds
+        """
+        with self._metrics_lock:
+            return {
+                'sweeps': self._sweeps,
+                'links_scanned': self._scanned,
+                'links_disabled': self._disabled,
+                'queued': self._queue.qsize(),
+                'last_sweep_seconds': self._last_sweep_seconds
+            }
@@ -0,0 +1,88 @@
+import math
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter for short code membership checks.
+
+    A negative answer is definite, a positive one only means "maybe". Reads
+    never take a lock: bits are only ever set, so a concurrent reader either
+    sees a freshly added code or reports a miss that the caller would also
+    have reported a moment earlier. Writers are expected to be serialized by
+    the owner (URLStore adds under its own lock).
+    """
+
+    def __init__(self, capacity: int = 1_000_000, error_rate: float = 0.01):
+        if capacity < 1:
+            raise ValueError("Bloom filter capacity must be positive")
+        if not 0 < error_rate < 1:
+            raise ValueError("Bloom filter error rate must be between 0 and 1")
+
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))))
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self._count = 0
+        logger.info(f"BloomFilter initialized ({self.num_bits} bits, {self.num_hashes} hashes)")
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, key: str):
+        """
+        Add a key to the filter.
+
+        Args:
+            key (str): The key to add
+        """
+        bits = self._bits
+        for position in self._positions(key):
+            bits[position >> 3] |= 1 << (position & 7)
+        self._count += 1
+
+    def might_contain(self, key: str) -> bool:
+        """
+        Check whether a key may have been added.
+
+        Args:
+            key (str): The key to check
+
+        Returns:
+            bool: False if the key was definitely never added, True otherwise
+        """
+        bits = self._bits
+        for position in self._positions(key):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def clear(self):
+        """Remove every key from the filter."""
+        self._bits = bytearray(len(self._bits))
+        self._count = 0
+
+    def get_metrics(self) -> dict:
+        """
+        Get sizing information for the filter.
+
+        Returns:
+            dict: Size, item count and the current expected false positive rate
+        """
+        expected_fp_rate = (1 - math.exp(-self.num_hashes * self._count / self.num_bits)) ** self.num_hashes
+        return {
+            'capacity': self.capacity,
+            'items': self._count,
+            'num_bits': self.num_bits,
+            'num_hashes': self.num_hashes,
+            'memory_bytes': len(self._bits),
+            'expected_false_positive_rate': expected_fp_rate
+        }
@@ -0,0 +1,128 @@
+from operator import itemgetter
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_TOP_N = 10
+DIRECT = '(direct)'
+UNKNOWN = 'unknown'
+
+
+class Breakdown:
+    """
+    Click counts by category with bounded cardinality.
+
+    At most 2 * top_n categories are tracked, with exact counts. Clicks in
+    a category that arrives when the table is full go to an overflow count
+    instead of displacing a tracked one, so a stream of one-off spam values
+    can neither grow memory nor push real categories out of the top list.
+    The tracked counts plus the overflow always sum to the total number of
+    clicks, so everything outside the reported top N is exactly the "other"
+    bucket.
+    """
+
+    __slots__ = ('top_n', 'counts', 'overflow')
+
+    def __init__(self, top_n: int = DEFAULT_TOP_N):
+        self.top_n = top_n
+        self.counts = {}
+        self.overflow = 0
+
+    def add(self, key: str, count: int = 1):
+        """
+        Count clicks in a category.
+
+        Args:
+            key (str): The category
+            count (int): Number of clicks
+        """
+        counts = self.counts
+        if key in counts:
+            counts[key] += count
+        elif len(counts) < 2 * self.top_n:
+            counts[key] = count
+        else:
+            self.overflow += count
+
+    def copy(self) -> 'Breakdown':
+        """
+        Copy the breakdown.
+
+        Returns:
+            Breakdown: Independent breakdown with the same counts
+        """
+        clone = Breakdown(self.top_n)
+        clone.counts = dict(self.counts)
+        clone.overflow = self.overflow
+        return clone
+
+    def top(self) -> Tuple[List[Tuple[str, int]], int]:
+        """
+        Get the largest categories and everything else.
+
+        Returns:
+            tuple: ([(category, clicks)], other clicks), largest first
+        """
+        ranked = sorted(self.counts.items(), key=itemgetter(1), reverse=True)
+        return ranked[:self.top_n], self.overflow + sum(count for _, count in ranked[self.top_n:])
+
+
+class ClickBreakdowns:
+    """
+    Per-link clicks by referrer host and by user agent family.
+    """
+
+    __slots__ = ('referrers', 'agents')
+
+    def __init__(self, top_n: int = DEFAULT_TOP_N):
+        self.referrers = Breakdown(top_n)
+        self.agents = Breakdown(top_n)
+
+    def add(self, referrer: Optional[str], agent: Optional[str], count: int = 1):
+        """
+        Count clicks from a referrer and user agent family.
+
+        Args:
+            referrer (str): Referrer host, or None for direct traffic
+            agent (str): User agent family, or None if unknown
+            count (int): Number of clicks
+        """
+        self.referrers.add(referrer or DIRECT, count)
+        self.agents.add(agent or UNKNOWN, count)
+
+    def copy(self) -> 'ClickBreakdowns':
+        """
+        Copy both breakdowns.
+
+        Returns:
+            ClickBreakdowns: Independent copy
+        """
+        clone = ClickBreakdowns.__new__(ClickBreakdowns)
+        clone.referrers = self.referrers.copy()
+        clone.agents = self.agents.copy()
+        return clone
+
+    def to_dict(self) -> Dict:
+        """
+        Build the public breakdown dict.
+
+        Returns:
+            dict: For referrers and user_agents, the top entries and the
+                click count of all other values
+        """
+        result = {}
+        for name, breakdown in (('referrers', self.referrers), ('user_agents', self.agents)):
+            top, other = breakdown.top()
+            result[name] = {
+                'top': [{'name': key, 'clicks': clicks} for key, clicks in top],
+                'other': other
+            }
+        return result
+
+
+def empty_breakdowns() -> Dict:
+    """
+    Breakdown dict for a link that has never been clicked.
+
+    Returns:
+        dict: Same layout as ClickBreakdowns.to_dict, with no entries
+    """
+    return {name: {'top': [], 'other': 0} for name in ('referrers', 'user_agents')}
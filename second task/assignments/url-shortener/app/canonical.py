@@ -0,0 +1,162 @@
+import threading
+import logging
+from typing import Dict, Iterable
+from urllib.parse import urlsplit, urlunsplit
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+# Query parameters that only identify the campaign or click, never the page.
+# A trailing '*' matches any parameter with that prefix.
+DEFAULT_STRIP_PARAMS = ('utm_*', 'fbclid', 'gclid', 'dclid', 'msclkid', 'mc_cid', 'mc_eid')
+
+# Counted whenever the rule changed a URL
+RULES = ('case', 'default_port', 'dot_segments', 'query_order', 'tracking_params', 'idna')
+
+
+def remove_dot_segments(path: str) -> str:
+    """
+    Resolve '.' and '..' segments as described in RFC 3986 section 5.2.4.
+
+    Args:
+        path (str): An absolute URL path
+
+    Returns:
+        str: The path with dot segments removed
+    """
+    if '.' not in path:
+        return path
+    output = []
+    segments = path.split('/')
+    for i, segment in enumerate(segments):
+        last = i == len(segments) - 1
+        if segment == '.':
+            if last:
+                output.append('')
+        elif segment == '..':
+            if len(output) > 1:
+                output.pop()
+            if last:
+                output.append('')
+        else:
+            output.append(segment)
+    if not output or output[0] != '':
+        output.insert(0, '')
+    return '/'.join(output) or '/'
+
+
+class URLCanonicalizer:
+    """
+    Rewrites equivalent URLs to one form before validation and dedupe.
+
+    Scheme and host are lowercased, non-ASCII hosts are IDNA-encoded,
+    default ports are dropped, dot segments are resolved, tracking query
+    parameters are removed and the remaining parameters are sorted by name.
+    Query parameters are compared and reordered as raw text, so their
+    percent-encoding is never changed. URLs that cannot be parsed are
+    returned unchanged for validation to reject.
+    """
+
+    def __init__(self, strip_params: Iterable[str] = DEFAULT_STRIP_PARAMS):
+        names = [name.strip().lower() for name in strip_params if name.strip()]
+        self.strip_names = frozenset(name for name in names if not name.endswith('*'))
+        self.strip_prefixes = tuple(name[:-1] for name in names if name.endswith('*'))
+        self._lock = threading.Lock()
+        self._urls = 0
+        self._rewritten = 0
+        self._dedupe_hits = 0
+        self._rule_counts = dict.fromkeys(RULES, 0)
+        logger.info(f"URLCanonicalizer initialized (stripping {len(names)} tracking parameters)")
+
+    def _is_tracking(self, name: str) -> bool:
+        name = name.lower()
+        return name in self.strip_names or name.startswith(self.strip_prefixes)
+
+    def canonicalize(self, url: str) -> str:
+        """
+        Rewrite a URL to its canonical form.
+
+        Args:
+            url (str): The submitted URL
+
+        Returns:
+            str: The canonical URL, or url unchanged if it cannot be parsed
+        """
+        if not url or not isinstance(url, str):
+            return url
+        try:
+            parts = urlsplit(url)
+            host = parts.hostname
+            port = parts.port
+        except ValueError:
+            return url
+        if not parts.scheme or not host:
+            return url
+
+        applied = []
+        scheme = parts.scheme.lower()
+        if not host.isascii():
+            try:
+                host = host.encode('idna').decode('ascii')
+            except UnicodeError:
+                return url
+            applied.append('idna')
+
+        userinfo, _, hostport = parts.netloc.rpartition('@')
+        if 'idna' not in applied and (scheme != parts.scheme or hostport != hostport.lower()):
+            applied.append('case')
+        if ':' in host:
+            host = f"[{host}]"  # IPv6 literal
+        netloc = f"{userinfo}@{host}" if userinfo else host
+        if port is not None:
+            if port == DEFAULT_PORTS.get(scheme):
+                applied.append('default_port')
+            else:
+                netloc = f"{netloc}:{port}"
+
+        path = parts.path or '/'
+        resolved = remove_dot_segments(path)
+        if resolved != path:
+            applied.append('dot_segments')
+
+        query = parts.query
+        if query:
+            params = [param for param in query.split('&') if param]
+            kept = [param for param in params if not self._is_tracking(param.partition('=')[0])]
+            if len(kept) != len(params):
+                applied.append('tracking_params')
+            ordered = sorted(kept, key=lambda param: param.partition('=')[0])
+            if ordered != kept:
+                applied.append('query_order')
+            query = '&'.join(ordered)
+
+        canonical = urlunsplit((scheme, netloc, resolved, query, parts.fragment))
+        with self._lock:
+            self._urls += 1
+            if canonical != url:
+                self._rewritten += 1
+            for rule in applied:
+                self._rule_counts[rule] += 1
+        return canonical
+
+    def record_dedupe_hit(self):
+        """Count a shorten that found an existing link only after rewriting."""
+        with self._lock:
+            self._dedupe_hits += 1
+
+    def get_metrics(self) -> Dict:
+        """
+        Get canonicalization counters.
+
+        Returns:
+            dict: URLs processed, URLs changed, changes per rule, and
+                shortens deduplicated thanks to a rewrite
+        """
+        with self._lock:
+            return {
+                'urls': self._urls,
+                'rewritten': self._rewritten,
+                'dedupe_hits': self._dedupe_hits,
+                'rules': dict(self._rule_counts)
+            }
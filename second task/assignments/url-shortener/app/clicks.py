@@ -0,0 +1,157 @@
+import time
+import threading
+import logging
+from collections import deque
+from typing import Dict, List, Optional
+from .models import ClickDetails, now_micros
+
+logger = logging.getLogger(__name__)
+
+
+class ClickPipeline:
+    """
+    Moves click counting off the redirect path.
+
+    Redirects append (short_code, timestamp, details) to a deque owned by the
+    calling thread - no shared lock, no formatting, no logging. A background
+    thread drains every buffer every flush_interval seconds, folds the events
+    into per-code (count, last access, click details) totals and hands them to the
+    sink (the store's apply_clicks) in one call, so the store lock is taken
+    once per flush instead of once per click.
+
+    Readers that need fresh numbers call flush_if_stale(), which guarantees
+    that every click older than max_staleness has been applied.
+    """
+
+    def __init__(self, sink, flush_interval: float = 0.005, max_staleness: float = 0.05):
+        self._sink = sink
+        self.flush_interval = flush_interval
+        self.max_staleness = max_staleness
+        self._local = threading.local()
+        self._buffers = []  # (owning thread, deque)
+        self._buffers_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        # Start time of the last completed flush: every click recorded before
+        # this moment has been applied
+        self._applied_until = time.monotonic()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._flushes = 0
+        self._events_applied = 0
+        logger.info(f"ClickPipeline initialized (flush every {flush_interval * 1000:.0f}ms, "
+                    f"max staleness {max_staleness * 1000:.0f}ms)")
+
+    def start(self):
+        """Start the background aggregator thread."""
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='click-aggregator', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the aggregator and apply any remaining clicks."""
+        if self._thread is not None:
+            self._stopped.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _buffer(self) -> deque:
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None:
+            buffer = deque()
+            self._local.buffer = buffer
+            with self._buffers_lock:
+                self._buffers.append((threading.current_thread(), buffer))
+        return buffer
+
+    def record(self, short_code: str, details: Optional[ClickDetails] = None):
+        """
+        Record a click. Never blocks on the store.
+
+        Args:
+            short_code (str): The short code that was clicked
+            details (ClickDetails): The click's attributes, if known
+        """
+        self._buffer().append((short_code, now_micros(), details))
+
+    def _run(self):
+        while not self._stopped.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Failed to apply buffered clicks: {str(e)}")
+
+    def flush(self) -> int:
+        """
+        Drain every thread's buffer and apply the folded totals.
+
+        Returns:
+            int: Number of click events applied
+        """
+        with self._flush_lock:
+            started = time.monotonic()
+            with self._buffers_lock:
+                buffers = list(self._buffers)
+
+            totals: Dict[str, List[int]] = {}
+            events = 0
+            for _, buffer in buffers:
+                # popleft is atomic against the owner's append, so the owner
+                # never waits for us and no event is lost or seen twice
+                while True:
+                    try:
+                        code, timestamp, details = buffer.popleft()
+                    except IndexError:
+                        break
+                    entry = totals.get(code)
+                    if entry is None:
+                        entry = totals[code] = [1, timestamp, []]
+                    else:
+                        entry[0] += 1
+                        if timestamp > entry[1]:
+                            entry[1] = timestamp
+                    if details is not None:
+                        entry[2].append(details)
+                    events += 1
+
+            # Forget buffers of threads that have exited (one-thread-per-request
+            # servers would otherwise grow the list without bound). Their final
+            # events were drained above.
+            if any(not thread.is_alive() for thread, _ in buffers):
+                with self._buffers_lock:
+                    self._buffers = [(thread, buffer) for thread, buffer in self._buffers
+                                     if thread.is_alive() or buffer]
+
+            if totals:
+                self._sink(totals)
+            self._applied_until = started
+            self._flushes += 1
+            self._events_applied += events
+            return events
+
+    def flush_if_stale(self):
+        """
+        Apply buffered clicks now if the last flush is older than max_staleness.
+        """
+        if time.monotonic() - self._applied_until > self.max_staleness:
+            self.flush()
+
+    def get_metrics(self) -> Dict:
+        """
+        Get aggregator metrics.
+
+        Returns:
+            dict: Flush count, events applied, buffers and current lag in ms
+        """
+        with self._buffers_lock:
+            buffers = len(self._buffers)
+            pending = sum(len(buffer) for _, buffer in self._buffers)
+        return {
+            'flushes': self._flushes,
+            'events_applied': self._events_applied,
+            'pending_events': pending,
+            'thread_buffers': buffers,
+            'lag_ms': round((time.monotonic() - self._applied_until) * 1000, 1)
+        }
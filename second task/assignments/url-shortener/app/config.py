@@ -0,0 +1,124 @@
+import os
+
+
+def env_flag(name: str, default: bool = False) -> bool:
+    """
+    Read a boolean flag from the environment.
+
+    Args:
+        name (str): Environment variable name
+        default (bool): Value used when the variable is unset
+
+    Returns:
+        bool: True for '1', 'true', 'yes' or 'on' (case-insensitive)
+    """
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+class Config:
+    """
+    Application configuration, read from environment variables.
+    """
+
+    # Short code generation
+    SHORT_CODE_LENGTH = int(os.environ.get('SHORT_CODE_LENGTH', 6))
+    # 'permuted' (default) scrambles the sequence so codes are not guessable,
+    # 'sequential' hands out the raw counter
+    SHORT_CODE_STRATEGY = os.environ.get('SHORT_CODE_STRATEGY', 'permuted')
+    # Secret for the code permutation. When unset, a durable store keeps a
+    # generated key with its code counter; an in-memory one uses a random
+    # per-process key
+    SHORT_CODE_KEY = os.environ.get('SHORT_CODE_KEY')
+
+    # Shared SQLite file that multi-process deployments lease code blocks
+    # from. When unset, a durable store (WAL_DIR or the sqlite backend) keeps
+    # the counter with its data so restarts carry on where they left off;
+    # an in-memory store counts from zero in each process
+    SHORT_CODE_LEASE_PATH = os.environ.get('SHORT_CODE_LEASE_PATH')
+    SHORT_CODE_BLOCK_SIZE = int(os.environ.get('SHORT_CODE_BLOCK_SIZE', 1000))
+
+    # Background pool of pre-generated codes, refilled to the high watermark
+    # whenever it drains below the low watermark
+    SHORT_CODE_POOL_ENABLED = env_flag('SHORT_CODE_POOL_ENABLED')
+    SHORT_CODE_POOL_LOW_WATERMARK = int(os.environ.get('SHORT_CODE_POOL_LOW_WATERMARK', 100))
+    SHORT_CODE_POOL_HIGH_WATERMARK = int(os.environ.get('SHORT_CODE_POOL_HIGH_WATERMARK', 1000))
+
+    # Lock-free Bloom filter in front of URLStore lookups; sized for the
+    # expected number of links, beyond which the false positive rate climbs
+    BLOOM_FILTER_ENABLED = env_flag('BLOOM_FILTER_ENABLED')
+    BLOOM_FILTER_CAPACITY = int(os.environ.get('BLOOM_FILTER_CAPACITY', 1_000_000))
+    BLOOM_FILTER_ERROR_RATE = float(os.environ.get('BLOOM_FILTER_ERROR_RATE', 0.01))
+
+    # Return the existing code when an already shortened URL is submitted
+    # again, instead of creating a new record
+    DEDUPE_ENABLED = env_flag('DEDUPE_ENABLED')
+
+    # Most URLs accepted by one POST /api/shorten/batch request
+    SHORTEN_BATCH_MAX_URLS = int(os.environ.get('SHORTEN_BATCH_MAX_URLS', 1000))
+
+    # Records per chunk of POST /api/import and GET /api/export; an import
+    # holds one chunk in memory and reports at most IMPORT_MAX_ERRORS bad lines
+    BULK_CHUNK_SIZE = int(os.environ.get('BULK_CHUNK_SIZE', 1000))
+    IMPORT_MAX_ERRORS = int(os.environ.get('IMPORT_MAX_ERRORS', 100))
+
+    # Rewrite submitted URLs to a canonical form before validating and storing
+    # them: lowercase scheme and host, IDNA hosts, no default ports or dot
+    # segments, tracking parameters removed and the rest sorted. With
+    # DEDUPE_ENABLED, equivalent URLs then share one link.
+    CANONICALIZE_URLS = env_flag('CANONICALIZE_URLS')
+    # Comma-separated query parameters to strip; a trailing '*' matches a prefix
+    CANONICAL_STRIP_PARAMS = os.environ.get(
+        'CANONICAL_STRIP_PARAMS', 'utm_*,fbclid,gclid,dclid,msclkid,mc_cid,mc_eid').split(',')
+
+    # Refuse to shorten URLs whose host is, or is under, a domain listed in
+    # this file (one per line, '#' comments); the file is re-read when it
+    # changes, checked every BLOCKLIST_RELOAD_S seconds
+    BLOCKLIST_PATH = os.environ.get('BLOCKLIST_PATH')
+    BLOCKLIST_RELOAD_S = float(os.environ.get('BLOCKLIST_RELOAD_S', 5))
+    # Existing links on newly blocked domains are disabled (redirects answer
+    # 410) by a background sweep that reads this many links per store lock
+    BLOCKLIST_SWEEP_CHUNK = int(os.environ.get('BLOCKLIST_SWEEP_CHUNK', 1000))
+
+    # URL storage: 'memory' (single lock), 'sharded' (STORE_SHARDS
+    # independently locked partitions) or 'sqlite' (database at SQLITE_PATH)
+    STORE_BACKEND = os.environ.get('STORE_BACKEND', 'memory')
+    STORE_SHARDS = int(os.environ.get('STORE_SHARDS', 16))
+    SQLITE_PATH = os.environ.get('SQLITE_PATH', 'urls.db')
+    # How often buffered click increments are written to SQLite
+    SQLITE_CLICK_FLUSH_MS = int(os.environ.get('SQLITE_CLICK_FLUSH_MS', 50))
+
+    # How URLStore.increment_clicks counts: 'locked' updates the record under
+    # the store lock, 'per_thread' adds into a lock-free slot owned by the
+    # calling thread and sums the slots when stats are read
+    CLICK_COUNTER_MODE = os.environ.get('CLICK_COUNTER_MODE', 'locked')
+
+    # Counters per sub-window of the top links summaries; any link with more
+    # than 1/TOP_LINKS_CAPACITY of a sub-window's clicks is always tracked
+    TOP_LINKS_CAPACITY = int(os.environ.get('TOP_LINKS_CAPACITY', 1000))
+    # Independently locked stripes the summaries are split into, so that
+    # redirects counting different links do not contend on one lock
+    TOP_LINKS_STRIPES = int(os.environ.get('TOP_LINKS_STRIPES', 16))
+
+    # Remember the verdicts of this many recently validated URLs (0 = off);
+    # worthwhile when the same URLs are submitted repeatedly
+    URL_VALIDATION_CACHE_SIZE = int(os.environ.get('URL_VALIDATION_CACHE_SIZE', 0))
+
+    # Durable write-ahead log + snapshots; disabled (pure in-memory) unless a
+    # directory is given. With WAL_SYNC_COMMIT a shorten only returns once its
+    # entry is fsynced; otherwise up to WAL_FSYNC_INTERVAL_MS of writes can be
+    # lost on a crash.
+    WAL_DIR = os.environ.get('WAL_DIR')
+    WAL_FSYNC_INTERVAL_MS = int(os.environ.get('WAL_FSYNC_INTERVAL_MS', 10))
+    WAL_BATCH_SIZE = int(os.environ.get('WAL_BATCH_SIZE', 1000))
+    WAL_SYNC_COMMIT = env_flag('WAL_SYNC_COMMIT')
+    WAL_SNAPSHOT_INTERVAL_S = float(os.environ.get('WAL_SNAPSHOT_INTERVAL_S', 300))
+
+    # Count redirects asynchronously: clicks are buffered per thread and
+    # applied every CLICK_FLUSH_INTERVAL_MS; stats reads force a flush when
+    # the applied counts are older than CLICK_MAX_STALENESS_MS
+    CLICK_PIPELINE_ENABLED = env_flag('CLICK_PIPELINE_ENABLED')
+    CLICK_FLUSH_INTERVAL_MS = int(os.environ.get('CLICK_FLUSH_INTERVAL_MS', 5))
+    CLICK_MAX_STALENESS_MS = int(os.environ.get('CLICK_MAX_STALENESS_MS', 50))
@@ -1,13 +1,94 @@
-from flask import Flask, jsonify, request, redirect
+from flask import Flask, Response, jsonify, request, redirect, stream_with_context
+import io
+import json
 import logging
-from .models import url_store
-from .utils import validate_url, generate_short_code, is_valid_short_code
+from .config import Config
+from .models import (DEFAULT_HOST_PAGE, MAX_HOST_PAGE, ClickDetails, URLRecord, url_store,
+                     format_timestamp, now_micros, parse_timestamp)
+from .timeseries import RESOLUTIONS
+from .hll import visitor_hash
+from .topk import WINDOWS, TopLinks
+from .allocator import CodePool, code_allocator, content_code
+from .clicks import ClickPipeline
+from .canonical import URLCanonicalizer
+from .blocklist import BlocklistSweeper, DomainBlocklist
+from .utils import (validate_url, validate_urls, is_valid_short_code, canonicalize_url,
+                    classify_user_agent, referrer_host, url_host, configure_url_cache,
+                    url_cache_info)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
+app.config.from_object(Config)
+
+# Codes come straight from the allocator unless the pre-generated pool is
+# enabled. The insert detects a code that is already taken (e.g. by an
+# import); only the retry after such a collision looks codes up in the store
+code_allocator.is_used = url_store.contains
+code_pool = None
+code_source = code_allocator
+if app.config['SHORT_CODE_POOL_ENABLED']:
+    code_pool = CodePool(code_allocator,
+                         low_watermark=app.config['SHORT_CODE_POOL_LOW_WATERMARK'],
+                         high_watermark=app.config['SHORT_CODE_POOL_HIGH_WATERMARK'])
+    code_pool.start()
+    code_source = code_pool
+
+configure_url_cache(app.config['URL_VALIDATION_CACHE_SIZE'])
+
+canonicalizer = None
+if app.config['CANONICALIZE_URLS']:
+    canonicalizer = URLCanonicalizer(app.config['CANONICAL_STRIP_PARAMS'])
+
+# Newly blocked domains, including the whole list at startup, are swept out
+# of the existing links in the background
+blocklist = None
+blocklist_sweeper = None
+if app.config['BLOCKLIST_PATH']:
+    blocklist_sweeper = BlocklistSweeper(url_store, chunk_size=app.config['BLOCKLIST_SWEEP_CHUNK'])
+    blocklist_sweeper.start()
+    blocklist = DomainBlocklist(path=app.config['BLOCKLIST_PATH'],
+                                reload_interval=app.config['BLOCKLIST_RELOAD_S'],
+                                on_change=blocklist_sweeper.submit)
+    blocklist.start()
+
+# Heavy hitters per sliding window, fed from the click path
+top_links = TopLinks(capacity=app.config['TOP_LINKS_CAPACITY'],
+                     stripes=app.config['TOP_LINKS_STRIPES'])
+
+def apply_click_batch(totals):
+    """Apply a batch of aggregated clicks to the store and the top links."""
+    url_store.apply_clicks(totals)
+    top_links.record_batch(totals)
+
+def rewrite_deduplicated(submitted_url, canonical_url):
+    """
+    Tell whether a shorten found its link only thanks to the canonicalizer.
+    
+    Plain dedupe already matches spellings that differ only in the case of
+    scheme and host, so those are not credited to the rewrite.
+    
+    Args:
+        submitted_url (str): The URL as submitted
+        canonical_url (str): Dedupe key of the URL after canonicalization
+        
+    Returns:
+        bool: True if the submitted URL alone would not have matched
+    """
+    try:
+        return canonicalize_url(submitted_url) != canonical_url
+    except ValueError:
+        return True
+
+# Redirects count clicks synchronously unless the async pipeline is enabled
+click_pipeline = None
+if app.config['CLICK_PIPELINE_ENABLED']:
+    click_pipeline = ClickPipeline(apply_click_batch,
+                                   flush_interval=app.config['CLICK_FLUSH_INTERVAL_MS'] / 1000,
+                                   max_staleness=app.config['CLICK_MAX_STALENESS_MS'] / 1000)
+    click_pipeline.start()
 
 @app.route('/')
 def health_check():
@@ -23,6 +104,45 @@ def api_health():
         "message": "URL Shortener API is running"
     })
 
+@app.route('/api/metrics')
+def get_metrics():
+    """
+    Internal service metrics.
+    
+    Returns:
+    {
+        "code_pool": {"enabled": true, "size": 950, "hits": 50, ...},
+        "bloom_filter": {"enabled": false}
+    }
+    """
+    code_pool_metrics = {"enabled": False}
+    if code_pool is not None:
+        code_pool_metrics = {"enabled": True, **code_pool.get_metrics()}
+    
+    click_pipeline_metrics = {"enabled": False}
+    if click_pipeline is not None:
+        click_pipeline_metrics = {"enabled": True, **click_pipeline.get_metrics()}
+    
+    canonicalizer_metrics = {"enabled": False}
+    if canonicalizer is not None:
+        canonicalizer_metrics = {"enabled": True, **canonicalizer.get_metrics()}
+    
+    blocklist_metrics = {"enabled": False}
+    if blocklist is not None:
+        blocklist_metrics = {"enabled": True, **blocklist.get_metrics()}
+    if blocklist_sweeper is not None:
+        blocklist_metrics["sweeper"] = blocklist_sweeper.get_metrics()
+    
+    return jsonify({
+        "code_pool": code_pool_metrics,
+        "click_pipeline": click_pipeline_metrics,
+        "canonicalization": canonicalizer_metrics,
+        "blocklist": blocklist_metrics,
+        "top_links": top_links.get_metrics(),
+        "url_validation_cache": url_cache_info(),
+        **url_store.get_metrics()
+    })
+
 @app.route('/api/shorten', methods=['POST'])
 def shorten_url():
     """
@@ -72,6 +192,11 @@ def shorten_url():
         
         original_url = data['url']
         
+        # Equivalent spellings of a URL are stored, deduplicated and cached
+        # under one canonical form
+        if canonicalizer is not None:
+            original_url = canonicalizer.canonicalize(data['url'])
+        
         # Validate URL
         if not validate_url(original_url):
             logger.warning(f"Invalid URL provided: {original_url}")
@@ -79,24 +204,53 @@ def shorten_url():
                 "error": "Invalid URL format"
             }), 400
         
+        if blocklist is not None:
+            blocked_by = blocklist.match(url_host(original_url))
+            if blocked_by is not None:
+                logger.warning(f"Refusing to shorten URL on blocked domain {blocked_by}: {original_url}")
+                return jsonify({
+                    "error": "URL domain is blocked"
+                }), 403
+        
+        # In dedupe mode the first candidate is derived from the URL itself,
+        # so repeat submissions resolve to the same code
+        canonical_url = None
+        if app.config['DEDUPE_ENABLED']:
+            canonical_url = canonicalize_url(original_url)
+        
         # Generate short code with collision handling
         max_attempts = 5
         for attempt in range(max_attempts):
             try:
-                existing_codes = url_store.get_existing_codes()
-                short_code = generate_short_code(existing_codes=existing_codes)
-                
                 # Try to add the URL mapping
-                if url_store.add_url(short_code, original_url):
+                if canonical_url is not None:
+                    if attempt == 0:
+                        candidate = content_code(canonical_url, app.config['SHORT_CODE_LENGTH'])
+                    else:
+                        candidate = code_source.next_unused_code()
+                    short_code, created = url_store.add_or_get_url(candidate, original_url, canonical_url)
+                else:
+                    if attempt == 0:
+                        short_code = code_source.next_code()
+                    else:
+                        short_code = code_source.next_unused_code()
+                    created = url_store.add_url(short_code, original_url)
+                    if not created:
+                        short_code = None
+                
+                if short_code:
                     short_url = f"{request.host_url}{short_code}"
                     
-                    logger.info(f"Successfully shortened URL: {original_url} -> {short_code}")
+                    if created:
+                        logger.info(f"Successfully shortened URL: {original_url} -> {short_code}")
+                    elif canonicalizer is not None and rewrite_deduplicated(data['url'], canonical_url):
+                        canonicalizer.record_dedupe_hit()
                     return jsonify({
                         "short_code": short_code,
                         "short_url": short_url
-                    }), 201
+                    }), 201 if created else 200
                 
-                # If add_url returns False, there was a collision, try again
+                # If the mapping was not added, there was a collision, try again
                 logger.warning(f"Short code collision on attempt {attempt + 1}")
                 
             except Exception as e:
@@ -115,6 +269,339 @@ def shorten_url():
             "error": "Internal server error"
         }), 500
 
+@app.route('/api/shorten/batch', methods=['POST'])
+def shorten_urls():
+    """
+    Shorten many URLs in one request.
+    
+    URLs are validated together, their codes are allocated in one call and
+    the links are inserted with one store lock acquisition (one per shard
+    for the sharded store, one transaction for SQLite). A bad URL only fails
+    its own entry.
+    
+    Expected JSON payload:
+    {
+        "urls": ["https://www.example.com/a", "https://www.example.com/b", ...]
+    }
+    
+    Returns (entries in request order, "status" as /api/shorten would answer):
+    {
+        "results": [
+            {"short_code": "abc123", "short_url": "http://localhost:5000/abc123", "status": 201},
+            {"error": "Invalid URL format", "status": 400},
+            ...
+        ],
+        "created": 1
+    }
+    """
+    logger.info("POST /api/shorten/batch - Request received")
+    
+    try:
+        if not request.is_json:
+            logger.warning("Request is not JSON")
+            return jsonify({
+                "error": "Content-Type must be application/json"
+            }), 400
+        
+        try:
+            data = request.get_json()
+        except Exception as e:
+            logger.warning(f"Invalid JSON in request: {str(e)}")
+            return jsonify({
+                "error": "Invalid JSON format"
+            }), 400
+        
+        max_urls = app.config['SHORTEN_BATCH_MAX_URLS']
+        submitted = data.get('urls') if isinstance(data, dict) else None
+        if not isinstance(submitted, list) or not 1 <= len(submitted) <= max_urls:
+            logger.warning("Missing or oversized 'urls' list in batch request")
+            return jsonify({
+                "error": f"'urls' must be a list of 1 to {max_urls} URLs"
+            }), 400
+        
+        urls = submitted
+        if canonicalizer is not None:
+            urls = [canonicalizer.canonicalize(url) for url in submitted]
+        
+        results = [None] * len(urls)
+        pending = []
+        for position, ok, _ in validate_urls(urls):
+            if not ok:
+                results[position] = {"error": "Invalid URL format", "status": 400}
+                continue
+            if blocklist is not None and blocklist.match(url_host(urls[position])) is not None:
+                results[position] = {"error": "URL domain is blocked", "status": 403}
+                continue
+            pending.append(position)
+        rejected = len(urls) - len(pending)
+        if rejected:
+            logger.warning(f"Rejected {rejected} of {len(urls)} URLs in batch")
+        
+        canonical_urls = None
+        if app.config['DEDUPE_ENABLED']:
+            canonical_urls = {position: canonicalize_url(urls[position]) for position in pending}
+        
+        # Codes that collide are retried with fresh codes, as in shorten_url
+        created_count = 0
+        max_attempts = 5
+        for attempt in range(max_attempts):
+            if not pending:
+                break
+            if canonical_urls is not None:
+                if attempt == 0:
+                    codes = [content_code(canonical_urls[position], app.config['SHORT_CODE_LENGTH'])
+                             for position in pending]
+                else:
+                    codes = code_source.next_unused_codes(len(pending))
+                outcomes = url_store.add_or_get_urls(
+                    [(code, urls[position], canonical_urls[position])
+                     for code, position in zip(codes, pending)])
+            else:
+                if attempt == 0:
+                    codes = code_source.next_codes(len(pending))
+                else:
+                    codes = code_source.next_unused_codes(len(pending))
+                added = url_store.add_urls([(code, urls[position])
+                                            for code, position in zip(codes, pending)])
+                outcomes = [(code if created else None, created) for code, created in zip(codes, added)]
+            
+            retry = []
+            for position, (short_code, created) in zip(pending, outcomes):
+                if short_code is None:
+                    retry.append(position)
+                    continue
+                if created:
+                    created_count += 1
+                elif (canonicalizer is not None
+                      and rewrite_deduplicated(submitted[position], canonical_urls[position])):
+                    canonicalizer.record_dedupe_hit()
+                results[position] = {
+                    "short_code": short_code,
+                    "short_url": f"{request.host_url}{short_code}",
+                    "status": 201 if created else 200
+                }
+            if retry:
+                logger.warning(f"Short code collisions for {len(retry)} URLs on attempt {attempt + 1}")
+            pending = retry
+        
+        if pending:
+            logger.error(f"Failed to generate unique short codes for {len(pending)} URLs")
+            for position in pending:
+                results[position] = {"error": "Unable to generate short code, please try again",
+                                     "status": 500}
+        
+        logger.info(f"Batch shortened {created_count} of {len(urls)} URLs")
+        return jsonify({
+            "results": results,
+            "created": created_count
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Unexpected error in shorten_urls: {str(e)}")
+        return jsonify({
+            "error": "Internal server error"
+        }), 500
+
+# Bytes read from the request body at a time by /api/import
+IMPORT_READ_BUFFER = 64 * 1024
+
+def parse_import_line(line):
+    """
+    Turn one NDJSON line of an import into a record.
+    
+    Args:
+        line (bytes): The line, as exported by /api/export or just {"url": ...}
+        
+    Returns:
+        tuple: (short_code or None to allocate one, URLRecord)
+        
+    Raises:
+        ValueError: If the line is not a valid entry
+        TypeError: If a timestamp field is not a string
+    """
+    entry = json.loads(line)
+    if not isinstance(entry, dict) or not isinstance(entry.get('url'), str):
+        raise ValueError("expected an object with a string 'url' field")
+    short_code = entry.get('short_code')
+    if short_code is not None and not is_valid_short_code(short_code):
+        raise ValueError(f"invalid short code: {short_code}")
+    # JSON true is a Python int, so it is ruled out explicitly
+    clicks = entry.get('clicks', 0)
+    if isinstance(clicks, bool) or not isinstance(clicks, int) or clicks < 0:
+        raise ValueError("clicks must be a non-negative integer")
+    disabled = entry.get('disabled', False)
+    if not isinstance(disabled, bool):
+        raise ValueError("disabled must be true or false")
+    
+    # Times ahead of this host's clock (a peer's skew) are clamped to now:
+    # a future creation time would advance the links-per-hour ring and
+    # zero the buckets of the last few hours
+    now = now_micros()
+    created_at = parse_timestamp(entry.get('created_at'))
+    created_at = now if created_at is None else min(created_at, now)
+    last_accessed = parse_timestamp(entry.get('last_accessed'))
+    if last_accessed is not None:
+        last_accessed = min(last_accessed, now)
+    record = URLRecord(entry['url'], created_at, clicks, last_accessed, disabled=disabled)
+    return short_code, record
+
+def import_chunk(chunk, counts, errors):
+    """
+    Validate and insert one chunk of parsed import lines.
+    
+    Args:
+        chunk (list): (line number, short code or None, URLRecord)
+        counts (dict): Running imported/skipped/failed totals, updated in place
+        errors (list): Per-line error messages, appended to up to IMPORT_MAX_ERRORS
+    """
+    def fail(line_number, message):
+        counts['failed'] += 1
+        if len(errors) < app.config['IMPORT_MAX_ERRORS']:
+            errors.append({"line": line_number, "error": message})
+    
+    # Imported URLs are canonicalized, validated and checked against the
+    # blocklist exactly as shortened ones are
+    urls = [record.url for _, _, record in chunk]
+    if canonicalizer is not None:
+        urls = [canonicalizer.canonicalize(url) for url in urls]
+    
+    valid = []
+    for position, ok, reason in validate_urls(urls):
+        line_number, _, record = chunk[position]
+        if not ok:
+            fail(line_number, f"Invalid URL format: {reason}")
+            continue
+        if blocklist is not None and blocklist.match(url_host(urls[position])) is not None:
+            fail(line_number, "URL domain is blocked")
+            continue
+        record.url = urls[position]
+        if app.config['DEDUPE_ENABLED']:
+            record.canonical_url = canonicalize_url(record.url)
+        valid.append(chunk[position])
+    
+    # Codes from the source cluster are kept; a taken one skips the line.
+    # Lines without a code get fresh ones, retried on collision.
+    allocated = [entry for entry in valid if entry[1] is None]
+    kept = [entry for entry in valid if entry[1] is not None]
+    if kept:
+        for created in url_store.import_records([(short_code, record) for _, short_code, record in kept]):
+            counts['imported' if created else 'skipped'] += 1
+    for attempt in range(5):
+        if not allocated:
+            break
+        if attempt == 0:
+            codes = code_source.next_codes(len(allocated))
+        else:
+            codes = code_source.next_unused_codes(len(allocated))
+        added = url_store.import_records([(code, record) for code, (_, _, record) in zip(codes, allocated)])
+        counts['imported'] += sum(added)
+        allocated = [entry for entry, created in zip(allocated, added) if not created]
+    for line_number, _, _ in allocated:
+        fail(line_number, "Unable to generate short code")
+
+@app.route('/api/import', methods=['POST'])
+def import_links():
+    """
+    Import links from an NDJSON request body, e.g. another cluster's export.
+    
+    The body is read as a stream and validated and inserted BULK_CHUNK_SIZE
+    lines at a time, so memory stays bounded however many links it holds.
+    Each line is an object with a "url" and optionally the "short_code",
+    "clicks", "created_at", "last_accessed" and "disabled" fields written by
+    /api/export. URLs go through the same canonicalization, validation and
+    blocklist check as /api/shorten, and timestamps ahead of the server's
+    clock are clamped to now. Lines with a short code already in use are
+    skipped; bad lines are counted and the first IMPORT_MAX_ERRORS are
+    reported.
+    
+    Returns:
+    {
+        "imported": 99998,
+        "skipped": 1,
+        "failed": 1,
+        "errors": [{"line": 42, "error": "Invalid URL format: not a valid http(s) URL"}]
+    }
+    """
+    logger.info("POST /api/import - Import request received")
+    
+    try:
+        counts = {'imported': 0, 'skipped': 0, 'failed': 0}
+        errors = []
+        chunk = []
+        chunk_size = app.config['BULK_CHUNK_SIZE']
+        # The raw stream yields lines a byte-sized read at a time; buffer it
+        lines = io.BufferedReader(request.stream, IMPORT_READ_BUFFER)
+        for line_number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                short_code, record = parse_import_line(line)
+            except (ValueError, TypeError) as e:
+                counts['failed'] += 1
+                if len(errors) < app.config['IMPORT_MAX_ERRORS']:
+                    errors.append({"line": line_number, "error": str(e)})
+                continue
+            chunk.append((line_number, short_code, record))
+            if len(chunk) >= chunk_size:
+                import_chunk(chunk, counts, errors)
+                chunk = []
+        if chunk:
+            import_chunk(chunk, counts, errors)
+        
+        logger.info(f"Imported {counts['imported']} links ({counts['skipped']} skipped, "
+                    f"{counts['failed']} failed)")
+        return jsonify({**counts, "errors": errors}), 200
+        
+    except Exception as e:
+        logger.error(f"Unexpected error in import_links: {str(e)}")
+        return jsonify({
+            "error": "Internal server error"
+        }), 500
+
+@app.route('/api/export')
+def export_links():
+    """
+    Stream every link as NDJSON, in the format /api/import reads.
+    
+    Records are read from the store a chunk at a time while the response is
+    being sent, so no snapshot of the whole store is built and the store
+    lock is only held per chunk. Links added during the export may or may
+    not be included.
+    
+    Returns:
+        NDJSON, one object per line:
+        {"short_code": "abc123", "url": "https://...", "clicks": 5,
+         "created_at": "...", "last_accessed": "...", "disabled": false}
+    """
+    logger.info("GET /api/export - Export request received")
+    
+    if click_pipeline is not None:
+        click_pipeline.flush_if_stale()
+    chunk_size = app.config['BULK_CHUNK_SIZE']
+    
+    def generate():
+        lines = []
+        exported = 0
+        for short_code, record in url_store.iter_records(chunk_size):
+            lines.append(json.dumps({
+                "short_code": short_code,
+                "url": record.url,
+                "clicks": record.clicks,
+                "created_at": format_timestamp(record.created_at),
+                "last_accessed": format_timestamp(record.last_accessed),
+                "disabled": record.disabled
+            }) + '\n')
+            if len(lines) >= chunk_size:
+                exported += len(lines)
+                yield ''.join(lines)
+                lines = []
+        if lines:
+            exported += len(lines)
+            yield ''.join(lines)
+        logger.info(f"Exported {exported} links")
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 @app.route('/<path:short_code>')
 def redirect_url(short_code):
     """
@@ -124,7 +611,7 @@ def redirect_url(short_code):
         short_code (str): The short code to redirect
         
     Returns:
-        Redirect response or 404 if not found
+        Redirect response, 404 if not found or 410 if the link was disabled
     """
     logger.info(f"GET /{short_code} - Redirect request received")
     
@@ -136,8 +623,8 @@ def redirect_url(short_code):
                 "error": "Invalid short code format"
             }), 404
         
-        # Get the original URL first
-        original_url = url_store.get_url(short_code)
+        # Get the original URL first; the disabled flag comes from the same lookup
+        original_url, disabled = url_store.resolve(short_code)
         
         if not original_url:
             # Check if it's a format issue or just not found
@@ -152,8 +639,23 @@ def redirect_url(short_code):
                     "error": "Short code not found"
                 }), 404
         
-        # Increment click count
-        if not url_store.increment_clicks(short_code):
+        if disabled:
+            logger.warning(f"Short code disabled: {short_code}")
+            return jsonify({
+                "error": "This link has been disabled"
+            }), 410
+        
+        # Increment click count; visitors are identified by IP and user agent
+        # for the unique click estimate
+        user_agent = request.headers.get('User-Agent', '')
+        details = ClickDetails(visitor_hash(request.remote_addr or '', user_agent),
+                               referrer_host(request.referrer),
+                               classify_user_agent(user_agent))
+        if click_pipeline is not None:
+            click_pipeline.record(short_code, details)
+        elif url_store.increment_clicks(short_code, details):
+            top_links.record(short_code)
+        else:
             logger.error(f"Failed to increment clicks for {short_code}")
             # Don't fail the redirect, just log the error
         
@@ -166,6 +668,90 @@ def redirect_url(short_code):
             "error": "Internal server error"
         }), 500
 
+@app.route('/api/stats')
+def get_global_stats():
+    """
+    Service-wide totals, maintained on write so this never scans the links.
+    
+    Returns:
+    {
+        "links": 1200,
+        "clicks": 45000,
+        "links_per_hour": [{"start": "2024-01-01T10:00:00+00:00", "count": 12}, ...],
+        "clicks_per_hour": [{"start": "2024-01-01T10:00:00+00:00", "count": 530}, ...]
+    }
+    """
+    logger.info("GET /api/stats - Global stats request received")
+    
+    try:
+        if click_pipeline is not None:
+            click_pipeline.flush_if_stale()
+        
+        totals = url_store.get_totals()
+        return jsonify({
+            "links": totals['links'],
+            "clicks": totals['clicks'],
+            "links_per_hour": [{"start": format_timestamp(start), "count": count}
+                               for start, count in totals['links_per_hour']],
+            "clicks_per_hour": [{"start": format_timestamp(start), "count": count}
+                                for start, count in totals['clicks_per_hour']]
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Unexpected error in get_global_stats: {str(e)}")
+        return jsonify({
+            "error": "Internal server error"
+        }), 500
+
+@app.route('/api/stats/top')
+def get_top_links():
+    """
+    Get the most-clicked links in a sliding window.
+    
+    Query parameters:
+        k: Number of links (1-100, default 10)
+        window: '1m', '1h' (default) or '24h'
+    
+    Returns:
+    {
+        "window": "1h",
+        "links": [{"short_code": "abc123", "clicks": 42, "max_overcount": 0}, ...]
+    }
+    """
+    logger.info("GET /api/stats/top - Top links request received")
+    
+    try:
+        window = request.args.get('window', '1h')
+        if window not in WINDOWS:
+            logger.warning(f"Invalid top links window: {window}")
+            return jsonify({
+                "error": f"window must be one of: {', '.join(WINDOWS)}"
+            }), 400
+        
+        k = request.args.get('k', 10, type=int)
+        if k is None or not 1 <= k <= 100:
+            logger.warning(f"Invalid top links k: {request.args.get('k')}")
+            return jsonify({
+                "error": "k must be an integer between 1 and 100"
+            }), 400
+        
+        if click_pipeline is not None:
+            click_pipeline.flush_if_stale()
+        
+        # Links deleted since they were clicked are skipped
+        links = top_links.top(k, window, keep=url_store.contains)
+        return jsonify({
+            "window": window,
+            "links": [{"short_code": short_code, "clicks": clicks, "max_overcount": error}
+                      for short_code, clicks, error in links]
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Unexpected error in get_top_links: {str(e)}")
+        return jsonify({
+            "error": "Internal server error"
+        }), 500
+
 @app.route('/api/stats/<short_code>')
 def get_stats(short_code):
     """
@@ -178,6 +764,7 @@ def get_stats(short_code):
     {
         "url": "https://www.example.com/very/long/url",
         "clicks": 5,
+        "unique_clicks": 3,
         "created_at": "2024-01-01T10:00:00"
     }
     """
@@ -191,6 +778,10 @@ def get_stats(short_code):
                 "error": "Invalid short code format"
             }), 404
         
+        # Bound how far behind asynchronously counted clicks may be
+        if click_pipeline is not None:
+            click_pipeline.flush_if_stale()
+        
         # Get stats first
         stats = url_store.get_stats(short_code)
         
@@ -211,6 +802,7 @@ def get_stats(short_code):
         response_data = {
             "url": stats['url'],
             "clicks": stats['clicks'],
+            "unique_clicks": stats['unique_clicks'],
             "created_at": stats['created_at']
         }
         
@@ -223,6 +815,174 @@ def get_stats(short_code):
             "error": "Internal server error"
         }), 500
 
+@app.route('/api/stats/<short_code>/timeseries')
+def get_timeseries(short_code):
+    """
+    Get the click history for a short code.
+    
+    Query parameters:
+        resolution: 'minute' (last 60), 'hour' (last 48) or 'day' (last 90)
+        limit: Number of most recent buckets to return
+    
+    Args:
+        short_code (str): The short code to get the history for
+        
+    Returns:
+    {
+        "short_code": "abc123",
+        "resolution": "hour",
+        "buckets": [{"start": "2024-01-01T10:00:00+00:00", "clicks": 5}, ...]
+    }
+    """
+    logger.info(f"GET /api/stats/{short_code}/timeseries - Time series request received")
+    
+    try:
+        resolution = request.args.get('resolution', 'minute')
+        if resolution not in RESOLUTIONS:
+            logger.warning(f"Invalid time series resolution: {resolution}")
+            return jsonify({
+                "error": f"resolution must be one of: {', '.join(RESOLUTIONS)}"
+            }), 400
+        
+        max_buckets = RESOLUTIONS[resolution][1]
+        limit = request.args.get('limit', max_buckets, type=int)
+        if limit is None or not 1 <= limit <= max_buckets:
+            logger.warning(f"Invalid time series limit: {request.args.get('limit')}")
+            return jsonify({
+                "error": f"limit must be an integer between 1 and {max_buckets}"
+            }), 400
+        
+        if click_pipeline is not None:
+            click_pipeline.flush_if_stale()
+        
+        buckets = url_store.get_timeseries(short_code, resolution, limit)
+        
+        if buckets is None:
+            if not is_valid_short_code(short_code):
+                logger.warning(f"Invalid short code format: {short_code}")
+                return jsonify({
+                    "error": "Invalid short code format"
+                }), 404
+            else:
+                logger.warning(f"Time series requested for non-existent code: {short_code}")
+                return jsonify({
+                    "error": "Short code not found"
+                }), 404
+        
+        return jsonify({
+            "short_code": short_code,
+            "resolution": resolution,
+            "buckets": [{"start": format_timestamp(start), "clicks": clicks}
+                        for start, clicks in buckets]
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Unexpected error in get_timeseries: {str(e)}")
+        return jsonify({
+            "error": "Internal server error"
+        }), 500
+
+@app.route('/api/stats/<short_code>/breakdown')
+def get_breakdown(short_code):
+    """
+    Get clicks for a short code by referrer host and user agent family.
+    
+    Only the top values are listed; clicks from all other values are
+    counted under "other".
+    
+    Args:
+        short_code (str): The short code to get the breakdown for
+        
+    Returns:
+    {
+        "short_code": "abc123",
+        "referrers": {"top": [{"name": "news.example.com", "clicks": 12}, ...], "other": 3},
+        "user_agents": {"top": [{"name": "Firefox", "clicks": 9}, ...], "other": 0}
+    }
+    """
+    logger.info(f"GET /api/stats/{short_code}/breakdown - Breakdown request received")
+    
+    try:
+        if click_pipeline is not None:
+            click_pipeline.flush_if_stale()
+        
+        breakdowns = url_store.get_breakdowns(short_code)
+        
+        if breakdowns is None:
+            if not is_valid_short_code(short_code):
+                logger.warning(f"Invalid short code format: {short_code}")
+                return jsonify({
+                    "error": "Invalid short code format"
+                }), 404
+            else:
+                logger.warning(f"Breakdown requested for non-existent code: {short_code}")
+                return jsonify({
+                    "error": "Short code not found"
+                }), 404
+        
+        return jsonify({"short_code": short_code, **breakdowns}), 200
+        
+    except Exception as e:
+        logger.error(f"Unexpected error in get_breakdown: {str(e)}")
+        return jsonify({
+            "error": "Internal server error"
+        }), 500
+
+@app.route('/api/domains/<host>/links')
+def get_domain_links(host):
+    """
+    List the links pointing at a host, a page at a time.
+    
+    Links are listed in a stable order, so following next_cursor until it is
+    null visits every link on the host once. Totals cover the whole host.
+    
+    Query parameters:
+        cursor: next_cursor from the previous page
+        limit: Number of links per page (1-1000, default 100)
+    
+    Args:
+        host (str): Host name, matched exactly (subdomains are separate hosts)
+        
+    Returns:
+    {
+        "host": "example.com",
+        "links": [{"short_code": "abc123", "url": "https://example.com/a", "clicks": 4,
+                   "created_at": "...", "last_accessed": "...", "disabled": false}, ...],
+        "next_cursor": "100",
+        "total_links": 250,
+        "total_clicks": 1234
+    }
+    """
+    logger.info(f"GET /api/domains/{host}/links - Domain links request received")
+    
+    try:
+        limit = request.args.get('limit', DEFAULT_HOST_PAGE, type=int)
+        if limit is None or not 1 <= limit <= MAX_HOST_PAGE:
+            logger.warning(f"Invalid domain links limit: {request.args.get('limit')}")
+            return jsonify({
+                "error": f"limit must be an integer between 1 and {MAX_HOST_PAGE}"
+            }), 400
+        
+        if click_pipeline is not None:
+            click_pipeline.flush_if_stale()
+        
+        host = host.lower().rstrip('.')
+        try:
+            result = url_store.get_links_by_host(host, request.args.get('cursor'), limit)
+        except ValueError:
+            logger.warning(f"Invalid domain links cursor: {request.args.get('cursor')}")
+            return jsonify({
+                "error": "Invalid cursor"
+            }), 400
+        
+        return jsonify({"host": host, **result}), 200
+        
+    except Exception as e:
+        logger.error(f"Unexpected error in get_domain_links: {str(e)}")
+        return jsonify({
+            "error": "Internal server error"
+        }), 500
+
 @app.errorhandler(404)
 def not_found(error):
     """Handle 404 errors."""
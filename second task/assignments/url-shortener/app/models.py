@@ -1,20 +1,457 @@
+import sys
 import threading
 import time
-from datetime import datetime, timezone
-from typing import Dict, Optional
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, NamedTuple, Optional, Tuple
 import logging
+from .bloom import BloomFilter
+from .breakdown import ClickBreakdowns, empty_breakdowns
+from .hll import HyperLogLog
+from .config import Config
+from .persistence import WriteAheadLog
+from .timeseries import (HOUR_MICROS, MINUTE_MICROS, BucketRing, ClickTimeSeries,
+                         empty_buckets, sum_buckets)
+from .utils import url_host
 
 logger = logging.getLogger(__name__)
 
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Hours of link creation and click history kept for the global totals
+TOTALS_HOURS = 24
+
+# A thread's closed per-thread counter entries are folded into the records
+# once this many are waiting, or once they have waited this long
+COUNTER_FOLD_ENTRIES = 256
+COUNTER_FOLD_AGE_MICROS = 1_000_000
+# A thread closes all of its open entries once it holds this many, so reads
+# that scan the open entries stay cheap even within a busy minute
+COUNTER_OPEN_ENTRIES = 1024
+
+# Page size limits for per-host link listings
+DEFAULT_HOST_PAGE = 100
+MAX_HOST_PAGE = 1000
+
+def now_micros() -> int:
+    """
+    Current UTC time as integer microseconds since the epoch.
+    """
+    return time.time_ns() // 1000
+
+def format_timestamp(micros: Optional[int]) -> Optional[str]:
+    """
+    Format an epoch-microseconds timestamp as an ISO-8601 UTC string.
+    
+    Args:
+        micros (int): Microseconds since the epoch, or None
+        
+    Returns:
+        str: ISO-8601 string (same format as datetime.isoformat()), or None
+    """
+    if micros is None:
+        return None
+    return (EPOCH + timedelta(microseconds=micros)).isoformat()
+
+def parse_timestamp(text: Optional[str]) -> Optional[int]:
+    """
+    Parse a timestamp written by format_timestamp back to epoch microseconds.
+    
+    Args:
+        text (str): ISO-8601 string, or None; a string without an offset is taken as UTC
+        
+    Returns:
+        int: Microseconds since the epoch, or None
+        
+    Raises:
+        ValueError: If the string is not an ISO-8601 timestamp
+    """
+    if text is None:
+        return None
+    moment = datetime.fromisoformat(text)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return (moment - EPOCH) // timedelta(microseconds=1)
+
+class ClickDetails(NamedTuple):
+    """
+    Attributes of a single click, captured by redirect_url.
+    """
+    
+    visitor: Optional[int] = None  # hashed client fingerprint, for unique clicks
+    referrer: Optional[str] = None  # referrer host, None for direct traffic
+    agent: Optional[str] = None  # user agent family
+
+class HostLinks:
+    """
+    The links that point at one host, for the host index.
+    
+    codes is append-only, so a position in it is a stable pagination
+    cursor; clicks is the running click total of those links.
+    """
+    
+    __slots__ = ('codes', 'clicks')
+    
+    def __init__(self):
+        self.codes = []
+        self.clicks = 0
+
+class URLRecord:
+    """
+    Compact record for a single URL mapping.
+    
+    Uses __slots__ instead of a per-record dict and stores timestamps as
+    integer epoch microseconds, formatting them only when stats are read.
+    canonical_url is set for records added through dedupe mode (and is the
+    same string object as url when the URL was already canonical), so the
+    dedupe index can be rebuilt from records alone. timeseries, visitors and
+    breakdowns stay None until the first click, so links that are never
+    visited pay nothing for their click analytics. disabled links are kept
+    but no longer redirect. host_links is the store's host index entry for
+    the URL's host, shared by every record on that host.
+    """
+    
+    __slots__ = ('url', 'clicks', 'created_at', 'last_accessed', 'canonical_url',
+                 'timeseries', 'visitors', 'breakdowns', 'disabled', 'host_links')
+    
+    def __init__(self, url: str, created_at: int, clicks: int = 0,
+                 last_accessed: Optional[int] = None, canonical_url: Optional[str] = None,
+                 disabled: bool = False):
+        self.url = url
+        self.clicks = clicks
+        self.created_at = created_at
+        self.last_accessed = last_accessed
+        self.canonical_url = canonical_url
+        self.timeseries = None
+        self.visitors = None
+        self.breakdowns = None
+        self.disabled = disabled
+        self.host_links = None
+    
+    def add_clicks(self, count: int, accessed_at: int, details=()):
+        """
+        Count clicks that happened at a point in time.
+        
+        Args:
+            count (int): Number of clicks
+            accessed_at (int): Click time in epoch microseconds
+            details (iterable): ClickDetails of the individual clicks, where known
+        """
+        self.clicks += count
+        if self.last_accessed is None or accessed_at > self.last_accessed:
+            self.last_accessed = accessed_at
+        if self.timeseries is None:
+            self.timeseries = ClickTimeSeries()
+        self.timeseries.add(accessed_at, count)
+        for detail in details:
+            self.add_details(detail)
+    
+    def add_details(self, detail: ClickDetails):
+        """
+        Feed one click's attributes into the unique visitor sketch and the
+        referrer / user agent breakdowns.
+        
+        Args:
+            detail (ClickDetails): The click's attributes
+        """
+        if detail.visitor is not None:
+            if self.visitors is None:
+                self.visitors = HyperLogLog()
+            self.visitors.add(detail.visitor)
+        if self.breakdowns is None:
+            self.breakdowns = ClickBreakdowns()
+        self.breakdowns.add(detail.referrer, detail.agent)
+    
+    def add_click_summary(self, visitors: Optional[HyperLogLog], referrals: Optional[Dict]):
+        """
+        Feed the aggregated attributes of many clicks into the unique
+        visitor sketch and the referrer / user agent breakdowns.
+        
+        Args:
+            visitors (HyperLogLog): Sketch of the clicks' visitors, or None
+            referrals (dict): (referrer host, user agent family) -> clicks, or None
+        """
+        if visitors is not None:
+            if self.visitors is None:
+                self.visitors = visitors.copy()
+            else:
+                self.visitors.merge(visitors)
+        if referrals:
+            if self.breakdowns is None:
+                self.breakdowns = ClickBreakdowns()
+            for (referrer, agent), count in referrals.items():
+                self.breakdowns.add(referrer, agent, count)
+    
+    def to_stats(self) -> Dict:
+        """
+        Build the public stats dict for this record.
+        
+        Returns:
+            dict: url, clicks, unique_clicks (estimated), created_at and
+                last_accessed (ISO-8601 strings)
+        """
+        return {
+            'url': self.url,
+            'clicks': self.clicks,
+            'unique_clicks': self.visitors.estimate() if self.visitors is not None else 0,
+            'created_at': format_timestamp(self.created_at),
+            'last_accessed': format_timestamp(self.last_accessed)
+        }
+    
+    def to_link_summary(self, short_code: str) -> Dict:
+        """
+        Build the entry for this record in a link listing.
+        
+        Args:
+            short_code (str): The record's short code
+            
+        Returns:
+            dict: short_code, url, clicks, created_at, last_accessed and disabled
+        """
+        return {
+            'short_code': short_code,
+            'url': self.url,
+            'clicks': self.clicks,
+            'created_at': format_timestamp(self.created_at),
+            'last_accessed': format_timestamp(self.last_accessed),
+            'disabled': self.disabled
+        }
+
+class ClickCounters:
+    """
+    Per-thread click counter slots, summed on read.
+    
+    Each thread owns a dict of short_code -> [clicks, last access, visitor
+    sketch, {(referrer, agent): clicks}] that only it writes to, so an
+    increment is a plain dict update with no lock and no read-modify-write
+    on the shared record. Click details are aggregated as they arrive, so an
+    entry stays the same size however many clicks it counts. An entry only
+    covers one minute: on the thread's first click in a new minute the owner
+    moves every open entry to its own closed deque, where it can no longer
+    change. It does the same once it holds open_entries, so a thread never
+    has more than that many open. drain() hands closed entries, and every
+    entry of threads that have exited, to the store to fold into its
+    records; read() sums the open entries that remain. add() tells the caller when its thread has
+    fold_entries closed entries waiting, or has had some waiting for
+    fold_age, so the store folds as it goes instead of leaving it all to the
+    next read.
+    """
+    
+    def __init__(self, fold_entries: int = COUNTER_FOLD_ENTRIES,
+                 fold_age: int = COUNTER_FOLD_AGE_MICROS,
+                 open_entries: int = COUNTER_OPEN_ENTRIES):
+        self.fold_entries = fold_entries
+        self.fold_age = fold_age
+        self.open_entries = open_entries
+        self._local = threading.local()
+        self._slots = []  # (owning thread, open entries, closed entries)
+        self._slots_lock = threading.Lock()
+    
+    def add(self, short_code: str, timestamp: int, details: Optional[ClickDetails] = None) -> bool:
+        """
+        Count one click in the calling thread's slot.
+        
+        Args:
+            short_code (str): The short code
+            timestamp (int): Access time in epoch microseconds
+            details (ClickDetails): The click's attributes, if known
+            
+        Returns:
+            bool: True if the closed entries should be folded now
+        """
+        local = self._local
+        slot = getattr(local, 'slot', None)
+        if slot is None:
+            slot = local.slot = {}
+            local.closed = deque()
+            local.minute = None
+            with self._slots_lock:
+                self._slots.append((threading.current_thread(), slot, local.closed))
+        closed = local.closed
+        
+        minute = timestamp // MINUTE_MICROS
+        if minute != local.minute or len(slot) >= self.open_entries:
+            # Close every entry, not just this code's, so codes that are not
+            # clicked again do not stay open
+            if slot and not closed:
+                local.closed_since = timestamp
+            for code, entry in list(slot.items()):
+                # Appended before it is removed, so a concurrent read may
+                # briefly count it twice but never misses it
+                closed.append((code, *entry))
+                del slot[code]
+            local.minute = minute
+        
+        entry = slot.get(short_code)
+        if entry is None:
+            entry = slot[short_code] = [0, timestamp, None, None]
+        entry[0] += 1
+        entry[1] = timestamp
+        if details is not None:
+            if details.visitor is not None:
+                if entry[2] is None:
+                    entry[2] = HyperLogLog()
+                entry[2].add(details.visitor)
+            referrals = entry[3]
+            if referrals is None:
+                referrals = entry[3] = {}
+            key = (details.referrer, details.agent)
+            referrals[key] = referrals.get(key, 0) + 1
+        
+        if not closed:
+            return False
+        return len(closed) >= self.fold_entries or timestamp - local.closed_since >= self.fold_age
+    
+    def read(self, short_code: str) -> List[Tuple[int, int, Optional[HyperLogLog], Optional[dict]]]:
+        """
+        Collect the open entries for a code across every slot.
+        
+        Args:
+            short_code (str): The short code
+            
+        Returns:
+            list: (clicks, latest access in epoch microseconds, copy of the
+                visitor sketch or None, copy of the clicks by (referrer,
+                agent) or None) per slot
+        """
+        entries = []
+        for _, slot, _ in tuple(self._slots):
+            entry = slot.get(short_code)
+            if entry is not None:
+                clicks, accessed_at, visitors, referrals = entry
+                entries.append((clicks, accessed_at,
+                                None if visitors is None else visitors.copy(),
+                                None if referrals is None else dict(referrals)))
+        return entries
+    
+    def read_all(self) -> List[Tuple[int, int]]:
+        """
+        Collect every open entry across every slot.
+        
+        Returns:
+            list: (clicks, latest access in epoch microseconds) per entry
+        """
+        entries = []
+        for _, slot, _ in tuple(self._slots):
+            entries.extend((entry[0], entry[1]) for entry in list(slot.values()))
+        return entries
+    
+    def read_codes(self) -> List[Tuple[str, int]]:
+        """
+        Collect the clicks of every open entry across every slot, by code.
+        
+        Returns:
+            list: (short_code, clicks) per entry
+        """
+        entries = []
+        for _, slot, _ in tuple(self._slots):
+            entries.extend((code, entry[0]) for code, entry in list(slot.items()))
+        return entries
+    
+    def drain(self) -> List[Tuple[str, int, int, Optional[HyperLogLog], Optional[dict]]]:
+        """
+        Remove and return every entry that will never be written again.
+        
+        Returns:
+            list: (short_code, clicks, latest access, visitor sketch, clicks
+                by (referrer, agent)) for closed entries and for all entries
+                of threads that have exited
+        """
+        # Decide liveness once: a thread that exits after this check keeps
+        # its slot until the next drain, and its entries are read only then
+        with self._slots_lock:
+            live = []
+            dead = []
+            for item in self._slots:
+                (live if item[0].is_alive() else dead).append(item)
+            if dead:
+                self._slots = live
+        
+        drained = []
+        for _, _, closed in live + dead:
+            # popleft is atomic against the owner's append
+            while True:
+                try:
+                    drained.append(closed.popleft())
+                except IndexError:
+                    break
+        for _, slot, _ in dead:
+            drained.extend((code, *entry) for code, entry in slot.items())
+        return drained
+    
+    def reset(self):
+        """Drop every counted click."""
+        with self._slots_lock:
+            for _, slot, closed in self._slots:
+                slot.clear()
+                closed.clear()
+    
+    def get_metrics(self) -> Dict:
+        """
+        Get slot usage.
+        
+        Returns:
+            dict: Number of thread slots, open counters and closed entries
+                waiting to be folded
+        """
+        with self._slots_lock:
+            slots = list(self._slots)
+        return {
+            'slots': len(slots),
+            'counters': sum(len(slot) for _, slot, _ in slots),
+            'unfolded_entries': sum(len(closed) for _, _, closed in slots)
+        }
+
 class URLStore:
     """
     Thread-safe in-memory storage for URL mappings and analytics.
     """
     
-    def __init__(self):
-        self._urls = {}  # short_code -> url_data
+    def __init__(self, bloom_filter: Optional[BloomFilter] = None,
+                 per_thread_counters: bool = False):
+        self._urls = {}  # short_code -> URLRecord
+        self._codes = []  # short codes in insertion order, for chunked scans
+        self._url_index = {}  # canonical url -> short_code, for deduplication
+        self._url_index_key_bytes = 0  # size of index keys not shared with records
+        self._hosts = {}  # host -> HostLinks, for per-domain listings
         self._lock = threading.RLock()  # Reentrant lock for thread safety
-        logger.info("URLStore initialized")
+        # Optional lock-free membership filter, lets lookups of codes that
+        # were never added return without touching the lock
+        self._bloom = bloom_filter
+        # Optional write-ahead log that every mutation is appended to
+        self._journal = None
+        # Optional lock-free per-thread click counters, merged into stats on read
+        self._counters = ClickCounters() if per_thread_counters else None
+        # Global totals, maintained on every write so reading them is O(1)
+        self._total_clicks = 0
+        self._links_per_hour = BucketRing(HOUR_MICROS, TOTALS_HOURS)
+        self._clicks_per_hour = BucketRing(HOUR_MICROS, TOTALS_HOURS)
+        logger.info(f"URLStore initialized (bloom_filter={bloom_filter is not None}, "
+                    f"per_thread_counters={per_thread_counters})")
+    
+    def attach_journal(self, journal):
+        """
+        Append all further mutations to a write-ahead log.
+        
+        Args:
+            journal (WriteAheadLog): The log to write to
+        """
+        with self._lock:
+            self._journal = journal
+    
+    def might_contain(self, short_code: str) -> bool:
+        """
+        Cheap lock-free membership pre-check.
+        
+        Args:
+            short_code (str): The short code
+            
+        Returns:
+            bool: False if the code is definitely not stored, True if it may be
+        """
+        if self._bloom is None:
+            return True
+        return self._bloom.might_contain(short_code)
     
     def add_url(self, short_code: str, original_url: str) -> bool:
         """
@@ -27,21 +464,241 @@ class URLStore:
         Returns:
             bool: True if added successfully, False if code already exists
         """
+        return self._add(short_code, original_url, url_host(original_url))
+    
+    def add_urls(self, items) -> List[bool]:
+        """
+        Add many URL mappings under a single lock acquisition.
+        
+        Args:
+            items (iterable): (short_code, original_url) pairs
+            
+        Returns:
+            list: For each item in order, True if added, False if the code
+                already exists
+        """
+        return self._add_many([(short_code, original_url, None, url_host(original_url))
+                               for short_code, original_url in items])
+    
+    def _add_many(self, items, index: bool = True) -> List[bool]:
+        # Items are (short_code, original_url, canonical_url, host); hosts are
+        # parsed by the caller so the lock only covers the inserts
         with self._lock:
-            if short_code in self._urls:
-                logger.warning(f"Attempted to add existing short code: {short_code}")
-                return False
+            lsns = [self._insert(short_code, original_url, host, canonical_url, index)
+                    for short_code, original_url, canonical_url, host in items]
+        
+        # Sequence numbers only grow, so waiting for the last covers the batch
+        written = [lsn for lsn in lsns if lsn is not None]
+        if written and self._journal is not None:
+            self._journal.wait_durable(written[-1])
+        return [lsn is not None for lsn in lsns]
+    
+    def _add(self, short_code: str, original_url: str, host: Optional[str],
+             canonical_url: Optional[str] = None, index: bool = True) -> bool:
+        with self._lock:
+            lsn = self._insert(short_code, original_url, host, canonical_url, index)
+        
+        if lsn is None:
+            return False
+        if self._journal is not None:
+            self._journal.wait_durable(lsn)
+        return True
+    
+    def _insert(self, short_code: str, original_url: str, host: Optional[str],
+                canonical_url: Optional[str] = None, index: bool = True) -> Optional[int]:
+        """
+        Insert a new record. Must be called with self._lock held.
+        
+        Args:
+            host (str): url_host(original_url), parsed before taking the lock
+            index (bool): Add canonical_url to this store's dedupe index;
+                ShardedURLStore keeps its own index and passes False
+        
+        Returns:
+            int: Journal sequence number of the insert (0 without a journal),
+                or None if the code already exists
+        """
+        if short_code in self._urls:
+            logger.warning(f"Attempted to add existing short code: {short_code}")
+            return None
+        
+        record = URLRecord(original_url, now_micros(), canonical_url=canonical_url)
+        lsn = self._insert_record(short_code, record, host, index)
+        logger.info(f"Added URL mapping: {short_code} -> {original_url}")
+        return lsn
+    
+    def _insert_record(self, short_code: str, record: URLRecord, host: Optional[str],
+                       index: bool = True) -> int:
+        """
+        Store a record under a code that is not yet in use, and journal it.
+        Must be called with self._lock held.
+        
+        Args:
+            host (str): url_host(record.url), parsed before taking the lock
+        
+        Returns:
+            int: Journal sequence number of the last entry written (0 without a journal)
+        """
+        self._urls[short_code] = record
+        self._codes.append(short_code)
+        self._links_per_hour.add(record.created_at)
+        self._total_clicks += record.clicks
+        if self._bloom is not None:
+            self._bloom.add(short_code)
+        if record.canonical_url is not None and index:
+            self._index_url(record.canonical_url, short_code)
+        self._index_host(short_code, record, host)
+        
+        if self._journal is None:
+            return 0
+        lsn = self._journal.log_add(short_code, record)
+        # Imported records can arrive with history
+        if record.clicks or record.last_accessed is not None:
+            lsn = self._journal.log_clicks(short_code, record)
+        if record.disabled:
+            lsn = self._journal.log_disable(short_code)
+        return lsn
+    
+    def import_records(self, items, index: bool = True, hosts=None) -> List[bool]:
+        """
+        Add complete records, e.g. from another cluster's export, under a
+        single lock acquisition. Codes already in use are skipped. A record
+        whose canonical URL is already indexed keeps its code but is not
+        indexed, so dedupe keeps resolving to the existing link.
+        
+        Args:
+            items (iterable): (short_code, URLRecord) pairs
+            index (bool): Use this store's dedupe index; ShardedURLStore
+                keeps its own and passes False
+            hosts (list): url_host of each record's URL, if the caller has
+                already parsed them
             
-            url_data = {
-                'url': original_url,
-                'clicks': 0,
-                'created_at': datetime.now(timezone.utc).isoformat(),
-                'last_accessed': None
-            }
+        Returns:
+            list: For each item in order, True if added, False if the code
+                already exists
+        """
+        items = list(items)
+        if hosts is None:
+            hosts = [url_host(record.url) for _, record in items]
+        results = []
+        last_lsn = None
+        with self._lock:
+            for (short_code, record), host in zip(items, hosts):
+                if short_code in self._urls:
+                    results.append(False)
+                    continue
+                if record.canonical_url is not None:
+                    if record.canonical_url == record.url:
+                        record.canonical_url = record.url
+                    if index and record.canonical_url in self._url_index:
+                        record.canonical_url = None
+                last_lsn = self._insert_record(short_code, record, host, index)
+                results.append(True)
+        
+        if last_lsn is not None and self._journal is not None:
+            self._journal.wait_durable(last_lsn)
+        logger.debug(f"Imported {sum(results)} of {len(results)} records")
+        return results
+    
+    def _index_host(self, short_code: str, record: URLRecord, host: Optional[str],
+                    previous: Optional[URLRecord] = None):
+        """
+        Add a record to the host index and its clicks to the host's total.
+        Must be called with self._lock held.
+        
+        Args:
+            host (str): url_host(record.url), parsed before taking the lock
+            previous (URLRecord): The record being replaced for the same code,
+                whose index entry is reused
+        """
+        if previous is not None:
+            record.host_links = previous.host_links
+            if record.host_links is not None:
+                record.host_links.clicks += record.clicks - previous.clicks
+            return
+        if host is None:
+            return
+        links = self._hosts.get(host)
+        if links is None:
+            links = self._hosts[host] = HostLinks()
+        links.codes.append(short_code)
+        links.clicks += record.clicks
+        record.host_links = links
+    
+    def _index_url(self, canonical_url: str, short_code: str):
+        if canonical_url is not self._urls[short_code].url:
+            self._url_index_key_bytes += sys.getsizeof(canonical_url)
+        self._url_index[canonical_url] = short_code
+    
+    def add_or_get_url(self, short_code: str, original_url: str,
+                       canonical_url: str) -> Tuple[Optional[str], bool]:
+        """
+        Add a URL mapping unless the canonical URL is already stored.
+        
+        Args:
+            short_code (str): The short code to use if the URL is new
+            original_url (str): The original URL
+            canonical_url (str): The canonical form used as the dedupe key
             
-            self._urls[short_code] = url_data
-            logger.info(f"Added URL mapping: {short_code} -> {original_url}")
-            return True
+        Returns:
+            tuple: (short_code, created). short_code is the existing code when
+                the URL was already stored, or None if the proposed code is
+                taken by a different URL.
+        """
+        # Reuse the record's string when the URL is already canonical so
+        # the index only pays for the dict slot
+        if canonical_url == original_url:
+            canonical_url = original_url
+        host = url_host(original_url)
+        
+        with self._lock:
+            existing_code = self._url_index.get(canonical_url)
+            if existing_code is not None:
+                logger.info(f"Deduplicated URL {original_url} -> {existing_code}")
+                return existing_code, False
+            
+            lsn = self._insert(short_code, original_url, host, canonical_url)
+        
+        if lsn is None:
+            return None, False
+        if self._journal is not None:
+            self._journal.wait_durable(lsn)
+        return short_code, True
+    
+    def add_or_get_urls(self, items) -> List[Tuple[Optional[str], bool]]:
+        """
+        Add many URL mappings unless already stored, under a single lock
+        acquisition. A URL repeated within the batch is added once.
+        
+        Args:
+            items (iterable): (short_code, original_url, canonical_url) triples
+            
+        Returns:
+            list: For each item in order, (short_code, created) as for
+                add_or_get_url
+        """
+        items = [(short_code, original_url, canonical_url, url_host(original_url))
+                 for short_code, original_url, canonical_url in items]
+        results = []
+        last_lsn = None
+        with self._lock:
+            for short_code, original_url, canonical_url, host in items:
+                if canonical_url == original_url:
+                    canonical_url = original_url
+                existing_code = self._url_index.get(canonical_url)
+                if existing_code is not None:
+                    results.append((existing_code, False))
+                    continue
+                lsn = self._insert(short_code, original_url, host, canonical_url)
+                if lsn is None:
+                    results.append((None, False))
+                else:
+                    results.append((short_code, True))
+                    last_lsn = lsn
+        
+        if last_lsn is not None and self._journal is not None:
+            self._journal.wait_durable(last_lsn)
+        return results
     
     def get_url(self, short_code: str) -> Optional[str]:
         """
@@ -53,36 +710,191 @@ class URLStore:
         Returns:
             str: The original URL, or None if not found
         """
+        if not self.might_contain(short_code):
+            logger.debug(f"Short code rejected by bloom filter: {short_code}")
+            return None
+        
         with self._lock:
-            url_data = self._urls.get(short_code)
-            if url_data:
-                logger.info(f"Retrieved URL for {short_code}: {url_data['url']}")
-                return url_data['url']
+            record = self._urls.get(short_code)
+            if record:
+                logger.info(f"Retrieved URL for {short_code}: {record.url}")
+                return record.url
             
             logger.warning(f"Short code not found: {short_code}")
             return None
     
-    def increment_clicks(self, short_code: str) -> bool:
+    def resolve(self, short_code: str) -> Tuple[Optional[str], bool]:
+        """
+        Get the original URL for a short code and whether it is disabled,
+        from a single lookup.
+        
+        Args:
+            short_code (str): The short code
+            
+        Returns:
+            tuple: (original URL or None if not found, True if disabled)
+        """
+        if not self.might_contain(short_code):
+            return None, False
+        
+        with self._lock:
+            record = self._urls.get(short_code)
+            if record is None:
+                return None, False
+            return record.url, record.disabled
+    
+    def disable_codes(self, short_codes) -> int:
+        """
+        Mark links as disabled so they no longer redirect.
+        
+        Args:
+            short_codes (iterable): Codes to disable; unknown or already
+                disabled codes are skipped
+            
+        Returns:
+            int: Number of links newly disabled
+        """
+        disabled = 0
+        with self._lock:
+            for short_code in short_codes:
+                record = self._urls.get(short_code)
+                if record is None or record.disabled:
+                    continue
+                record.disabled = True
+                disabled += 1
+                if self._journal is not None:
+                    self._journal.log_disable(short_code)
+        if disabled:
+            logger.info(f"Disabled {disabled} links")
+        return disabled
+    
+    def increment_clicks(self, short_code: str, details: Optional[ClickDetails] = None) -> bool:
         """
         Increment the click count for a short code.
         
         Args:
             short_code (str): The short code
+            details (ClickDetails): Visitor, referrer and user agent of the
+                click, for unique clicks and breakdowns
             
         Returns:
             bool: True if incremented, False if code doesn't exist
         """
-        with self._lock:
+        if not self.might_contain(short_code):
+            return False
+        
+        # Journaled clicks must be logged with their absolute count, so the
+        # lock-free counters are only used without a write-ahead log
+        if self._counters is not None and self._journal is None:
             if short_code not in self._urls:
                 logger.warning(f"Attempted to increment clicks for non-existent code: {short_code}")
                 return False
+            if self._counters.add(short_code, now_micros(), details):
+                # Fold as we go, but never make a redirect wait for the lock;
+                # if it is busy, a later click retries
+                if self._lock.acquire(blocking=False):
+                    try:
+                        self._fold_counters()
+                    finally:
+                        self._lock.release()
+            return True
+        
+        with self._lock:
+            record = self._urls.get(short_code)
+            if record is None:
+                logger.warning(f"Attempted to increment clicks for non-existent code: {short_code}")
+                return False
             
-            self._urls[short_code]['clicks'] += 1
-            self._urls[short_code]['last_accessed'] = datetime.now(timezone.utc).isoformat()
+            self._add_clicks(record, 1, now_micros(), () if details is None else (details,))
+            if self._journal is not None:
+                self._journal.log_clicks(short_code, record)
             
-            logger.info(f"Incremented clicks for {short_code}: {self._urls[short_code]['clicks']}")
+            logger.info(f"Incremented clicks for {short_code}: {record.clicks}")
             return True
     
+    def apply_clicks(self, totals: Dict[str, list]):
+        """
+        Apply a batch of aggregated clicks under a single lock acquisition.
+        
+        Args:
+            totals (dict): short_code -> (click count, last access in epoch
+                microseconds, ClickDetails list). Unknown codes are ignored.
+        """
+        with self._lock:
+            for short_code, (count, last_accessed, details) in totals.items():
+                record = self._urls.get(short_code)
+                if record is None:
+                    continue
+                self._add_clicks(record, count, last_accessed, details)
+                if self._journal is not None:
+                    self._journal.log_clicks(short_code, record)
+        logger.debug(f"Applied clicks for {len(totals)} codes")
+    
+    def _add_clicks(self, record: URLRecord, count: int, accessed_at: int, details=()):
+        """
+        Count clicks on a record and in the global totals. Must be called
+        with self._lock held.
+        """
+        record.add_clicks(count, accessed_at, details)
+        self._total_clicks += count
+        self._clicks_per_hour.add(accessed_at, count)
+        if record.host_links is not None:
+            record.host_links.clicks += count
+    
+    def _fold_counters(self):
+        """
+        Move finished per-thread counter entries into their records. Runs
+        before reads and whenever a click finds its thread's closed entries
+        past the fold threshold. Must be called with self._lock held.
+        """
+        for short_code, count, last_accessed, visitors, referrals in self._counters.drain():
+            record = self._urls.get(short_code)
+            if record is not None:
+                self._add_clicks(record, count, last_accessed)
+                record.add_click_summary(visitors, referrals)
+    
+    def _merged_record(self, short_code: str, record: URLRecord,
+                       with_details: bool = False) -> URLRecord:
+        """
+        Copy a record with the per-thread counts for its code added in. Must
+        be called with self._lock held.
+        
+        Args:
+            with_details (bool): Also copy the unique visitor sketch and the
+                breakdowns, with the details of open counter entries added
+        """
+        merged = URLRecord(record.url, record.created_at, record.clicks,
+                           record.last_accessed, record.canonical_url, record.disabled)
+        if with_details:
+            if record.visitors is not None:
+                merged.visitors = record.visitors.copy()
+            if record.breakdowns is not None:
+                merged.breakdowns = record.breakdowns.copy()
+        if self._counters is not None:
+            for count, accessed_at, visitors, referrals in self._counters.read(short_code):
+                merged.clicks += count
+                if merged.last_accessed is None or accessed_at > merged.last_accessed:
+                    merged.last_accessed = accessed_at
+                if with_details:
+                    merged.add_click_summary(visitors, referrals)
+        return merged
+    
+    def contains(self, short_code: str) -> bool:
+        """
+        Check whether a short code is already stored.
+        
+        Args:
+            short_code (str): The short code
+            
+        Returns:
+            bool: True if the code exists, False otherwise
+        """
+        if not self.might_contain(short_code):
+            return False
+        
+        with self._lock:
+            return short_code in self._urls
+    
     def get_stats(self, short_code: str) -> Optional[Dict]:
         """
         Get analytics data for a short code.
@@ -93,31 +905,191 @@ class URLStore:
         Returns:
             dict: Analytics data, or None if not found
         """
+        if not self.might_contain(short_code):
+            logger.debug(f"Stats code rejected by bloom filter: {short_code}")
+            return None
+        
         with self._lock:
-            url_data = self._urls.get(short_code)
-            if url_data:
-                stats = {
-                    'url': url_data['url'],
-                    'clicks': url_data['clicks'],
-                    'created_at': url_data['created_at'],
-                    'last_accessed': url_data['last_accessed']
-                }
+            record = self._urls.get(short_code)
+            if record:
+                if self._counters is not None:
+                    self._fold_counters()
+                    record = self._merged_record(short_code, record, with_details=True)
+                stats = record.to_stats()
                 logger.info(f"Retrieved stats for {short_code}: {stats}")
                 return stats
             
             logger.warning(f"Stats requested for non-existent code: {short_code}")
             return None
     
-    def get_existing_codes(self) -> set:
+    def get_timeseries(self, short_code: str, resolution: str = 'minute',
+                       limit: Optional[int] = None) -> Optional[list]:
         """
-        Get all existing short codes.
+        Get the click history of a short code at one resolution.
         
+        Args:
+            short_code (str): The short code
+            resolution (str): 'minute', 'hour' or 'day'
+            limit (int): Number of most recent buckets, defaulting to all kept
+            
         Returns:
-            set: Set of existing short codes
+            list: (bucket start in epoch microseconds, clicks), oldest first,
+                or None if not found
         """
+        if not self.might_contain(short_code):
+            return None
+        
+        now = now_micros()
         with self._lock:
-            codes = set(self._urls.keys())
-            logger.debug(f"Retrieved {len(codes)} existing codes")
+            record = self._urls.get(short_code)
+            if record is None:
+                return None
+            
+            if self._counters is not None:
+                self._fold_counters()
+                open_entries = self._counters.read(short_code)
+                if open_entries:
+                    # Fold the still-open entries into a scratch copy
+                    history = ClickTimeSeries()
+                    for count, accessed_at, _, _ in open_entries:
+                        history.add(accessed_at, count)
+                    buckets = history.buckets(resolution, now, limit)
+                    if record.timeseries is not None:
+                        buckets = [(start, clicks + extra) for (start, clicks), (_, extra)
+                                   in zip(record.timeseries.buckets(resolution, now, limit), buckets)]
+                    return buckets
+            
+            if record.timeseries is None:
+                return empty_buckets(resolution, now, limit)
+            return record.timeseries.buckets(resolution, now, limit)
+    
+    def get_breakdowns(self, short_code: str) -> Optional[Dict]:
+        """
+        Get clicks by referrer host and user agent family for a short code.
+        
+        Args:
+            short_code (str): The short code
+            
+        Returns:
+            dict: As for ClickBreakdowns.to_dict, or None if not found
+        """
+        if not self.might_contain(short_code):
+            return None
+        
+        with self._lock:
+            record = self._urls.get(short_code)
+            if record is None:
+                return None
+            if self._counters is not None:
+                self._fold_counters()
+                record = self._merged_record(short_code, record, with_details=True)
+            if record.breakdowns is None:
+                return empty_breakdowns()
+            return record.breakdowns.to_dict()
+    
+    def get_totals(self, now: Optional[int] = None) -> Dict:
+        """
+        Get service-wide link and click totals without scanning the records.
+        
+        Args:
+            now (int): Time the hourly series end at, in epoch microseconds
+                (default: now)
+        
+        Returns:
+            dict: links, clicks, and links_per_hour / clicks_per_hour as
+                (hour start in epoch microseconds, count) lists, oldest first
+        """
+        if now is None:
+            now = now_micros()
+        with self._lock:
+            clicks = self._total_clicks
+            clicks_per_hour = self._clicks_per_hour
+            if self._counters is not None:
+                # Each thread has at most open_entries open, whatever the
+                # number of links
+                self._fold_counters()
+                clicks = self._total_clicks
+                clicks_per_hour = clicks_per_hour.copy()
+                for count, accessed_at in self._counters.read_all():
+                    clicks += count
+                    clicks_per_hour.add(accessed_at, count)
+            return {
+                'links': len(self._urls),
+                'clicks': clicks,
+                'links_per_hour': self._links_per_hour.buckets(now, TOTALS_HOURS),
+                'clicks_per_hour': clicks_per_hour.buckets(now, TOTALS_HOURS)
+            }
+    
+    def host_page(self, host: str, position: int = 0,
+                  limit: int = DEFAULT_HOST_PAGE) -> Tuple[List[Tuple[str, URLRecord]], Optional[int], int, int]:
+        """
+        Read one page of the links on a host, with the host's totals, from
+        the host index under a single lock acquisition.
+        
+        Args:
+            host (str): Lowercased host name
+            position (int): Index into the host's links to start at
+            limit (int): Maximum number of links; 0 reads only the totals
+            
+        Returns:
+            tuple: ([(short_code, URLRecord copy)], position of the next page
+                or None, total links on the host, total clicks on the host)
+        """
+        with self._lock:
+            links = self._hosts.get(host)
+            if links is None:
+                return [], None, 0, 0
+            if self._counters is not None:
+                self._fold_counters()
+            codes = links.codes[position:position + limit] if limit else []
+            page = [(code, self._merged_record(code, self._urls[code])) for code in codes]
+            clicks = links.clicks
+            if self._counters is not None:
+                for code, count in self._counters.read_codes():
+                    record = self._urls.get(code)
+                    if record is not None and record.host_links is links:
+                        clicks += count
+            end = position + len(codes)
+            return page, end if codes and end < len(links.codes) else None, len(links.codes), clicks
+    
+    def get_links_by_host(self, host: str, cursor: Optional[str] = None,
+                          limit: int = DEFAULT_HOST_PAGE) -> Dict:
+        """
+        List the links pointing at a host, a page at a time.
+        
+        Args:
+            host (str): Lowercased host name
+            cursor (str): next_cursor from the previous page, or None to start
+            limit (int): Maximum number of links on the page
+            
+        Returns:
+            dict: links (see URLRecord.to_link_summary), next_cursor (None on
+                the last page), total_links and total_clicks for the host
+            
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        position = int(cursor) if cursor else 0
+        if position < 0:
+            raise ValueError(f"Invalid cursor: {cursor}")
+        page, next_position, total_links, total_clicks = self.host_page(host, position, limit)
+        return {
+            'links': [record.to_link_summary(code) for code, record in page],
+            'next_cursor': None if next_position is None else str(next_position),
+            'total_links': total_links,
+            'total_clicks': total_clicks
+        }
+    
+    def get_existing_codes(self) -> set:
+        """
+        Get all existing short codes.
+        
+        Returns:
+            set: Set of existing short codes
+        """
+        with self._lock:
+            codes = set(self._urls.keys())
+            logger.debug(f"Retrieved {len(codes)} existing codes")
             return codes
     
     def get_total_urls(self) -> int:
@@ -131,7 +1103,784 @@ class URLStore:
             count = len(self._urls)
             logger.debug(f"Total URLs stored: {count}")
             return count
+    
+    def clear(self):
+        """
+        Remove all stored URL mappings.
+        """
+        with self._lock:
+            self._urls.clear()
+            self._codes.clear()
+            self._url_index.clear()
+            self._url_index_key_bytes = 0
+            self._hosts.clear()
+            if self._bloom is not None:
+                self._bloom.clear()
+            if self._counters is not None:
+                self._counters.reset()
+            self._total_clicks = 0
+            self._links_per_hour = BucketRing(HOUR_MICROS, TOTALS_HOURS)
+            self._clicks_per_hour = BucketRing(HOUR_MICROS, TOTALS_HOURS)
+            if self._journal is not None:
+                self._journal.log_clear()
+            logger.info("URLStore cleared")
+    
+    def iter_records(self, chunk_size: int = 1000):
+        """
+        Iterate over all records without holding the lock for the whole walk.
+        
+        The lock is taken once per chunk, so writers and redirects interleave
+        with a long scan. Records added during the walk are included; click
+        counts reflect the moment each chunk was copied.
+        
+        Args:
+            chunk_size (int): Records copied per lock acquisition
+            
+        Yields:
+            tuple: (short_code, URLRecord copy)
+        """
+        position = 0
+        while True:
+            with self._lock:
+                codes = self._codes[position:position + chunk_size]
+                if self._counters is not None:
+                    self._fold_counters()
+                chunk = [(code, self._merged_record(code, self._urls[code])) for code in codes]
+            if not chunk:
+                return
+            position += len(chunk)
+            yield from chunk
+    
+    def restore_record(self, short_code: str, record: URLRecord, index: bool = True):
+        """
+        Insert or overwrite a record during recovery, without journaling.
+        
+        Args:
+            short_code (str): The short code
+            record (URLRecord): The recovered record
+            index (bool): Rebuild this store's dedupe index entry for the record
+        """
+        host = url_host(record.url)
+        with self._lock:
+            previous = self._urls.get(short_code)
+            if previous is None:
+                self._codes.append(short_code)
+                self._links_per_hour.add(record.created_at)
+                if self._bloom is not None:
+                    self._bloom.add(short_code)
+            else:
+                self._total_clicks -= previous.clicks
+            self._urls[short_code] = record
+            self._total_clicks += record.clicks
+            self._index_host(short_code, record, host, previous)
+            if record.canonical_url is not None and index:
+                self._index_url(record.canonical_url, short_code)
+    
+    def restore_records(self, items, index: bool = True):
+        """
+        Bulk version of restore_record, taking the lock once per batch.
+        
+        Args:
+            items (list): (short_code, URLRecord) pairs
+            index (bool): Rebuild this store's dedupe index entries
+        """
+        hosts = [url_host(record.url) for _, record in items]
+        with self._lock:
+            urls = self._urls
+            codes = self._codes
+            bloom = self._bloom
+            links_per_hour = self._links_per_hour
+            for (short_code, record), host in zip(items, hosts):
+                previous = urls.get(short_code)
+                if previous is None:
+                    codes.append(short_code)
+                    links_per_hour.add(record.created_at)
+                    if bloom is not None:
+                        bloom.add(short_code)
+                else:
+                    self._total_clicks -= previous.clicks
+                urls[short_code] = record
+                self._total_clicks += record.clicks
+                self._index_host(short_code, record, host, previous)
+                if record.canonical_url is not None and index:
+                    self._index_url(record.canonical_url, short_code)
+    
+    def restore_clicks(self, short_code: str, clicks: int, last_accessed: Optional[int]):
+        """
+        Set a record's click state during recovery, without journaling.
+        
+        Args:
+            short_code (str): The short code
+            clicks (int): Absolute click count
+            last_accessed (int): Last access time in epoch microseconds
+        """
+        with self._lock:
+            record = self._urls.get(short_code)
+            if record is not None:
+                self._total_clicks += clicks - record.clicks
+                if record.host_links is not None:
+                    record.host_links.clicks += clicks - record.clicks
+                record.clicks = clicks
+                record.last_accessed = last_accessed
+    
+    def restore_disabled(self, short_code: str):
+        """
+        Mark a record disabled during recovery, without journaling.
+        
+        Args:
+            short_code (str): The short code
+        """
+        with self._lock:
+            record = self._urls.get(short_code)
+            if record is not None:
+                record.disabled = True
+    
+    def get_metrics(self) -> Dict:
+        """
+        Get internal metrics for the store's auxiliary structures.
+        
+        Returns:
+            dict: Metrics keyed by structure name
+        """
+        metrics = {'bloom_filter': {'enabled': False}}
+        if self._bloom is not None:
+            metrics['bloom_filter'] = {'enabled': True, **self._bloom.get_metrics()}
+        
+        with self._lock:
+            metrics['dedupe_index'] = {
+                'entries': len(self._url_index),
+                'memory_bytes': sys.getsizeof(self._url_index) + self._url_index_key_bytes
+            }
+        
+        with self._lock:
+            metrics['host_index'] = {'hosts': len(self._hosts)}
+        
+        metrics['click_counters'] = {'mode': 'locked'}
+        if self._counters is not None:
+            metrics['click_counters'] = {'mode': 'per_thread', **self._counters.get_metrics()}
+        
+        metrics['persistence'] = {'enabled': False}
+        if self._journal is not None:
+            metrics['persistence'] = {'enabled': True, **self._journal.get_metrics()}
+        return metrics
+
+class ShardedURLStore:
+    """
+    URLStore partitioned across independently locked shards.
+    
+    Each short code is routed to one of N URLStore shards by hash, so
+    operations on different codes rarely contend for the same lock. The
+    public interface matches URLStore.
+    """
+    
+    def __init__(self, num_shards: int = 16, bloom_capacity: Optional[int] = None,
+                 bloom_error_rate: float = 0.01, per_thread_counters: bool = False):
+        if num_shards < 1:
+            raise ValueError("Number of shards must be positive")
+        
+        self.num_shards = num_shards
+        self._shards = []
+        for _ in range(num_shards):
+            bloom_filter = None
+            if bloom_capacity:
+                bloom_filter = BloomFilter(capacity=max(1, bloom_capacity // num_shards),
+                                           error_rate=bloom_error_rate)
+            self._shards.append(URLStore(bloom_filter=bloom_filter,
+                                         per_thread_counters=per_thread_counters))
+        
+        # The dedupe index is keyed by URL rather than code, so it is striped
+        # separately from the record shards
+        self._url_indexes = [{} for _ in range(num_shards)]
+        self._url_index_locks = [threading.Lock() for _ in range(num_shards)]
+        self._url_index_key_bytes = [0] * num_shards  # per stripe, as in URLStore
+        logger.info(f"ShardedURLStore initialized with {num_shards} shards")
+    
+    def _index_url(self, stripe: int, canonical_url: str, short_code: str, url: str):
+        # Must be called with the stripe's lock held
+        if canonical_url is not url:
+            self._url_index_key_bytes[stripe] += sys.getsizeof(canonical_url)
+        self._url_indexes[stripe][canonical_url] = short_code
+    
+    def _shard(self, short_code: str) -> URLStore:
+        return self._shards[hash(short_code) % self.num_shards]
+    
+    def add_url(self, short_code: str, original_url: str) -> bool:
+        """
+        Add a new URL mapping.
+        
+        Args:
+            short_code (str): The short code
+            original_url (str): The original URL
+            
+        Returns:
+            bool: True if added successfully, False if code already exists
+        """
+        return self._shard(short_code).add_url(short_code, original_url)
+    
+    def add_urls(self, items) -> List[bool]:
+        """
+        Add many URL mappings, one lock acquisition per shard.
+        
+        Args:
+            items (list): (short_code, original_url) pairs
+            
+        Returns:
+            list: As for URLStore.add_urls
+        """
+        by_shard = [[] for _ in range(self.num_shards)]
+        for position, (short_code, _) in enumerate(items):
+            by_shard[hash(short_code) % self.num_shards].append(position)
+        
+        results = [False] * len(items)
+        for shard, positions in zip(self._shards, by_shard):
+            if positions:
+                added = shard.add_urls([items[position] for position in positions])
+                for position, created in zip(positions, added):
+                    results[position] = created
+        return results
+    
+    def add_or_get_url(self, short_code: str, original_url: str,
+                       canonical_url: str) -> Tuple[Optional[str], bool]:
+        """
+        Add a URL mapping unless the canonical URL is already stored.
+        
+        Args:
+            short_code (str): The short code to use if the URL is new
+            original_url (str): The original URL
+            canonical_url (str): The canonical form used as the dedupe key
+            
+        Returns:
+            tuple: (short_code, created), as for URLStore.add_or_get_url
+        """
+        if canonical_url == original_url:
+            canonical_url = original_url
+        
+        stripe = hash(canonical_url) % self.num_shards
+        index = self._url_indexes[stripe]
+        host = url_host(original_url)
+        
+        # Lock order is always index stripe -> record shard, never the reverse
+        with self._url_index_locks[stripe]:
+            existing_code = index.get(canonical_url)
+            if existing_code is not None:
+                logger.info(f"Deduplicated URL {original_url} -> {existing_code}")
+                return existing_code, False
+            
+            if not self._shard(short_code)._add(short_code, original_url, host, canonical_url, index=False):
+                return None, False
+            
+            self._index_url(stripe, canonical_url, short_code, original_url)
+            return short_code, True
+    
+    def add_or_get_urls(self, items) -> List[Tuple[Optional[str], bool]]:
+        """
+        Add many URL mappings unless already stored.
+        
+        Every index stripe the batch touches is locked up front, in stripe
+        order so concurrent batches cannot deadlock, and each record shard is
+        then locked once.
+        
+        Args:
+            items (list): (short_code, original_url, canonical_url) triples
+            
+        Returns:
+            list: As for URLStore.add_or_get_urls
+        """
+        items = [(short_code, original_url, original_url if canonical_url == original_url else canonical_url,
+                  url_host(original_url))
+                 for short_code, original_url, canonical_url in items]
+        stripes = sorted({hash(canonical_url) % self.num_shards for _, _, canonical_url, _ in items})
+        locks = [self._url_index_locks[stripe] for stripe in stripes]
+        for lock in locks:
+            lock.acquire()
+        try:
+            results = [None] * len(items)
+            by_shard = [[] for _ in range(self.num_shards)]
+            first = {}  # canonical url -> position of its first new item
+            repeats = []
+            for position, (short_code, original_url, canonical_url, _) in enumerate(items):
+                existing_code = self._url_indexes[hash(canonical_url) % self.num_shards].get(canonical_url)
+                if existing_code is not None:
+                    results[position] = (existing_code, False)
+                elif canonical_url in first:
+                    repeats.append((position, first[canonical_url]))
+                else:
+                    first[canonical_url] = position
+                    by_shard[hash(short_code) % self.num_shards].append(position)
+            
+            for shard, positions in zip(self._shards, by_shard):
+                if not positions:
+                    continue
+                added = shard._add_many([items[position] for position in positions], index=False)
+                for position, created in zip(positions, added):
+                    short_code, original_url, canonical_url, _ = items[position]
+                    if created:
+                        self._index_url(hash(canonical_url) % self.num_shards, canonical_url,
+                                        short_code, original_url)
+                        results[position] = (short_code, True)
+                    else:
+                        results[position] = (None, False)
+            
+            # A repeat resolves to the first occurrence's code, or is retried
+            # by the caller like a collision if that insert failed
+            for position, original in repeats:
+                results[position] = (results[original][0], False)
+            return results
+        finally:
+            for lock in locks:
+                lock.release()
+    
+    def import_records(self, items) -> List[bool]:
+        """
+        Add complete records, one lock acquisition per shard.
+        
+        The index stripes of the batch's canonical URLs are locked up front,
+        in stripe order, as in add_or_get_urls.
+        
+        Args:
+            items (list): (short_code, URLRecord) pairs
+            
+        Returns:
+            list: As for URLStore.import_records
+        """
+        hosts = [url_host(record.url) for _, record in items]
+        canonical_urls = {record.canonical_url for _, record in items if record.canonical_url is not None}
+        stripes = sorted({hash(canonical_url) % self.num_shards for canonical_url in canonical_urls})
+        locks = [self._url_index_locks[stripe] for stripe in stripes]
+        for lock in locks:
+            lock.acquire()
+        try:
+            claimed = set()
+            by_shard = [[] for _ in range(self.num_shards)]
+            for position, (short_code, record) in enumerate(items):
+                canonical_url = record.canonical_url
+                if canonical_url is not None:
+                    if canonical_url == record.url:
+                        record.canonical_url = canonical_url = record.url
+                    index = self._url_indexes[hash(canonical_url) % self.num_shards]
+                    if canonical_url in index or canonical_url in claimed:
+                        record.canonical_url = None
+                    else:
+                        claimed.add(canonical_url)
+                by_shard[hash(short_code) % self.num_shards].append(position)
+            
+            results = [False] * len(items)
+            for shard, positions in zip(self._shards, by_shard):
+                if not positions:
+                    continue
+                added = shard.import_records([items[position] for position in positions], index=False,
+                                             hosts=[hosts[position] for position in positions])
+                for position, created in zip(positions, added):
+                    results[position] = created
+                    short_code, record = items[position]
+                    if created and record.canonical_url is not None:
+                        self._index_url(hash(record.canonical_url) % self.num_shards,
+                                        record.canonical_url, short_code, record.url)
+            return results
+        finally:
+            for lock in locks:
+                lock.release()
+    
+    def might_contain(self, short_code: str) -> bool:
+        """
+        Cheap lock-free membership pre-check.
+        
+        Args:
+            short_code (str): The short code
+            
+        Returns:
+            bool: False if the code is definitely not stored, True if it may be
+        """
+        return self._shard(short_code).might_contain(short_code)
+    
+    def attach_journal(self, journal):
+        """
+        Append all further mutations from every shard to a write-ahead log.
+        
+        Args:
+            journal (WriteAheadLog): The log to write to
+        """
+        for shard in self._shards:
+            shard.attach_journal(journal)
+    
+    def iter_records(self, chunk_size: int = 1000):
+        """
+        Iterate over all records, one shard and one chunk at a time.
+        
+        Args:
+            chunk_size (int): Records copied per lock acquisition
+            
+        Yields:
+            tuple: (short_code, URLRecord copy)
+        """
+        for shard in self._shards:
+            yield from shard.iter_records(chunk_size)
+    
+    def restore_record(self, short_code: str, record: URLRecord):
+        """
+        Insert or overwrite a record during recovery, without journaling.
+        
+        Args:
+            short_code (str): The short code
+            record (URLRecord): The recovered record
+        """
+        self._shard(short_code).restore_record(short_code, record, index=False)
+        if record.canonical_url is not None:
+            stripe = hash(record.canonical_url) % self.num_shards
+            with self._url_index_locks[stripe]:
+                self._index_url(stripe, record.canonical_url, short_code, record.url)
+    
+    def restore_records(self, items):
+        """
+        Bulk version of restore_record, taking each shard's lock once per batch.
+        
+        Args:
+            items (list): (short_code, URLRecord) pairs
+        """
+        by_shard = [[] for _ in range(self.num_shards)]
+        for item in items:
+            by_shard[hash(item[0]) % self.num_shards].append(item)
+        for shard, shard_items in zip(self._shards, by_shard):
+            if shard_items:
+                shard.restore_records(shard_items, index=False)
+        
+        for short_code, record in items:
+            if record.canonical_url is not None:
+                stripe = hash(record.canonical_url) % self.num_shards
+                with self._url_index_locks[stripe]:
+                    self._index_url(stripe, record.canonical_url, short_code, record.url)
+    
+    def restore_clicks(self, short_code: str, clicks: int, last_accessed: Optional[int]):
+        """
+        Set a record's click state during recovery, without journaling.
+        
+        Args:
+            short_code (str): The short code
+            clicks (int): Absolute click count
+            last_accessed (int): Last access time in epoch microseconds
+        """
+        self._shard(short_code).restore_clicks(short_code, clicks, last_accessed)
+    
+    def restore_disabled(self, short_code: str):
+        """
+        Mark a record disabled during recovery, without journaling.
+        
+        Args:
+            short_code (str): The short code
+        """
+        self._shard(short_code).restore_disabled(short_code)
+    
+    def get_url(self, short_code: str) -> Optional[str]:
+        """
+        Get the original URL for a short code.
+        
+        Args:
+            short_code (str): The short code
+            
+        Returns:
+            str: The original URL, or None if not found
+        """
+        return self._shard(short_code).get_url(short_code)
+    
+    def resolve(self, short_code: str) -> Tuple[Optional[str], bool]:
+        """
+        Get the original URL for a short code and whether it is disabled.
+        
+        Args:
+            short_code (str): The short code
+            
+        Returns:
+            tuple: (original URL or None if not found, True if disabled)
+        """
+        return self._shard(short_code).resolve(short_code)
+    
+    def disable_codes(self, short_codes) -> int:
+        """
+        Mark links as disabled, one lock acquisition per shard.
+        
+        Args:
+            short_codes (iterable): Codes to disable
+            
+        Returns:
+            int: Number of links newly disabled
+        """
+        by_shard = [[] for _ in range(self.num_shards)]
+        for short_code in short_codes:
+            by_shard[hash(short_code) % self.num_shards].append(short_code)
+        return sum(shard.disable_codes(codes)
+                   for shard, codes in zip(self._shards, by_shard) if codes)
+    
+    def increment_clicks(self, short_code: str, details: Optional[ClickDetails] = None) -> bool:
+        """
+        Increment the click count for a short code.
+        
+        Args:
+            short_code (str): The short code
+            details (ClickDetails): Visitor, referrer and user agent of the
+                click, for unique clicks and breakdowns
+            
+        Returns:
+            bool: True if incremented, False if code doesn't exist
+        """
+        return self._shard(short_code).increment_clicks(short_code, details)
+    
+    def apply_clicks(self, totals: Dict[str, list]):
+        """
+        Apply a batch of aggregated clicks, one lock acquisition per shard.
+        
+        Args:
+            totals (dict): short_code -> (click count, last access in epoch
+                microseconds, ClickDetails list)
+        """
+        by_shard = [{} for _ in range(self.num_shards)]
+        for short_code, entry in totals.items():
+            by_shard[hash(short_code) % self.num_shards][short_code] = entry
+        for shard, shard_totals in zip(self._shards, by_shard):
+            if shard_totals:
+                shard.apply_clicks(shard_totals)
+    
+    def contains(self, short_code: str) -> bool:
+        """
+        Check whether a short code is already stored.
+        
+        Args:
+            short_code (str): The short code
+            
+        Returns:
+            bool: True if the code exists, False otherwise
+        """
+        return self._shard(short_code).contains(short_code)
+    
+    def get_stats(self, short_code: str) -> Optional[Dict]:
+        """
+        Get analytics data for a short code.
+        
+        Args:
+            short_code (str): The short code
+            
+        Returns:
+            dict: Analytics data, or None if not found
+        """
+        return self._shard(short_code).get_stats(short_code)
+    
+    def get_timeseries(self, short_code: str, resolution: str = 'minute',
+                       limit: Optional[int] = None) -> Optional[list]:
+        """
+        Get the click history of a short code at one resolution.
+        
+        Args:
+            short_code (str): The short code
+            resolution (str): 'minute', 'hour' or 'day'
+            limit (int): Number of most recent buckets, defaulting to all kept
+            
+        Returns:
+            list: (bucket start in epoch microseconds, clicks), oldest first,
+                or None if not found
+        """
+        return self._shard(short_code).get_timeseries(short_code, resolution, limit)
+    
+    def get_breakdowns(self, short_code: str) -> Optional[Dict]:
+        """
+        Get clicks by referrer host and user agent family for a short code.
+        
+        Args:
+            short_code (str): The short code
+            
+        Returns:
+            dict: As for ClickBreakdowns.to_dict, or None if not found
+        """
+        return self._shard(short_code).get_breakdowns(short_code)
+    
+    def get_totals(self) -> Dict:
+        """
+        Get service-wide link and click totals, summed across shards.
+        
+        Returns:
+            dict: As for URLStore.get_totals
+        """
+        now = now_micros()
+        totals = [shard.get_totals(now) for shard in self._shards]
+        return {
+            'links': sum(t['links'] for t in totals),
+            'clicks': sum(t['clicks'] for t in totals),
+            'links_per_hour': sum_buckets(t['links_per_hour'] for t in totals),
+            'clicks_per_hour': sum_buckets(t['clicks_per_hour'] for t in totals)
+        }
+    
+    def get_links_by_host(self, host: str, cursor: Optional[str] = None,
+                          limit: int = DEFAULT_HOST_PAGE) -> Dict:
+        """
+        List the links pointing at a host, a page at a time.
+        
+        Each shard indexes its own links; pages walk the shards in order and
+        the cursor is "<shard>.<position within the shard>".
+        
+        Args:
+            host (str): Lowercased host name
+            cursor (str): next_cursor from the previous page, or None to start
+            limit (int): Maximum number of links on the page
+            
+        Returns:
+            dict: As for URLStore.get_links_by_host
+            
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        start_shard, position = 0, 0
+        if cursor:
+            shard_field, _, position_field = cursor.partition('.')
+            start_shard, position = int(shard_field), int(position_field)
+            if not 0 <= start_shard < self.num_shards or position < 0:
+                raise ValueError(f"Invalid cursor: {cursor}")
+        
+        links = []
+        next_cursor = None
+        total_links = total_clicks = 0
+        for number, shard in enumerate(self._shards):
+            remaining = limit - len(links) if number >= start_shard else 0
+            page, next_position, shard_links, shard_clicks = shard.host_page(
+                host, position if number == start_shard else 0, remaining)
+            total_links += shard_links
+            total_clicks += shard_clicks
+            links.extend(record.to_link_summary(code) for code, record in page)
+            if next_cursor is None and number >= start_shard:
+                if next_position is not None:
+                    next_cursor = f"{number}.{next_position}"
+                elif len(links) >= limit and shard_links and not page and number > start_shard:
+                    next_cursor = f"{number}.0"
+        return {
+            'links': links,
+            'next_cursor': next_cursor,
+            'total_links': total_links,
+            'total_clicks': total_clicks
+        }
+    
+    def get_existing_codes(self) -> set:
+        """
+        Get all existing short codes.
+        
+        Returns:
+            set: Set of existing short codes
+        """
+        codes = set()
+        for shard in self._shards:
+            codes |= shard.get_existing_codes()
+        return codes
+    
+    def get_total_urls(self) -> int:
+        """
+        Get the total number of stored URLs.
+        
+        Returns:
+            int: Total number of URLs
+        """
+        return sum(shard.get_total_urls() for shard in self._shards)
+    
+    def clear(self):
+        """
+        Remove all stored URL mappings.
+        """
+        for stripe, (lock, index) in enumerate(zip(self._url_index_locks, self._url_indexes)):
+            with lock:
+                index.clear()
+                self._url_index_key_bytes[stripe] = 0
+        for shard in self._shards:
+            shard.clear()
+    
+    def get_metrics(self) -> Dict:
+        """
+        Get internal metrics, summed across shards.
+        
+        Returns:
+            dict: Metrics keyed by structure name
+        """
+        metrics = {'shards': self.num_shards, 'bloom_filter': {'enabled': False}}
+        
+        bloom_metrics = [shard.get_metrics()['bloom_filter'] for shard in self._shards]
+        if bloom_metrics[0]['enabled']:
+            metrics['bloom_filter'] = {
+                'enabled': True,
+                'items': sum(m['items'] for m in bloom_metrics),
+                'memory_bytes': sum(m['memory_bytes'] for m in bloom_metrics),
+                'expected_false_positive_rate': max(m['expected_false_positive_rate'] for m in bloom_metrics)
+            }
+        
+        entries = 0
+        memory_bytes = 0
+        for stripe, (lock, index) in enumerate(zip(self._url_index_locks, self._url_indexes)):
+            with lock:
+                entries += len(index)
+                memory_bytes += sys.getsizeof(index) + self._url_index_key_bytes[stripe]
+        metrics['dedupe_index'] = {'entries': entries, 'memory_bytes': memory_bytes}
+        
+        shard_metrics = [shard.get_metrics() for shard in self._shards]
+        # A host with links in several shards is counted once per shard
+        metrics['host_index'] = {'hosts': sum(m['host_index']['hosts'] for m in shard_metrics)}
+        metrics['click_counters'] = shard_metrics[0]['click_counters']
+        if metrics['click_counters']['mode'] == 'per_thread':
+            metrics['click_counters'] = {
+                'mode': 'per_thread',
+                'slots': sum(m['click_counters']['slots'] for m in shard_metrics),
+                'counters': sum(m['click_counters']['counters'] for m in shard_metrics),
+                'unfolded_entries': sum(m['click_counters']['unfolded_entries'] for m in shard_metrics)
+            }
+        metrics['persistence'] = shard_metrics[0]['persistence']
+        return metrics
+
+def create_url_store(config=Config):
+    """
+    Build the URL store described by the configuration.
+    
+    When WAL_DIR is set the store is recovered from its snapshot and log
+    before it is returned, and all further writes are journaled.
+    
+    Args:
+        config: Object exposing the store settings (default: Config)
+        
+    Returns:
+        URLStore, ShardedURLStore or SQLiteURLStore: The configured store
+    """
+    if config.CLICK_COUNTER_MODE not in ('locked', 'per_thread'):
+        raise ValueError(f"Unknown click counter mode: {config.CLICK_COUNTER_MODE}")
+    per_thread_counters = config.CLICK_COUNTER_MODE == 'per_thread'
+    
+    if config.STORE_BACKEND == 'sqlite':
+        # Imported here to avoid a circular import; the SQLite store reuses
+        # the record helpers defined in this module
+        from .sqlite_store import SQLiteURLStore
+        if config.WAL_DIR:
+            logger.warning("WAL_DIR is ignored with the sqlite backend, which is durable on its own")
+        if per_thread_counters:
+            logger.warning("CLICK_COUNTER_MODE is ignored with the sqlite backend, which buffers clicks itself")
+        return SQLiteURLStore(config.SQLITE_PATH, flush_interval=config.SQLITE_CLICK_FLUSH_MS / 1000)
+    
+    if config.STORE_BACKEND == 'sharded':
+        bloom_capacity = config.BLOOM_FILTER_CAPACITY if config.BLOOM_FILTER_ENABLED else None
+        store = ShardedURLStore(num_shards=config.STORE_SHARDS, bloom_capacity=bloom_capacity,
+                                bloom_error_rate=config.BLOOM_FILTER_ERROR_RATE,
+                                per_thread_counters=per_thread_counters)
+    elif config.STORE_BACKEND == 'memory':
+        bloom_filter = None
+        if config.BLOOM_FILTER_ENABLED:
+            bloom_filter = BloomFilter(capacity=config.BLOOM_FILTER_CAPACITY,
+                                       error_rate=config.BLOOM_FILTER_ERROR_RATE)
+        store = URLStore(bloom_filter=bloom_filter, per_thread_counters=per_thread_counters)
+    else:
+        raise ValueError(f"Unknown store backend: {config.STORE_BACKEND}")
+    
+    if config.WAL_DIR:
+        if per_thread_counters:
+            logger.warning("Per-thread click counters are bypassed while the write-ahead log is enabled")
+        journal = WriteAheadLog(config.WAL_DIR,
+                                fsync_interval=config.WAL_FSYNC_INTERVAL_MS / 1000,
+                                batch_size=config.WAL_BATCH_SIZE,
+                                sync_commit=config.WAL_SYNC_COMMIT,
+                                snapshot_interval=config.WAL_SNAPSHOT_INTERVAL_S)
+        journal.recover(store)
+        journal.start(store)
+    
+    return store
 
 # Global instance - in a production environment, this would be replaced
 # with a proper database or distributed cache
-url_store = URLStore()
\ No newline at end of file
+url_store = create_url_store()
\ No newline at end of file
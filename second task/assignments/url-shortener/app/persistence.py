@@ -0,0 +1,477 @@
+import os
+import re
+import time
+import threading
+import logging
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FILE = 'snapshot.tsv'
+SEGMENT_PATTERN = re.compile(r'^wal-(\d{8})\.log$')
+RESTORE_BATCH_SIZE = 10000
+
+# Log and snapshot lines are tab-separated. Text fields (codes and URLs) are
+# backslash-escaped, so a tab, CR or newline in them cannot break the
+# framing; a line that still fails to parse is skipped with a warning on
+# recovery rather than keeping the service from starting. Click entries
+# carry the absolute click state rather than a delta, which makes replay
+# idempotent: replaying the log tail over a snapshot that already includes
+# some of those clicks still ends at the right values.
+#
+#   A <code> <created_at> <url> <canonical>         record added
+#   C <code> <clicks> <last_accessed>               click state changed
+#   D <code>                                        link disabled
+#   X                                               store cleared
+#   R <code> <created_at> <clicks> <last_accessed> <url> <canonical> [<disabled>]
+#                                                   (snapshot only)
+#
+# <canonical> is '' for records without a dedupe key and '=' when the key is
+# the URL itself; an empty <last_accessed> means None. <disabled> is '1' for
+# disabled links and absent from snapshots written before links could be
+# disabled.
+
+
+_ESCAPES = {'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'}
+_UNESCAPES = {'\\': '\\', 't': '\t', 'n': '\n', 'r': '\r'}
+_UNESCAPE_PATTERN = re.compile(r'\\(.)')
+
+
+def _escape(field: str) -> str:
+    if '\\' in field or '\t' in field or '\n' in field or '\r' in field:
+        return ''.join(_ESCAPES.get(char, char) for char in field)
+    return field
+
+
+def _unescape(field: str) -> str:
+    if '\\' not in field:
+        return field
+    return _UNESCAPE_PATTERN.sub(lambda match: _UNESCAPES.get(match.group(1), match.group(1)), field)
+
+
+def _segment_name(segment: int) -> str:
+    return f"wal-{segment:08d}.log"
+
+
+def _encode_canonical(url: str, canonical_url: Optional[str]) -> str:
+    if canonical_url is None:
+        return ''
+    if canonical_url == url:
+        return '='
+    return _escape(canonical_url)
+
+
+def _decode_canonical(url: str, field: str) -> Optional[str]:
+    if not field:
+        return None
+    if field == '=':
+        return url
+    return _unescape(field)
+
+
+def _encode_time(micros: Optional[int]) -> str:
+    return '' if micros is None else str(micros)
+
+
+def _decode_time(field: str) -> Optional[int]:
+    return int(field) if field else None
+
+
+class WriteAheadLog:
+    """
+    Append-only, group-committed log of URLStore mutations with snapshots.
+
+    Mutations are buffered in memory by the store (under its own lock) and a
+    background thread writes and fsyncs them in batches, either every
+    fsync_interval seconds or as soon as batch_size entries are pending.
+    Callers that need durability wait on the sequence number returned by the
+    log_* methods. Periodic snapshots bound recovery time: the log is rotated
+    to a new segment, the store is copied chunk by chunk without stopping
+    writers, and segments older than the rotation point are deleted once the
+    snapshot is safely renamed into place.
+    """
+
+    def __init__(self, directory: str, fsync_interval: float = 0.01, batch_size: int = 1000,
+                 sync_commit: bool = False, snapshot_interval: float = 300.0):
+        self.directory = directory
+        self.fsync_interval = fsync_interval
+        self.batch_size = batch_size
+        self.sync_commit = sync_commit
+        self.snapshot_interval = snapshot_interval
+
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._pending_work = threading.Condition(self._lock)
+        self._durable = threading.Condition(self._lock)
+        self._buffer = []
+        self._next_lsn = 1
+        self._durable_lsn = 0
+        self._segment = None
+        self._file = None
+        self._store = None
+        self._sync_waiters = 0
+        self._stopped = threading.Event()
+        self._writer = None
+        self._snapshotter = None
+        self._snapshot_lock = threading.Lock()
+        self._metrics = {
+            'entries_written': 0,
+            'commits': 0,
+            'snapshots': 0,
+            'last_recovery': None
+        }
+
+    # -- Appending ---------------------------------------------------------
+
+    def _append(self, line: str) -> int:
+        with self._lock:
+            lsn = self._next_lsn
+            self._next_lsn += 1
+            self._buffer.append(line)
+            if len(self._buffer) >= self.batch_size:
+                self._pending_work.notify()
+            return lsn
+
+    def log_add(self, short_code: str, record) -> int:
+        """
+        Log a newly added record.
+
+        Returns:
+            int: Log sequence number of the entry
+        """
+        return self._append(f"A\t{_escape(short_code)}\t{record.created_at}\t{_escape(record.url)}\t"
+                            f"{_encode_canonical(record.url, record.canonical_url)}\n")
+
+    def log_clicks(self, short_code: str, record) -> int:
+        """
+        Log the current click state of a record.
+
+        Returns:
+            int: Log sequence number of the entry
+        """
+        return self._append(f"C\t{_escape(short_code)}\t{record.clicks}\t"
+                            f"{_encode_time(record.last_accessed)}\n")
+
+    def log_disable(self, short_code: str) -> int:
+        """
+        Log that a link was disabled.
+
+        Returns:
+            int: Log sequence number of the entry
+        """
+        return self._append(f"D\t{_escape(short_code)}\n")
+
+    def log_clear(self) -> int:
+        """
+        Log that the store was cleared.
+
+        Returns:
+            int: Log sequence number of the entry
+        """
+        return self._append("X\n")
+
+    def wait_durable(self, lsn: int):
+        """
+        Block until the entry with the given sequence number is fsynced.
+        Returns immediately unless sync_commit is enabled.
+
+        Args:
+            lsn (int): Log sequence number returned by a log_* method
+        """
+        if not self.sync_commit or lsn <= 0:
+            return
+        with self._lock:
+            # A waiting request makes the writer commit without waiting out
+            # the rest of the interval; other waiters share the same fsync
+            self._sync_waiters += 1
+            self._pending_work.notify()
+            try:
+                while self._durable_lsn < lsn and not self._stopped.is_set():
+                    self._durable.wait()
+            finally:
+                self._sync_waiters -= 1
+
+    # -- Group commit ------------------------------------------------------
+
+    def _open_segment(self, segment: int):
+        self._segment = segment
+        self._file = open(os.path.join(self.directory, _segment_name(segment)), 'a', encoding='utf-8')
+
+    def _reopen_segment(self):
+        # Must be called with self._lock held
+        old_file = self._file
+        try:
+            self._open_segment(self._segment + 1)
+        except OSError as e:
+            logger.error(f"Failed to open a new log segment: {str(e)}")
+            self._file = old_file
+            return
+        try:
+            old_file.close()
+        except Exception:
+            pass
+
+    def _commit(self):
+        """Write and fsync everything buffered so far."""
+        with self._lock:
+            batch = self._buffer
+            self._buffer = []
+            lsn = self._next_lsn - 1
+            file = self._file
+
+        if batch:
+            try:
+                file.write(''.join(batch))
+                file.flush()
+                os.fsync(file.fileno())
+            except Exception:
+                # None of the batch is known durable: put it back ahead of
+                # anything appended since, and retry it in a fresh segment so
+                # a partly written line stays a torn tail of the old one.
+                # Replaying entries written twice is harmless.
+                with self._lock:
+                    self._buffer[:0] = batch
+                    if file is self._file:
+                        self._reopen_segment()
+                raise
+
+        with self._lock:
+            self._durable_lsn = max(self._durable_lsn, lsn)
+            self._metrics['entries_written'] += len(batch)
+            self._metrics['commits'] += 1 if batch else 0
+            self._durable.notify_all()
+
+    def _writer_loop(self):
+        while True:
+            with self._lock:
+                if (len(self._buffer) < self.batch_size and not self._sync_waiters
+                        and not self._stopped.is_set()):
+                    self._pending_work.wait(self.fsync_interval)
+                stopped = self._stopped.is_set()
+            try:
+                with self._snapshot_lock:
+                    self._commit()
+            except Exception as e:
+                logger.error(f"Write-ahead log commit failed: {str(e)}")
+            if stopped:
+                return
+
+    def _snapshot_loop(self):
+        while not self._stopped.wait(self.snapshot_interval):
+            try:
+                self.snapshot()
+            except Exception as e:
+                logger.error(f"Snapshot failed: {str(e)}")
+
+    def start(self, store):
+        """
+        Attach to a (recovered) store and start the background threads.
+
+        Args:
+            store: URLStore or ShardedURLStore to snapshot
+        """
+        self._store = store
+        self._stopped.clear()
+        if self._file is None:
+            self._open_segment(self._latest_segment() + 1)
+        store.attach_journal(self)
+
+        self._writer = threading.Thread(target=self._writer_loop, name='wal-writer', daemon=True)
+        self._writer.start()
+        if self.snapshot_interval > 0:
+            self._snapshotter = threading.Thread(target=self._snapshot_loop, name='wal-snapshot',
+                                                 daemon=True)
+            self._snapshotter.start()
+        logger.info(f"Write-ahead log started in {self.directory} (segment {self._segment})")
+
+    def stop(self):
+        """Flush pending entries and stop the background threads."""
+        with self._lock:
+            self._stopped.set()
+            self._pending_work.notify_all()
+            self._durable.notify_all()
+        for thread in (self._writer, self._snapshotter):
+            if thread is not None:
+                thread.join()
+        self._writer = self._snapshotter = None
+        with self._snapshot_lock:
+            self._commit()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    # -- Snapshots ---------------------------------------------------------
+
+    def _segments(self):
+        segments = []
+        for name in os.listdir(self.directory):
+            match = SEGMENT_PATTERN.match(name)
+            if match:
+                segments.append(int(match.group(1)))
+        return sorted(segments)
+
+    def _latest_segment(self) -> int:
+        segments = self._segments()
+        return segments[-1] if segments else 0
+
+    def snapshot(self, chunk_size: int = 10000) -> int:
+        """
+        Write a compact snapshot of the store and drop obsolete log segments.
+
+        Args:
+            chunk_size (int): Records copied per store lock acquisition
+
+        Returns:
+            int: Number of records in the snapshot
+        """
+        started = time.perf_counter()
+
+        # Rotate first: every mutation from here on lands in the new segment,
+        # which is replayed over the (possibly fuzzy) snapshot on recovery
+        with self._snapshot_lock:
+            self._commit()
+            with self._lock:
+                old_file = self._file
+                self._open_segment(self._segment + 1)
+                first_segment = self._segment
+            old_file.close()
+
+        tmp_path = os.path.join(self.directory, SNAPSHOT_FILE + '.tmp')
+        count = 0
+        with open(tmp_path, 'w', encoding='utf-8') as out:
+            out.write(f"#snapshot\t{first_segment}\n")
+            lines = []
+            for code, record in self._store.iter_records(chunk_size):
+                lines.append(f"R\t{_escape(code)}\t{record.created_at}\t{record.clicks}\t"
+                             f"{_encode_time(record.last_accessed)}\t{_escape(record.url)}\t"
+                             f"{_encode_canonical(record.url, record.canonical_url)}\t"
+                             f"{'1' if record.disabled else ''}\n")
+                if len(lines) >= chunk_size:
+                    out.write(''.join(lines))
+                    count += len(lines)
+                    lines = []
+            out.write(''.join(lines))
+            count += len(lines)
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp_path, os.path.join(self.directory, SNAPSHOT_FILE))
+
+        for segment in self._segments():
+            if segment < first_segment:
+                os.remove(os.path.join(self.directory, _segment_name(segment)))
+
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._metrics['snapshots'] += 1
+        logger.info(f"Snapshot of {count} records written in {elapsed:.2f}s")
+        return count
+
+    # -- Recovery ----------------------------------------------------------
+
+    def recover(self, store) -> Dict:
+        """
+        Rebuild a store from the latest snapshot plus the log tail.
+
+        Must be called on an empty store before start().
+
+        Args:
+            store: URLStore or ShardedURLStore to load into
+
+        Returns:
+            dict: Records loaded, log entries replayed and elapsed seconds
+        """
+        # Imported here to avoid a circular import with models
+        from .models import URLRecord
+
+        started = time.perf_counter()
+        snapshot_records = 0
+        log_entries = 0
+        skipped = 0
+        first_segment = 0
+        restore_record = store.restore_record
+
+        snapshot_path = os.path.join(self.directory, SNAPSHOT_FILE)
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path, encoding='utf-8') as f:
+                header = f.readline().rstrip('\n').split('\t')
+                first_segment = int(header[1])
+                batch = []
+                for line_number, line in enumerate(f, start=2):
+                    try:
+                        _, code, created_at, clicks, last_accessed, url, canonical, *rest = \
+                            line.rstrip('\n').split('\t')
+                        url = _unescape(url)
+                        batch.append((_unescape(code), URLRecord(url, int(created_at), int(clicks),
+                                                                 _decode_time(last_accessed),
+                                                                 _decode_canonical(url, canonical),
+                                                                 disabled=rest == ['1'])))
+                    except ValueError:
+                        logger.warning(f"Skipping malformed snapshot line {line_number}: {line!r}")
+                        skipped += 1
+                        continue
+                    if len(batch) >= RESTORE_BATCH_SIZE:
+                        store.restore_records(batch)
+                        snapshot_records += len(batch)
+                        batch = []
+                store.restore_records(batch)
+                snapshot_records += len(batch)
+
+        for segment in self._segments():
+            if segment < first_segment:
+                continue
+            with open(os.path.join(self.directory, _segment_name(segment)), encoding='utf-8') as f:
+                for line_number, line in enumerate(f, start=1):
+                    if not line.endswith('\n'):
+                        # Torn write at the tail of the last segment
+                        logger.warning(f"Ignoring incomplete log entry in segment {segment}")
+                        break
+                    fields = line[:-1].split('\t')
+                    op = fields[0]
+                    try:
+                        if op == 'C' and len(fields) == 4:
+                            store.restore_clicks(_unescape(fields[1]), int(fields[2]),
+                                                 _decode_time(fields[3]))
+                        elif op == 'A' and len(fields) == 5:
+                            url = _unescape(fields[3])
+                            restore_record(_unescape(fields[1]), URLRecord(
+                                url, int(fields[2]), canonical_url=_decode_canonical(url, fields[4])))
+                        elif op == 'D' and len(fields) == 2:
+                            store.restore_disabled(_unescape(fields[1]))
+                        elif op == 'X' and len(fields) == 1:
+                            store.clear()
+                        else:
+                            raise ValueError("unknown entry")
+                    except ValueError:
+                        logger.warning(f"Skipping malformed log entry {line_number} "
+                                       f"in segment {segment}: {line!r}")
+                        skipped += 1
+                        continue
+                    log_entries += 1
+
+        result = {
+            'snapshot_records': snapshot_records,
+            'log_entries': log_entries,
+            'skipped_entries': skipped,
+            'seconds': round(time.perf_counter() - started, 3)
+        }
+        with self._lock:
+            self._metrics['last_recovery'] = result
+        logger.info(f"Recovered {snapshot_records} records and {log_entries} log entries "
+                    f"in {result['seconds']}s")
+        return result
+
+    def get_metrics(self) -> Dict:
+        """
+        Get write, commit, snapshot and recovery metrics.
+
+        Returns:
+            dict: Log metrics
+        """
+        with self._lock:
+            return {
+                'segment': self._segment,
+                'pending_entries': len(self._buffer),
+                'durable_lsn': self._durable_lsn,
+                **self._metrics
+            }
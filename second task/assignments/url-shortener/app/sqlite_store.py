@@ -0,0 +1,740 @@
+import sqlite3
+import threading
+import logging
+from typing import Dict, List, Optional, Tuple
+from .models import (DEFAULT_HOST_PAGE, TOTALS_HOURS, ClickDetails, URLRecord,
+                     format_timestamp, now_micros)
+from .utils import url_host
+from .hll import HyperLogLog
+from .breakdown import ClickBreakdowns, empty_breakdowns
+from .timeseries import HOUR_MICROS, BucketRing, ClickTimeSeries, empty_buckets
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS urls ('
+    'short_code TEXT PRIMARY KEY, '
+    'url TEXT NOT NULL, '
+    'clicks INTEGER NOT NULL DEFAULT 0, '
+    'created_at INTEGER NOT NULL, '
+    'last_accessed INTEGER, '
+    'canonical_url TEXT, '
+    'disabled INTEGER NOT NULL DEFAULT 0, '
+    'host TEXT'
+    ') WITHOUT ROWID',
+    'CREATE UNIQUE INDEX IF NOT EXISTS urls_canonical_url '
+    'ON urls (canonical_url) WHERE canonical_url IS NOT NULL',
+)
+
+# Created after any missing columns are added to an older database
+SQL_HOST_INDEX = 'CREATE INDEX IF NOT EXISTS urls_host ON urls (host, short_code)'
+
+# Statements are module constants so sqlite3's per-connection statement cache
+# reuses the prepared form on every call
+SQL_INSERT = ('INSERT OR IGNORE INTO urls (short_code, url, created_at, canonical_url, host) '
+              'VALUES (?, ?, ?, ?, ?)')
+SQL_SELECT_URL = 'SELECT url, disabled FROM urls WHERE short_code = ?'
+SQL_SELECT_RECORD = ('SELECT url, clicks, created_at, last_accessed, canonical_url '
+                     'FROM urls WHERE short_code = ?')
+SQL_SELECT_BY_CANONICAL = 'SELECT short_code FROM urls WHERE canonical_url = ?'
+SQL_EXISTS = 'SELECT 1 FROM urls WHERE short_code = ?'
+SQL_APPLY_CLICKS = ('UPDATE urls SET clicks = clicks + ?, '
+                    'last_accessed = MAX(COALESCE(last_accessed, 0), ?) '
+                    'WHERE short_code = ?')
+SQL_DISABLE = 'UPDATE urls SET disabled = 1 WHERE short_code = ? AND disabled = 0'
+SQL_IMPORT = ('INSERT OR IGNORE INTO urls (short_code, url, clicks, created_at, last_accessed, '
+              'canonical_url, disabled, host) VALUES (?, ?, ?, ?, ?, ?, ?, ?)')
+SQL_SCAN = ('SELECT short_code, url, clicks, created_at, last_accessed, canonical_url, disabled '
+            'FROM urls WHERE short_code > ? ORDER BY short_code LIMIT ?')
+SQL_HOST_PAGE = ('SELECT short_code, url, clicks, created_at, last_accessed, canonical_url, disabled '
+                 'FROM urls WHERE host = ? AND short_code > ? ORDER BY short_code LIMIT ?')
+SQL_HOST_TOTALS = 'SELECT COUNT(*), COALESCE(SUM(clicks), 0) FROM urls WHERE host = ?'
+SQL_HOST_CODES = 'SELECT short_code FROM urls WHERE host = ? AND short_code IN ({})'
+
+# Buffered codes looked up per statement when crediting a host's total,
+# well under SQLite's bound-parameter limit
+HOST_PENDING_CHUNK = 500
+
+
+class SQLiteURLStore:
+    """
+    URL store backed by a SQLite database, with the same interface as URLStore.
+
+    Each thread gets its own connection, the database runs in WAL mode so
+    readers never block the writer, and click increments are buffered in
+    memory and folded into the table by a background thread in a single
+    transaction per flush. Stats merge in any not-yet-flushed clicks, so
+    reads always see the caller's own increments. Click time series and
+    unique visitor sketches and referrer / user agent breakdowns are kept in
+    memory only, like those of URLStore.
+    Global totals are counted once at startup and then maintained on every
+    write made through this process.
+    """
+
+    def __init__(self, path: str, flush_interval: float = 0.05):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._local = threading.local()
+        self._connections = []  # (owning thread, connection)
+        self._connections_lock = threading.Lock()
+
+        # short_code -> [pending clicks, latest access time]
+        self._pending_clicks = {}
+        self._pending_lock = threading.Lock()
+        self._timeseries = {}  # short_code -> ClickTimeSeries, guarded by _pending_lock
+        self._visitors = {}  # short_code -> HyperLogLog, guarded by _pending_lock
+        self._breakdowns = {}  # short_code -> ClickBreakdowns, guarded by _pending_lock
+        # Held across swap-and-commit so stats never observe clicks that have
+        # left the buffer but are not yet visible in the table
+        self._flush_lock = threading.Lock()
+        self._flushes = 0
+        self._flushed_clicks = 0
+
+        conn = self._conn()
+        for statement in SCHEMA:
+            conn.execute(statement)
+        # Databases created by earlier versions lack the newer columns
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(urls)')]
+        if 'disabled' not in columns:
+            conn.execute('ALTER TABLE urls ADD COLUMN disabled INTEGER NOT NULL DEFAULT 0')
+        if 'host' not in columns:
+            conn.execute('ALTER TABLE urls ADD COLUMN host TEXT')
+            self._backfill_hosts(conn)
+        conn.execute(SQL_HOST_INDEX)
+        # Earlier versions indexed "example.com." apart from "example.com"
+        conn.execute("UPDATE urls SET host = NULLIF(rtrim(host, '.'), '') WHERE host LIKE '%.'")
+
+        # Global totals, guarded by _pending_lock
+        self._total_links, self._total_clicks = conn.execute(
+            'SELECT COUNT(*), COALESCE(SUM(clicks), 0) FROM urls').fetchone()
+        self._links_per_hour = BucketRing(HOUR_MICROS, TOTALS_HOURS)
+        self._clicks_per_hour = BucketRing(HOUR_MICROS, TOTALS_HOURS)
+
+        self._stopped = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, name='sqlite-click-flusher',
+                                         daemon=True)
+        self._flusher.start()
+        logger.info(f"SQLiteURLStore initialized at {path}")
+
+    def _backfill_hosts(self, conn: sqlite3.Connection):
+        rows = conn.execute('SELECT short_code, url FROM urls').fetchall()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany('UPDATE urls SET host = ? WHERE short_code = ?',
+                             ((url_host(url), code) for code, url in rows))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        logger.info(f"Indexed hosts of {len(rows)} existing links")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None,
+                                   check_same_thread=False, cached_statements=64)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            with self._connections_lock:
+                # Under a thread-per-request server threads come and go;
+                # close the connections of those that have exited so file
+                # descriptors do not pile up
+                live = []
+                for thread, other in self._connections:
+                    if thread.is_alive():
+                        live.append((thread, other))
+                    else:
+                        other.close()
+                live.append((threading.current_thread(), conn))
+                self._connections = live
+        return conn
+
+    def close(self):
+        """Flush pending clicks, stop the background writer and close connections."""
+        self._stopped.set()
+        self._flusher.join()
+        self.flush()
+        with self._connections_lock:
+            for _, conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    # -- Click batching ----------------------------------------------------
+
+    def _flush_loop(self):
+        while not self._stopped.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Failed to flush click counts: {str(e)}")
+
+    def flush(self) -> int:
+        """
+        Write all buffered click increments in one transaction.
+
+        Returns:
+            int: Number of codes updated
+        """
+        with self._flush_lock:
+            return self._flush()
+
+    def _flush(self) -> int:
+        with self._pending_lock:
+            pending = self._pending_clicks
+            self._pending_clicks = {}
+        if not pending:
+            return 0
+
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany(SQL_APPLY_CLICKS,
+                             ((count, last, code) for code, (count, last) in pending.items()))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            # Put the clicks back so they are retried on the next flush
+            with self._pending_lock:
+                for code, (count, last) in pending.items():
+                    entry = self._pending_clicks.setdefault(code, [0, last])
+                    entry[0] += count
+                    entry[1] = max(entry[1], last)
+            raise
+
+        with self._pending_lock:
+            self._flushes += 1
+            self._flushed_clicks += sum(count for count, _ in pending.values())
+        logger.debug(f"Flushed click counts for {len(pending)} codes")
+        return len(pending)
+
+    # -- URLStore interface ------------------------------------------------
+
+    def might_contain(self, short_code: str) -> bool:
+        """
+        Membership pre-check; SQLite lookups are already lock-free for readers.
+
+        Returns:
+            bool: Always True
+        """
+        return True
+
+    def add_url(self, short_code: str, original_url: str) -> bool:
+        """
+        Add a new URL mapping.
+
+        Args:
+            short_code (str): The short code
+            original_url (str): The original URL
+
+        Returns:
+            bool: True if added successfully, False if code already exists
+        """
+        created_at = now_micros()
+        cursor = self._conn().execute(SQL_INSERT, (short_code, original_url, created_at, None,
+                                                    url_host(original_url)))
+        if cursor.rowcount == 0:
+            logger.warning(f"Attempted to add existing short code: {short_code}")
+            return False
+        self._count_link(created_at)
+        logger.info(f"Added URL mapping: {short_code} -> {original_url}")
+        return True
+
+    def add_or_get_url(self, short_code: str, original_url: str,
+                       canonical_url: str) -> Tuple[Optional[str], bool]:
+        """
+        Add a URL mapping unless the canonical URL is already stored.
+
+        Args:
+            short_code (str): The short code to use if the URL is new
+            original_url (str): The original URL
+            canonical_url (str): The canonical form used as the dedupe key
+
+        Returns:
+            tuple: (short_code, created), as for URLStore.add_or_get_url
+        """
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(SQL_SELECT_BY_CANONICAL, (canonical_url,)).fetchone()
+            if row is not None:
+                conn.execute('COMMIT')
+                logger.info(f"Deduplicated URL {original_url} -> {row[0]}")
+                return row[0], False
+
+            created_at = now_micros()
+            cursor = conn.execute(SQL_INSERT, (short_code, original_url, created_at, canonical_url,
+                                               url_host(original_url)))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+        if cursor.rowcount == 0:
+            logger.warning(f"Attempted to add existing short code: {short_code}")
+            return None, False
+        self._count_link(created_at)
+        logger.info(f"Added URL mapping: {short_code} -> {original_url}")
+        return short_code, True
+
+    def add_urls(self, items) -> List[bool]:
+        """
+        Add many URL mappings in one transaction.
+
+        Args:
+            items (iterable): (short_code, original_url) pairs
+
+        Returns:
+            list: As for URLStore.add_urls
+        """
+        return [created for _, created in self._add_many(
+            (short_code, original_url, None) for short_code, original_url in items)]
+
+    def add_or_get_urls(self, items) -> List[Tuple[Optional[str], bool]]:
+        """
+        Add many URL mappings unless already stored, in one transaction.
+
+        Args:
+            items (iterable): (short_code, original_url, canonical_url) triples
+
+        Returns:
+            list: As for URLStore.add_or_get_urls
+        """
+        return self._add_many(items)
+
+    def _add_many(self, items) -> List[Tuple[Optional[str], bool]]:
+        # Hosts are parsed before the write lock is taken
+        items = [(short_code, original_url, canonical_url, url_host(original_url))
+                 for short_code, original_url, canonical_url in items]
+        conn = self._conn()
+        results = []
+        created = []
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for short_code, original_url, canonical_url, host in items:
+                if canonical_url is not None:
+                    row = conn.execute(SQL_SELECT_BY_CANONICAL, (canonical_url,)).fetchone()
+                    if row is not None:
+                        results.append((row[0], False))
+                        continue
+                created_at = now_micros()
+                cursor = conn.execute(SQL_INSERT, (short_code, original_url, created_at,
+                                                   canonical_url, host))
+                if cursor.rowcount == 0:
+                    results.append((None, False))
+                else:
+                    results.append((short_code, True))
+                    created.append(created_at)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+        for created_at in created:
+            self._count_link(created_at)
+        logger.info(f"Added {len(created)} URL mappings in one transaction")
+        return results
+
+    def import_records(self, items) -> List[bool]:
+        """
+        Add complete records, e.g. from another cluster's export, in one
+        transaction.
+
+        Args:
+            items (iterable): (short_code, URLRecord) pairs
+
+        Returns:
+            list: As for URLStore.import_records
+        """
+        # Hosts are parsed before the write lock is taken
+        items = [(short_code, record, url_host(record.url)) for short_code, record in items]
+        conn = self._conn()
+        results = []
+        created = []
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for short_code, record, host in items:
+                canonical_url = record.canonical_url
+                if canonical_url is not None and conn.execute(
+                        SQL_SELECT_BY_CANONICAL, (canonical_url,)).fetchone() is not None:
+                    canonical_url = record.canonical_url = None
+                cursor = conn.execute(SQL_IMPORT, (short_code, record.url, record.clicks,
+                                                   record.created_at, record.last_accessed,
+                                                   canonical_url, int(record.disabled), host))
+                results.append(cursor.rowcount > 0)
+                if cursor.rowcount:
+                    created.append(record)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+        for record in created:
+            self._count_link(record.created_at)
+        with self._pending_lock:
+            self._total_clicks += sum(record.clicks for record in created)
+        logger.debug(f"Imported {len(created)} of {len(results)} records")
+        return results
+
+    def _count_link(self, created_at: int):
+        with self._pending_lock:
+            self._total_links += 1
+            self._links_per_hour.add(created_at)
+
+    def get_url(self, short_code: str) -> Optional[str]:
+        """
+        Get the original URL for a short code.
+
+        Args:
+            short_code (str): The short code
+
+        Returns:
+            str: The original URL, or None if not found
+        """
+        row = self._conn().execute(SQL_SELECT_URL, (short_code,)).fetchone()
+        if row is None:
+            logger.warning(f"Short code not found: {short_code}")
+            return None
+        return row[0]
+
+    def resolve(self, short_code: str) -> Tuple[Optional[str], bool]:
+        """
+        Get the original URL for a short code and whether it is disabled,
+        from a single query.
+
+        Args:
+            short_code (str): The short code
+
+        Returns:
+            tuple: (original URL or None if not found, True if disabled)
+        """
+        row = self._conn().execute(SQL_SELECT_URL, (short_code,)).fetchone()
+        if row is None:
+            return None, False
+        return row[0], bool(row[1])
+
+    def disable_codes(self, short_codes) -> int:
+        """
+        Mark links as disabled so they no longer redirect, in one transaction.
+
+        Args:
+            short_codes (iterable): Codes to disable; unknown or already
+                disabled codes are skipped
+
+        Returns:
+            int: Number of links newly disabled
+        """
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            disabled = conn.executemany(SQL_DISABLE, ((code,) for code in short_codes)).rowcount
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        if disabled:
+            logger.info(f"Disabled {disabled} links")
+        return disabled
+
+    def contains(self, short_code: str) -> bool:
+        """
+        Check whether a short code is already stored.
+
+        Args:
+            short_code (str): The short code
+
+        Returns:
+            bool: True if the code exists, False otherwise
+        """
+        return self._conn().execute(SQL_EXISTS, (short_code,)).fetchone() is not None
+
+    def increment_clicks(self, short_code: str, details: Optional[ClickDetails] = None) -> bool:
+        """
+        Record a click; the counter itself is updated by the next flush.
+
+        Args:
+            short_code (str): The short code
+            details (ClickDetails): Visitor, referrer and user agent of the
+                click, for unique clicks and breakdowns
+
+        Returns:
+            bool: True if recorded, False if code doesn't exist
+        """
+        if not self.contains(short_code):
+            logger.warning(f"Attempted to increment clicks for non-existent code: {short_code}")
+            return False
+
+        now = now_micros()
+        with self._pending_lock:
+            entry = self._pending_clicks.get(short_code)
+            if entry is None:
+                self._pending_clicks[short_code] = [1, now]
+            else:
+                entry[0] += 1
+                entry[1] = now
+            self._add_history(short_code, 1, now, () if details is None else (details,))
+        return True
+
+    def _add_history(self, short_code: str, count: int, accessed_at: int, details):
+        history = self._timeseries.get(short_code)
+        if history is None:
+            history = self._timeseries[short_code] = ClickTimeSeries()
+        history.add(accessed_at, count)
+        self._total_clicks += count
+        self._clicks_per_hour.add(accessed_at, count)
+        for detail in details:
+            if detail.visitor is not None:
+                sketch = self._visitors.get(short_code)
+                if sketch is None:
+                    sketch = self._visitors[short_code] = HyperLogLog()
+                sketch.add(detail.visitor)
+            breakdowns = self._breakdowns.get(short_code)
+            if breakdowns is None:
+                breakdowns = self._breakdowns[short_code] = ClickBreakdowns()
+            breakdowns.add(detail.referrer, detail.agent)
+
+    def apply_clicks(self, totals: Dict[str, list]):
+        """
+        Merge a batch of aggregated clicks into the write buffer.
+
+        Args:
+            totals (dict): short_code -> (click count, last access in epoch
+                microseconds, ClickDetails list)
+        """
+        with self._pending_lock:
+            for short_code, (count, last_accessed, details) in totals.items():
+                entry = self._pending_clicks.get(short_code)
+                if entry is None:
+                    self._pending_clicks[short_code] = [count, last_accessed]
+                else:
+                    entry[0] += count
+                    entry[1] = max(entry[1], last_accessed)
+                self._add_history(short_code, count, last_accessed, details)
+
+    def get_stats(self, short_code: str) -> Optional[Dict]:
+        """
+        Get analytics data for a short code, including unflushed clicks.
+
+        Args:
+            short_code (str): The short code
+
+        Returns:
+            dict: Analytics data, or None if not found
+        """
+        with self._flush_lock:
+            row = self._conn().execute(SQL_SELECT_RECORD, (short_code,)).fetchone()
+            if row is None:
+                logger.warning(f"Stats requested for non-existent code: {short_code}")
+                return None
+
+            url, clicks, created_at, last_accessed, _ = row
+            with self._pending_lock:
+                entry = self._pending_clicks.get(short_code)
+                if entry is not None:
+                    clicks += entry[0]
+                    last_accessed = max(last_accessed or 0, entry[1])
+                sketch = self._visitors.get(short_code)
+                unique_clicks = sketch.estimate() if sketch is not None else 0
+
+        return {
+            'url': url,
+            'clicks': clicks,
+            'unique_clicks': unique_clicks,
+            'created_at': format_timestamp(created_at),
+            'last_accessed': format_timestamp(last_accessed)
+        }
+
+    def get_timeseries(self, short_code: str, resolution: str = 'minute',
+                       limit: Optional[int] = None) -> Optional[list]:
+        """
+        Get the click history of a short code at one resolution.
+
+        Args:
+            short_code (str): The short code
+            resolution (str): 'minute', 'hour' or 'day'
+            limit (int): Number of most recent buckets, defaulting to all kept
+
+        Returns:
+            list: (bucket start in epoch microseconds, clicks), oldest first,
+                or None if not found
+        """
+        if not self.contains(short_code):
+            return None
+        now = now_micros()
+        with self._pending_lock:
+            history = self._timeseries.get(short_code)
+            if history is None:
+                return empty_buckets(resolution, now, limit)
+            return history.buckets(resolution, now, limit)
+
+    def get_breakdowns(self, short_code: str) -> Optional[Dict]:
+        """
+        Get clicks by referrer host and user agent family for a short code.
+
+        Args:
+            short_code (str): The short code
+
+        Returns:
+            dict: As for ClickBreakdowns.to_dict, or None if not found
+        """
+        if not self.contains(short_code):
+            return None
+        with self._pending_lock:
+            breakdowns = self._breakdowns.get(short_code)
+            if breakdowns is None:
+                return empty_breakdowns()
+            return breakdowns.to_dict()
+
+    def get_links_by_host(self, host: str, cursor: Optional[str] = None,
+                          limit: int = DEFAULT_HOST_PAGE) -> Dict:
+        """
+        List the links pointing at a host, a page at a time, using the
+        (host, short_code) index. The cursor is the last short code of the
+        previous page. Unflushed clicks are added to the per-link counts and
+        the host total, as get_stats does, instead of forcing a flush.
+
+        Args:
+            host (str): Lowercased host name
+            cursor (str): next_cursor from the previous page, or None to start
+            limit (int): Maximum number of links on the page
+
+        Returns:
+            dict: As for URLStore.get_links_by_host
+        """
+        conn = self._conn()
+        with self._flush_lock:
+            rows = conn.execute(SQL_HOST_PAGE, (host, cursor or '', limit + 1)).fetchall()
+            total_links, total_clicks = conn.execute(SQL_HOST_TOTALS, (host,)).fetchone()
+            with self._pending_lock:
+                pending = {code: tuple(entry) for code, entry in self._pending_clicks.items()}
+            if pending:
+                total_clicks += self._pending_on_host(conn, host, pending)
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        links = []
+        for code, url, clicks, created_at, last_accessed, canonical_url, disabled in rows:
+            entry = pending.get(code)
+            if entry is not None:
+                clicks += entry[0]
+                last_accessed = max(last_accessed or 0, entry[1])
+            links.append(URLRecord(url, created_at, clicks, last_accessed, canonical_url,
+                                   bool(disabled)).to_link_summary(code))
+        return {
+            'links': links,
+            'next_cursor': rows[-1][0] if has_more else None,
+            'total_links': total_links,
+            'total_clicks': total_clicks
+        }
+
+    def _pending_on_host(self, conn: sqlite3.Connection, host: str,
+                         pending: Dict[str, Tuple[int, int]]) -> int:
+        # Sum the buffered clicks of the codes that point at a host
+        codes = list(pending)
+        clicks = 0
+        for start in range(0, len(codes), HOST_PENDING_CHUNK):
+            chunk = codes[start:start + HOST_PENDING_CHUNK]
+            rows = conn.execute(SQL_HOST_CODES.format(', '.join('?' * len(chunk))), (host, *chunk))
+            clicks += sum(pending[code][0] for code, in rows)
+        return clicks
+
+    def get_totals(self, now: Optional[int] = None) -> Dict:
+        """
+        Get service-wide link and click totals without querying the table.
+
+        Args:
+            now (int): Time the hourly series end at, in epoch microseconds
+                (default: now)
+
+        Returns:
+            dict: As for URLStore.get_totals
+        """
+        if now is None:
+            now = now_micros()
+        with self._pending_lock:
+            return {
+                'links': self._total_links,
+                'clicks': self._total_clicks,
+                'links_per_hour': self._links_per_hour.buckets(now, TOTALS_HOURS),
+                'clicks_per_hour': self._clicks_per_hour.buckets(now, TOTALS_HOURS)
+            }
+
+    def get_existing_codes(self) -> set:
+        """
+        Get all existing short codes.
+
+        Returns:
+            set: Set of existing short codes
+        """
+        return {row[0] for row in self._conn().execute('SELECT short_code FROM urls')}
+
+    def get_total_urls(self) -> int:
+        """
+        Get the total number of stored URLs.
+
+        Returns:
+            int: Total number of URLs
+        """
+        return self._conn().execute('SELECT COUNT(*) FROM urls').fetchone()[0]
+
+    def clear(self):
+        """
+        Remove all stored URL mappings.
+        """
+        with self._pending_lock:
+            self._pending_clicks.clear()
+            self._timeseries.clear()
+            self._visitors.clear()
+            self._breakdowns.clear()
+            self._total_links = self._total_clicks = 0
+            self._links_per_hour = BucketRing(HOUR_MICROS, TOTALS_HOURS)
+            self._clicks_per_hour = BucketRing(HOUR_MICROS, TOTALS_HOURS)
+        self._conn().execute('DELETE FROM urls')
+        logger.info("SQLiteURLStore cleared")
+
+    def iter_records(self, chunk_size: int = 1000):
+        """
+        Iterate over all records in short code order, one query per chunk.
+        Clicks buffered when the walk starts are flushed first, as the other
+        stores include them.
+
+        Args:
+            chunk_size (int): Rows fetched per query
+
+        Yields:
+            tuple: (short_code, URLRecord)
+        """
+        self.flush()
+        conn = self._conn()
+        last_code = ''
+        while True:
+            rows = conn.execute(SQL_SCAN, (last_code, chunk_size)).fetchall()
+            if not rows:
+                return
+            for code, url, clicks, created_at, last_accessed, canonical_url, disabled in rows:
+                yield code, URLRecord(url, created_at, clicks, last_accessed, canonical_url,
+                                      bool(disabled))
+            last_code = rows[-1][0]
+
+    def get_metrics(self) -> Dict:
+        """
+        Get internal metrics for the store.
+
+        Returns:
+            dict: Metrics keyed by structure name
+        """
+        entries = self._conn().execute(
+            'SELECT COUNT(*) FROM urls WHERE canonical_url IS NOT NULL').fetchone()[0]
+        with self._pending_lock:
+            click_buffer = {
+                'pending_codes': len(self._pending_clicks),
+                'flushes': self._flushes,
+                'flushed_clicks': self._flushed_clicks
+            }
+        return {
+            'bloom_filter': {'enabled': False},
+            'dedupe_index': {'entries': entries},
+            'persistence': {'enabled': True, 'backend': 'sqlite', 'path': self.path,
+                            'click_buffer': click_buffer}
+        }
@@ -0,0 +1,170 @@
+from array import array
+from typing import List, Optional, Tuple
+
+MINUTE_MICROS = 60 * 1_000_000
+HOUR_MICROS = 60 * MINUTE_MICROS
+DAY_MICROS = 24 * HOUR_MICROS
+
+# name -> (bucket width in microseconds, number of buckets kept)
+RESOLUTIONS = {
+    'minute': (MINUTE_MICROS, 60),
+    'hour': (HOUR_MICROS, 48),
+    'day': (DAY_MICROS, 90),
+}
+
+
+class BucketRing:
+    """
+    Fixed-size ring of click counts for consecutive time buckets.
+
+    Only the newest `size` buckets are kept. Moving the head forward zeroes
+    the slots it passes over, so an add costs O(1) amortized and memory never
+    depends on traffic. Adds for buckets older than the ring are dropped.
+    """
+
+    __slots__ = ('width', 'counts', 'head')
+
+    def __init__(self, width: int, size: int):
+        self.width = width
+        self.counts = array('I', [0]) * size
+        self.head = None  # newest bucket number written so far
+
+    def add(self, micros: int, count: int = 1):
+        """
+        Add clicks to the bucket containing a timestamp.
+
+        Args:
+            micros (int): Click time in epoch microseconds
+            count (int): Number of clicks
+        """
+        bucket = micros // self.width
+        counts = self.counts
+        size = len(counts)
+        if self.head is None:
+            self.head = bucket
+        elif bucket > self.head:
+            if bucket - self.head >= size:
+                for i in range(size):
+                    counts[i] = 0
+            else:
+                for skipped in range(self.head + 1, bucket + 1):
+                    counts[skipped % size] = 0
+            self.head = bucket
+        elif bucket <= self.head - size:
+            return
+        counts[bucket % size] += count
+
+    def copy(self) -> 'BucketRing':
+        """
+        Copy the ring.
+
+        Returns:
+            BucketRing: Independent ring with the same counts
+        """
+        clone = BucketRing(self.width, len(self.counts))
+        clone.counts = array('I', self.counts)
+        clone.head = self.head
+        return clone
+
+    def buckets(self, now: int, limit: int) -> List[Tuple[int, int]]:
+        """
+        Read the newest buckets up to and including the one containing now.
+
+        Args:
+            now (int): Current time in epoch microseconds
+            limit (int): Number of buckets to return (at most the ring size)
+
+        Returns:
+            list: (bucket start in epoch microseconds, clicks), oldest first
+        """
+        counts = self.counts
+        size = len(counts)
+        end = now // self.width
+        result = []
+        for bucket in range(end - min(limit, size) + 1, end + 1):
+            clicks = 0
+            if self.head is not None and self.head - size < bucket <= self.head:
+                clicks = counts[bucket % size]
+            result.append((bucket * self.width, clicks))
+        return result
+
+
+class ClickTimeSeries:
+    """
+    Per-link click history at minute, hour and day resolution.
+
+    Every click is rolled up into all three rings as it is recorded, so a
+    query at any resolution reads at most one ring and never replays events.
+    """
+
+    __slots__ = ('rings',)
+
+    def __init__(self):
+        self.rings = {name: BucketRing(width, size) for name, (width, size) in RESOLUTIONS.items()}
+
+    def add(self, micros: int, count: int = 1):
+        """
+        Record clicks at a point in time.
+
+        Args:
+            micros (int): Click time in epoch microseconds
+            count (int): Number of clicks
+        """
+        for ring in self.rings.values():
+            ring.add(micros, count)
+
+    def buckets(self, resolution: str, now: int, limit: Optional[int] = None) -> List[Tuple[int, int]]:
+        """
+        Read the newest buckets at one resolution.
+
+        Args:
+            resolution (str): 'minute', 'hour' or 'day'
+            now (int): Current time in epoch microseconds
+            limit (int): Number of buckets, defaulting to the whole ring
+
+        Returns:
+            list: (bucket start in epoch microseconds, clicks), oldest first
+        """
+        ring = self.rings[resolution]
+        return ring.buckets(now, limit or len(ring.counts))
+
+    def memory_bytes(self) -> int:
+        """
+        Bytes used by the bucket arrays.
+
+        Returns:
+            int: Total size of the count arrays
+        """
+        return sum(ring.counts.itemsize * len(ring.counts) for ring in self.rings.values())
+
+
+def sum_buckets(bucket_lists) -> List[Tuple[int, int]]:
+    """
+    Add up aligned bucket lists, e.g. the same query against several shards.
+
+    Args:
+        bucket_lists (iterable): Lists of (bucket start, count) with equal starts
+
+    Returns:
+        list: (bucket start, summed count), oldest first
+    """
+    bucket_lists = list(bucket_lists)
+    return [(buckets[0][0], sum(count for _, count in buckets)) for buckets in zip(*bucket_lists)]
+
+
+def empty_buckets(resolution: str, now: int, limit: Optional[int] = None) -> List[Tuple[int, int]]:
+    """
+    Zero-filled buckets for a link that has never been clicked.
+
+    Args:
+        resolution (str): 'minute', 'hour' or 'day'
+        now (int): Current time in epoch microseconds
+        limit (int): Number of buckets, defaulting to the whole ring
+
+    Returns:
+        list: (bucket start in epoch microseconds, 0), oldest first
+    """
+    width, size = RESOLUTIONS[resolution]
+    end = now // width
+    count = min(limit or size, size)
+    return [(bucket * width, 0) for bucket in range(end - count + 1, end + 1)]
@@ -0,0 +1,228 @@
+import heapq
+import threading
+import logging
+from operator import itemgetter
+from typing import Dict, List, Optional, Tuple
+from .models import now_micros
+
+logger = logging.getLogger(__name__)
+
+SECOND_MICROS = 1_000_000
+
+# name -> (window length in microseconds, number of sub-windows)
+WINDOWS = {
+    '1m': (60 * SECOND_MICROS, 6),
+    '1h': (3600 * SECOND_MICROS, 12),
+    '24h': (86400 * SECOND_MICROS, 24),
+}
+
+
+class SpaceSaving:
+    """
+    Space-Saving heavy hitters summary over at most `capacity` keys.
+
+    Every key whose true count exceeds total / capacity is guaranteed to be
+    tracked. A tracked key's count overestimates the truth by at most its
+    recorded error, the count of the key it evicted. The minimum is found
+    through a lazy heap: entries may lag behind their key's count and are
+    only corrected when they reach the top, so a hit on a tracked key is a
+    single dict update.
+    """
+
+    __slots__ = ('capacity', 'counts', 'errors', '_heap')
+
+    def __init__(self, capacity: int):
+        if capacity < 1:
+            raise ValueError("Space-Saving capacity must be positive")
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+        self._heap = []  # (count at push time, key), one entry per tracked key
+
+    def add(self, key: str, count: int = 1):
+        """
+        Count occurrences of a key.
+
+        Args:
+            key (str): The key
+            count (int): Number of occurrences
+        """
+        counts = self.counts
+        if key in counts:
+            counts[key] += count
+            return
+
+        if len(counts) < self.capacity:
+            counts[key] = count
+            self.errors[key] = 0
+            heapq.heappush(self._heap, (count, key))
+            return
+
+        heap = self._heap
+        while True:
+            recorded, victim = heap[0]
+            actual = counts[victim]
+            if recorded == actual:
+                break
+            heapq.heapreplace(heap, (actual, victim))
+
+        del counts[victim]
+        del self.errors[victim]
+        counts[key] = recorded + count
+        self.errors[key] = recorded
+        heapq.heapreplace(heap, (recorded + count, key))
+
+    def clear(self):
+        """Forget every key."""
+        self.counts.clear()
+        self.errors.clear()
+        self._heap.clear()
+
+
+class TopLinks:
+    """
+    Most-clicked links over sliding 1m, 1h and 24h windows.
+
+    Each window is split into sub-windows with one SpaceSaving summary each,
+    kept in a ring and reset as it is reused, so memory is fixed at
+    capacity keys per sub-window no matter how many links get clicks. A
+    query merges the live sub-windows of one window and never touches the
+    URL store. The window slides one sub-window at a time, so it covers
+    between (n - 1) / n and all of its nominal length.
+
+    Links are spread over independently locked stripes by hash, as in
+    ShardedURLStore, so concurrent redirects rarely wait on each other. A
+    link always lands in the same stripe, so a query just concatenates the
+    stripes. The capacity is split evenly between them.
+    """
+
+    def __init__(self, capacity: int = 1000, stripes: int = 1):
+        if stripes < 1:
+            raise ValueError("TopLinks needs at least one stripe")
+        self.capacity = capacity
+        self.stripes = stripes
+        stripe_capacity = -(-capacity // stripes)
+        self._locks = [threading.Lock() for _ in range(stripes)]
+        # per stripe: window -> (sub-window width, [sub-window number], [summary])
+        self._rings = []
+        for _ in range(stripes):
+            rings = {}
+            for name, (length, parts) in WINDOWS.items():
+                rings[name] = (length // parts, [None] * parts,
+                               [SpaceSaving(stripe_capacity) for _ in range(parts)])
+            self._rings.append(rings)
+        logger.info(f"TopLinks initialized ({capacity} counters per sub-window, {stripes} stripes)")
+
+    @staticmethod
+    def _add(ring: tuple, short_code: str, count: int, timestamp: int):
+        width, numbers, summaries = ring
+        number = timestamp // width
+        slot = number % len(summaries)
+        if numbers[slot] != number:
+            if numbers[slot] is not None and numbers[slot] > number:
+                return  # the sub-window has already slid out
+            summaries[slot].clear()
+            numbers[slot] = number
+        summaries[slot].add(short_code, count)
+
+    def record(self, short_code: str, count: int = 1, timestamp: Optional[int] = None):
+        """
+        Count clicks on a link.
+
+        Args:
+            short_code (str): The short code
+            count (int): Number of clicks
+            timestamp (int): Click time in epoch microseconds (default: now)
+        """
+        if timestamp is None:
+            timestamp = now_micros()
+        stripe = hash(short_code) % self.stripes
+        with self._locks[stripe]:
+            for ring in self._rings[stripe].values():
+                self._add(ring, short_code, count, timestamp)
+
+    def record_batch(self, totals: Dict[str, list]):
+        """
+        Count a batch of aggregated clicks, one lock acquisition per stripe.
+
+        Args:
+            totals (dict): short_code -> (click count, last access in epoch
+                microseconds, ...), as passed to URLStore.apply_clicks
+        """
+        by_stripe = [[] for _ in range(self.stripes)]
+        for item in totals.items():
+            by_stripe[hash(item[0]) % self.stripes].append(item)
+        for stripe, items in enumerate(by_stripe):
+            if not items:
+                continue
+            rings = self._rings[stripe].values()
+            with self._locks[stripe]:
+                for short_code, entry in items:
+                    for ring in rings:
+                        self._add(ring, short_code, entry[0], entry[1])
+
+    def top(self, k: int, window: str = '1h', keep=None,
+            now: Optional[int] = None) -> List[Tuple[str, int, int]]:
+        """
+        Get the most-clicked links in a window.
+
+        Args:
+            k (int): Number of links
+            window (str): '1m', '1h' or '24h'
+            keep (callable): Optional filter; codes for which it returns
+                False (e.g. deleted links) are skipped
+            now (int): Query time in epoch microseconds (default: now)
+
+        Returns:
+            list: (short_code, estimated clicks, maximum overcount), most
+                clicked first
+        """
+        if now is None:
+            now = now_micros()
+        length, parts = WINDOWS[window]
+        oldest = now // (length // parts) - parts + 1
+
+        counts = {}
+        errors = {}
+        for lock, rings in zip(self._locks, self._rings):
+            _, numbers, summaries = rings[window]
+            with lock:
+                for number, summary in zip(numbers, summaries):
+                    if number is None or number < oldest:
+                        continue
+                    for short_code, count in summary.counts.items():
+                        counts[short_code] = counts.get(short_code, 0) + count
+                        errors[short_code] = errors.get(short_code, 0) + summary.errors[short_code]
+
+        ranked = heapq.nlargest(k, counts.items(), key=itemgetter(1))
+        if keep is not None:
+            ranked = [item for item in ranked if keep(item[0])]
+            if len(ranked) < k < len(counts):
+                # Some of the leaders were filtered out; rank everything
+                ranked = [item for item in sorted(counts.items(), key=itemgetter(1), reverse=True)
+                          if keep(item[0])][:k]
+        return [(short_code, count, errors[short_code]) for short_code, count in ranked]
+
+    def clear(self):
+        """Forget every counted click."""
+        for lock, rings in zip(self._locks, self._rings):
+            with lock:
+                for _, numbers, summaries in rings.values():
+                    for slot, summary in enumerate(summaries):
+                        summary.clear()
+                        numbers[slot] = None
+
+    def get_metrics(self) -> Dict:
+        """
+        Get summary sizes.
+
+        Returns:
+            dict: Tracked keys per window, the per-sub-window capacity and
+                the number of stripes
+        """
+        tracked = dict.fromkeys(WINDOWS, 0)
+        for lock, rings in zip(self._locks, self._rings):
+            with lock:
+                for window, (_, _, summaries) in rings.items():
+                    tracked[window] += sum(len(summary.counts) for summary in summaries)
+        return {'capacity': self.capacity, 'stripes': self.stripes, 'tracked_keys': tracked}
@@ -2,58 +2,232 @@ import re
 import string
 import random
 import logging
-from urllib.parse import urlparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import islice
+from urllib.parse import urlparse, urlunparse
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Use alphanumeric characters (excluding confusing ones like 0, O, l, I)
+SAFE_CHARS = ''.join(c for c in string.ascii_letters + string.digits if c not in '0Ol1I')
+
+# Basic URL pattern, compiled once at import
+URL_PATTERN = re.compile(
+    r'^https?://'  # http:// or https://
+    r'(?:(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+[A-Z]{2,6}\.?|'  # domain...
+    r'localhost|'  # localhost...
+    r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})'  # ...or ip
+    r'(?::\d+)?'  # optional port
+    r'(?:/?|[/?]\S+)\Z', re.IGNORECASE)  # \Z: '$' would also match before a trailing newline
+
+# Scheme, plain host and optional numeric port of an ordinary http(s) URL,
+# which url_host can read without a full urlparse
+_PLAIN_HOST = re.compile(r'https?://([A-Za-z0-9.-]*)(?::\d*)?(?=[/?#]|\Z)')
+
+# lru_cache-wrapped check_url while the verdict cache is enabled
+_cached_check_url = None
+
+# User agent families, checked in order; several browsers also claim to be
+# Chrome, Safari or Mozilla, so the more specific tokens come first
+USER_AGENT_FAMILIES = (
+    ('bot', re.compile(r'bot|crawler|spider|slurp|facebookexternalhit|preview', re.IGNORECASE)),
+    ('curl', re.compile(r'^curl/', re.IGNORECASE)),
+    ('python', re.compile(r'python|aiohttp|httpx', re.IGNORECASE)),
+    ('Edge', re.compile(r'Edg(e|A|iOS)?/')),
+    ('Opera', re.compile(r'OPR/|Opera')),
+    ('Samsung Internet', re.compile(r'SamsungBrowser/')),
+    ('Chrome', re.compile(r'Chrome/|CriOS/')),
+    ('Firefox', re.compile(r'Firefox/|FxiOS/')),
+    ('Safari', re.compile(r'Safari/')),
+    ('Internet Explorer', re.compile(r'MSIE |Trident/')),
+)
+
+def check_url(url):
+    """
+    Validate a URL and report why it was rejected.
+    
+    The pattern only admits http(s) URLs with a non-empty host, so a match
+    is the whole check; no second parse is needed.
+    
+    Args:
+        url (str): The URL to validate
+        
+    Returns:
+        str: None if the URL is valid, otherwise the reason it is not
+    """
+    if not url or not isinstance(url, str):
+        return "empty or not a string"
+    if URL_PATTERN.match(url) is None:
+        return "not a valid http(s) URL"
+    return None
+
+def configure_url_cache(maxsize):
+    """
+    Enable or disable the cache of recent validate_url verdicts.
+    
+    Args:
+        maxsize (int): Number of distinct URLs to remember; 0 disables the cache
+    """
+    global _cached_check_url
+    _cached_check_url = lru_cache(maxsize=maxsize)(check_url) if maxsize else None
+
+def url_cache_info():
+    """
+    Get verdict cache statistics.
+    
+    Returns:
+        dict: Hits, misses and size of the cache, or just enabled=False
+    """
+    if _cached_check_url is None:
+        return {"enabled": False}
+    info = _cached_check_url.cache_info()
+    return {"enabled": True, "hits": info.hits, "misses": info.misses,
+            "size": info.currsize, "max_size": info.maxsize}
+
 def validate_url(url):
     """
     Validate if the provided URL is valid and safe to redirect to.
     
+    Runs on every shorten, so it does not log; callers log rejections.
+    
     Args:
         url (str): The URL to validate
         
     Returns:
         bool: True if valid, False otherwise
     """
-    logger.info(f"Validating URL: {url}")
+    if _cached_check_url is not None and isinstance(url, str):
+        return _cached_check_url(url) is None
+    return check_url(url) is None
+
+def _check_chunk(urls):
+    # Module-level so process pool workers can unpickle it
+    return [check_url(url) for url in urls]
+
+def validate_urls(urls, processes=None, chunk_size=1000):
+    """
+    Validate a stream of URLs, e.g. for a bulk import.
     
-    if not url or not isinstance(url, str):
-        logger.warning(f"Invalid URL type or empty: {url}")
-        return False
+    Verdicts are yielded in input order as soon as they are known, so the
+    caller can insert valid URLs while later ones are still being checked.
+    Nothing is logged per URL. With processes > 1 the URLs are checked in
+    chunks by a process pool, with at most two chunks per worker in flight
+    so memory stays bounded however long the stream is; this only pays off
+    for large batches, since every chunk is pickled to a worker and back.
     
-    # Basic URL pattern validation
-    url_pattern = re.compile(
-        r'^https?://'  # http:// or https://
-        r'(?:(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+[A-Z]{2,6}\.?|'  # domain...
-        r'localhost|'  # localhost...
-        r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})'  # ...or ip
-        r'(?::\d+)?'  # optional port
-        r'(?:/?|[/?]\S+)$', re.IGNORECASE)
-    
-    if not url_pattern.match(url):
-        logger.warning(f"URL failed pattern validation: {url}")
-        return False
+    Args:
+        urls (iterable): The URLs to validate
+        processes (int): Worker processes to fan out to (default: validate
+            in the calling thread)
+        chunk_size (int): URLs per chunk sent to a worker
+        
+    Yields:
+        tuple: (index in the input, True if valid, reason if not or None)
+    """
+    if not processes or processes < 2:
+        for index, url in enumerate(urls):
+            reason = check_url(url)
+            yield index, reason is None, reason
+        return
     
-    try:
-        parsed = urlparse(url)
-        if not parsed.scheme or not parsed.netloc:
-            logger.warning(f"URL missing scheme or netloc: {url}")
-            return False
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        pending = deque()
+        urls = iter(urls)
+        index = 0
+        while True:
+            while len(pending) < 2 * processes:
+                chunk = list(islice(urls, chunk_size))
+                if not chunk:
+                    break
+                pending.append(executor.submit(_check_chunk, chunk))
+            if not pending:
+                return
+            for reason in pending.popleft().result():
+                yield index, reason is None, reason
+                index += 1
+
+def canonicalize_url(url):
+    """
+    Reduce a URL to the form used to detect duplicates.
+    
+    Scheme and host are case-insensitive, so they are lowercased; the rest
+    of the URL is kept as-is.
+    
+    Args:
+        url (str): A validated URL
         
-        # Additional safety checks
-        if parsed.scheme not in ['http', 'https']:
-            logger.warning(f"Invalid URL scheme: {parsed.scheme}")
-            return False
-            
-        logger.info(f"URL validation successful: {url}")
-        return True
+    Returns:
+        str: The canonical form of the URL
+    """
+    parsed = urlparse(url)
+    return urlunparse(parsed._replace(scheme=parsed.scheme.lower(),
+                                      netloc=parsed.netloc.lower()))
+
+@lru_cache(maxsize=4096)
+def classify_user_agent(user_agent):
+    """
+    Map a User-Agent header to a browser or client family.
+    
+    Memoized, since a service sees far fewer distinct user agents than
+    requests.
+    
+    Args:
+        user_agent (str): The User-Agent header value
         
-    except Exception as e:
-        logger.error(f"URL validation error for {url}: {str(e)}")
-        return False
+    Returns:
+        str: Family name ('Chrome', 'bot', ...), 'other' if unrecognized,
+            or None if the header was empty
+    """
+    if not user_agent:
+        return None
+    for family, pattern in USER_AGENT_FAMILIES:
+        if pattern.search(user_agent):
+            return family
+    return 'other'
+
+def referrer_host(referrer):
+    """
+    Extract the host of a Referer header.
+    
+    Args:
+        referrer (str): The Referer header value
+        
+    Returns:
+        str: Lowercased host name, or None for direct traffic or an
+            unparseable header
+    """
+    return url_host(referrer)
+
+def url_host(url):
+    """
+    Extract the host of a URL.
+    
+    Args:
+        url (str): The URL
+        
+    Returns:
+        str: Lowercased host name without the trailing root dot, so
+            "example.com." and "example.com" agree, or None if the URL is
+            empty, has no host or cannot be parsed
+    """
+    if not url:
+        return None
+    # Ordinary URLs, i.e. nearly every stored link, skip urlparse, which
+    # dominated bulk inserts and recovery; anything else still goes through it
+    match = _PLAIN_HOST.match(url)
+    if match is not None:
+        return match.group(1).lower().rstrip('.') or None
+    try:
+        hostname = urlparse(url).hostname
+    except ValueError:
+        return None
+    if not hostname:
+        return None
+    return hostname.rstrip('.') or None
 
 def generate_short_code(length=6, existing_codes=None):
     """
@@ -69,15 +243,11 @@ def generate_short_code(length=6, existing_codes=None):
     if existing_codes is None:
         existing_codes = set()
     
-    # Use alphanumeric characters (excluding confusing ones like 0, O, l, I)
-    chars = string.ascii_letters + string.digits
-    safe_chars = ''.join(c for c in chars if c not in '0Ol1I')
-    
     max_attempts = 100  # Prevent infinite loops
     attempt = 0
     
     while attempt < max_attempts:
-        code = ''.join(random.choice(safe_chars) for _ in range(length))
+        code = ''.join(random.choice(SAFE_CHARS) for _ in range(length))
         
         if code not in existing_codes:
             logger.info(f"Generated unique short code: {code} (attempt {attempt + 1})")
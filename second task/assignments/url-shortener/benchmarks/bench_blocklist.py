@@ -0,0 +1,103 @@
+"""
+Load time, memory and lookup cost of the domain blocklist, and the cost
+of sweeping existing links.
+
+Builds a list of N random domains, then times lookups of allowed and
+blocked hosts of various depths, and compares them with the linear scan a
+plain list would need. Finally sweeps a store of LINKS links for a newly
+blocked domain while another thread keeps resolving codes, and reports
+the worst resolve latency seen with chunked sweeps against holding the
+store lock for the whole walk. Run from the url-shortener directory:
+
+    python -m benchmarks.bench_blocklist
+"""
+import logging
+import random
+import string
+import threading
+import time
+import timeit
+import tracemalloc
+
+from app.blocklist import BlocklistSweeper, DomainBlocklist
+from app.models import URLStore
+
+N = 300_000
+LOOKUPS = 100_000
+LINKS = 200_000
+
+
+def random_label(rng):
+    return ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 12)))
+
+
+def fill(store):
+    for i in range(LINKS):
+        host = 'bad.example' if i % 100 == 0 else f"site{i % 5000}.example.com"
+        store.add_url(f"c{i:07d}", f"https://{host}/page/{i}")
+
+
+def main():
+    logging.disable(logging.CRITICAL)
+    rng = random.Random(1)
+    tlds = ['com', 'net', 'org', 'io', 'co.uk', 'ru', 'xyz']
+    domains = [f"{random_label(rng)}.{rng.choice(tlds)}" for _ in range(N)]
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    blocklist = DomainBlocklist(domains)
+    elapsed = time.perf_counter() - started
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"loaded {N} domains in {elapsed * 1000:.0f} ms, {memory / 2 ** 20:.1f} MiB")
+
+    blocked = [f"www.{rng.choice(domains)}" for _ in range(1000)]
+    allowed = [f"{random_label(rng)}.{random_label(rng)}.example.com" for _ in range(1000)]
+    for name, hosts in (("blocked hosts", blocked), ("allowed hosts", allowed)):
+        seconds = timeit.timeit(lambda: [blocklist.match(host) for host in hosts],
+                                number=LOOKUPS // len(hosts))
+        print(f"{name:<24} {seconds / LOOKUPS * 1e9:>10.0f} ns/lookup")
+
+    # What a linear check inside validate_url would cost, for comparison
+    host = allowed[0]
+    seconds = timeit.timeit(
+        lambda: any(host == d or host.endswith('.' + d) for d in domains), number=3)
+    print(f"{'linear scan':<24} {seconds / 3 * 1e9:>10.0f} ns/lookup")
+
+    print(f"metrics: {blocklist.get_metrics()['latency_ns']}")
+
+    store = URLStore()
+    fill(store)
+    codes = [f"c{i:07d}" for i in range(0, LINKS, 7)]
+
+    def worst_resolve(sweep):
+        worst = 0.0
+        done = threading.Event()
+        sweeper = threading.Thread(target=lambda: (sweep(), done.set()))
+        sweeper.start()
+        while not done.is_set():
+            for code in codes[:1000]:
+                started = time.perf_counter()
+                store.resolve(code)
+                worst = max(worst, time.perf_counter() - started)
+        sweeper.join()
+        return worst
+
+    def locked_sweep():
+        with store._lock:
+            BlocklistSweeper(store, chunk_size=LINKS).sweep(frozenset(['bad.example']))
+
+    started = time.perf_counter()
+    worst = worst_resolve(lambda: BlocklistSweeper(store).sweep(frozenset(['bad.example'])))
+    print(f"chunked sweep of {LINKS} links: {time.perf_counter() - started:.2f}s, "
+          f"worst resolve {worst * 1000:.2f} ms")
+    store.clear()
+    fill(store)
+    started = time.perf_counter()
+    worst = worst_resolve(locked_sweep)
+    print(f"single-lock sweep of {LINKS} links: {time.perf_counter() - started:.2f}s, "
+          f"worst resolve {worst * 1000:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
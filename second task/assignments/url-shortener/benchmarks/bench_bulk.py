@@ -0,0 +1,73 @@
+"""
+Throughput and memory of the streaming NDJSON export and import.
+
+Fills the store with N links, streams them out through GET /api/export,
+then clears the store and feeds the export back through POST /api/import.
+Memory is traced with tracemalloc: for the export, the peak above the
+filled store, against building the whole export as a list first; for the
+import, the peak above the final store and the request body, i.e. what the
+chunked pipeline holds at once. Run from the url-shortener directory:
+
+    python -m benchmarks.bench_bulk
+"""
+import io
+import json
+import logging
+import time
+import tracemalloc
+
+from app.main import app
+from app.models import format_timestamp, url_store
+
+N = 200_000
+
+
+def mib(size):
+    return f"{size / 2 ** 20:.1f} MiB"
+
+
+def main():
+    logging.disable(logging.CRITICAL)
+    client = app.test_client()
+    url_store.clear()
+    url_store.add_urls([(f"c{i:07d}", f"https://site{i % 5000}.example.com/page/{i}")
+                        for i in range(N)])
+
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    started = time.perf_counter()
+    response = client.get('/api/export', buffered=False)
+    size = sum(len(part) for part in response.iter_encoded())
+    response.close()
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1] - base
+    print(f"export: {N / elapsed:>9.0f} links/s, {mib(size)} of NDJSON, peak {mib(peak)}")
+
+    tracemalloc.reset_peak()
+    snapshot = [json.dumps({"short_code": code, "url": record.url, "clicks": record.clicks,
+                            "created_at": format_timestamp(record.created_at)})
+                for code, record in url_store.iter_records()]
+    peak = tracemalloc.get_traced_memory()[1] - base
+    del snapshot
+    print(f"{'full list for comparison:':<46} peak {mib(peak)}")
+
+    body = b''.join(client.get('/api/export').iter_encoded())
+    url_store.clear()
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    response = client.post('/api/import', input_stream=io.BytesIO(body),
+                           content_type='application/x-ndjson',
+                           headers={'Content-Length': str(len(body))})
+    elapsed = time.perf_counter() - started
+    final, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert response.get_json()['imported'] == N
+    print(f"import: {N / elapsed:>9.0f} links/s, store grew {mib(final - base)}, "
+          f"transient peak {mib(peak - final)}")
+    url_store.clear()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""
+Per-code cost of short code generation.
+
+Compares the original random.choice loop in generate_short_code against the
+counter-based allocators. Run from the url-shortener directory:
+
+    python -m benchmarks.bench_codegen
+"""
+import logging
+import os
+import timeit
+
+from app.allocator import BASE, FeistelPermutation, SequenceAllocator
+from app.utils import generate_short_code
+
+N = 100_000
+
+
+def report(name, seconds):
+    print(f"{name:<32} {seconds / N * 1e9:>10.0f} ns/code")
+
+
+def main():
+    # The generators log every code at INFO, which would dominate the timings
+    logging.disable(logging.CRITICAL)
+
+    existing = set()
+    report("random.choice loop", timeit.timeit(
+        lambda: generate_short_code(existing_codes=existing), number=N))
+
+    sequential = SequenceAllocator()
+    report("sequential allocator", timeit.timeit(sequential.next_code, number=N))
+
+    permuted = SequenceAllocator(permutation=FeistelPermutation(BASE ** 6, os.urandom(32)))
+    report("permuted allocator", timeit.timeit(permuted.next_code, number=N))
+
+
+if __name__ == '__main__':
+    main()
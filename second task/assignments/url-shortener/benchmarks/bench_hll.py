@@ -0,0 +1,39 @@
+"""
+Accuracy and memory of the per-link unique visitor sketch.
+
+For a range of true visitor counts, feeds distinct fingerprints into fresh
+HyperLogLog sketches and reports the mean and worst relative error over
+several trials, plus the bytes each sketch holds. Run from the url-shortener
+directory:
+
+    python -m benchmarks.bench_hll
+"""
+import math
+
+from app.hll import DEFAULT_PRECISION, HyperLogLog, visitor_hash
+
+CARDINALITIES = (1, 10, 100, 1_000, 10_000, 100_000, 1_000_000)
+TRIALS = 5
+
+
+def main():
+    m = 1 << DEFAULT_PRECISION
+    print(f"precision {DEFAULT_PRECISION}: {m} registers, "
+          f"expected standard error {1.04 / math.sqrt(m):.2%}")
+    print(f"{'visitors':>10} {'mean error':>11} {'max error':>10} {'bytes':>7}  form")
+
+    for cardinality in CARDINALITIES:
+        trials = TRIALS if cardinality <= 100_000 else 1
+        errors = []
+        for trial in range(trials):
+            sketch = HyperLogLog()
+            for i in range(cardinality):
+                sketch.add(visitor_hash(f"{trial}-{i}", 'Mozilla/5.0'))
+            errors.append(abs(sketch.estimate() - cardinality) / cardinality)
+        form = 'sparse' if sketch.is_sparse else 'dense'
+        print(f"{cardinality:>10,} {sum(errors) / len(errors):>11.2%} {max(errors):>10.2%} "
+              f"{sketch.memory_bytes():>7,}  {form}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Memory cost and query speed of the host index.
+
+Fills a store with N links spread over HOSTS hosts (Zipf-distributed, so a
+few hosts hold most links), reports the memory the index holds per link by
+dropping it and measuring what tracemalloc sees released, then compares
+reading a host's first page and totals through the index with the full
+iter_records scan it replaces. Run from the url-shortener directory:
+
+    python -m benchmarks.bench_host_index
+"""
+import logging
+import random
+import timeit
+import tracemalloc
+
+from app.models import URLStore
+from app.utils import url_host
+
+N = 200_000
+HOSTS = 2_000
+ROUNDS = 20
+
+
+def scan_host(store, host):
+    """What a per-domain query costs without the index."""
+    links = clicks = 0
+    for _, record in store.iter_records():
+        if url_host(record.url) == host:
+            links += 1
+            clicks += record.clicks
+    return links, clicks
+
+
+def main():
+    logging.disable(logging.CRITICAL)
+    rng = random.Random(1)
+    hosts = [f"site{i}.example.com" for i in range(HOSTS)]
+    weights = [1 / (rank + 1) for rank in range(HOSTS)]
+    chosen = rng.choices(hosts, weights=weights, k=N)
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    store = URLStore()
+    for i, host in enumerate(chosen):
+        store.add_url(f"c{i:07d}", f"https://{host}/page/{i}")
+    filled = tracemalloc.get_traced_memory()[0]
+
+    # Drop the index and see what is released
+    index = store._hosts
+    store._hosts = {}
+    for record in store._urls.values():
+        record.host_links = None
+    del index
+    dropped = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    index_bytes = filled - dropped
+    print(f"store with index: {(filled - before) / N:.0f} bytes/link")
+    print(f"host index:       {index_bytes / N:.1f} bytes/link "
+          f"({index_bytes / 2 ** 20:.1f} MiB for {N} links on {HOSTS} hosts), "
+          f"plus the 8-byte host_links slot on each record")
+
+    store.clear()
+    for i, host in enumerate(chosen):
+        store.add_url(f"c{i:07d}", f"https://{host}/page/{i}")
+    for name, host in (("largest host", hosts[0]), ("median host", hosts[HOSTS // 2])):
+        indexed = timeit.timeit(lambda: store.get_links_by_host(host, limit=100),
+                                number=ROUNDS) / ROUNDS
+        scanned = timeit.timeit(lambda: scan_host(store, host), number=1)
+        total = store.get_links_by_host(host, limit=1)['total_links']
+        print(f"{name} ({total} links): index {indexed * 1e6:.0f} us, "
+              f"full scan {scanned * 1000:.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
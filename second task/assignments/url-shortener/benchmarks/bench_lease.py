@@ -0,0 +1,53 @@
+"""
+Code minting throughput across worker processes sharing a lease file.
+
+Each process leases blocks from the same SQLite coordinator, the way
+gunicorn workers do when SHORT_CODE_LEASE_PATH is set. Run from the
+url-shortener directory:
+
+    python -m benchmarks.bench_lease
+"""
+import logging
+import multiprocessing
+import os
+import tempfile
+import time
+
+from app.allocator import BASE, BlockLeaseAllocator, FeistelPermutation, init_lease_table
+
+CODES_PER_WORKER = 100_000
+BLOCK_SIZE = 1000
+
+
+def mint(lease_path):
+    logging.disable(logging.CRITICAL)
+    key = init_lease_table(lease_path)
+    allocator = BlockLeaseAllocator(lease_path, block_size=BLOCK_SIZE,
+                                    permutation=FeistelPermutation(BASE ** 6, key))
+    for _ in range(CODES_PER_WORKER):
+        allocator.next_code()
+
+
+def main():
+    logging.disable(logging.CRITICAL)
+
+    for workers in (1, 2, 4, 8):
+        with tempfile.TemporaryDirectory() as tmp:
+            lease_path = os.path.join(tmp, 'leases.db')
+            init_lease_table(lease_path)
+            processes = [multiprocessing.Process(target=mint, args=(lease_path,))
+                         for _ in range(workers)]
+
+            started = time.perf_counter()
+            for process in processes:
+                process.start()
+            for process in processes:
+                process.join()
+            elapsed = time.perf_counter() - started
+
+        total = workers * CODES_PER_WORKER
+        print(f"{workers} worker(s): {total / elapsed:>12,.0f} codes/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Per-record memory of URL entries, measured with tracemalloc.
+
+Compares the original 4-key dict with ISO-8601 strings against the slotted
+URLRecord with integer timestamps, both as values of the store's dict. The
+URL strings themselves are allocated before measuring, since both layouts
+share them. Run from the url-shortener directory:
+
+    python -m benchmarks.bench_record_memory
+"""
+import gc
+import tracemalloc
+from datetime import datetime, timezone
+
+from app.models import URLRecord, now_micros
+
+N = 200_000
+
+
+def measure(build):
+    codes = [f"c{i:06d}" for i in range(N)]
+    urls = [f"https://www.example.com/some/long/path/{i}" for i in range(N)]
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    store = build(codes, urls)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del store
+    return (after - before) / N
+
+
+def build_dicts(codes, urls):
+    store = {}
+    for code, url in zip(codes, urls):
+        store[code] = {
+            'url': url,
+            'clicks': 0,
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'last_accessed': datetime.now(timezone.utc).isoformat()
+        }
+    return store
+
+
+def build_records(codes, urls):
+    store = {}
+    for code, url in zip(codes, urls):
+        store[code] = URLRecord(url, now_micros(), last_accessed=now_micros())
+    return store
+
+
+def main():
+    dict_bytes = measure(build_dicts)
+    record_bytes = measure(build_records)
+    print(f"dict + ISO strings: {dict_bytes:>7.1f} bytes/record")
+    print(f"URLRecord (slots):  {record_bytes:>7.1f} bytes/record")
+    print(f"saving:             {1 - record_bytes / dict_bytes:>7.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+Recovery time of a journaled URLStore.
+
+Builds a store of N records, snapshots it, appends a log tail of clicks and
+new records, then times recovery into a fresh store. Run from the
+url-shortener directory (N defaults to 1,000,000):
+
+    python -m benchmarks.bench_recovery [N]
+"""
+import logging
+import sys
+import tempfile
+import time
+
+from app.models import URLStore
+from app.persistence import WriteAheadLog
+
+
+def main():
+    logging.disable(logging.CRITICAL)
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    tail = n // 10
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = URLStore()
+        journal = WriteAheadLog(directory, snapshot_interval=0)
+        journal.start(store)
+
+        started = time.perf_counter()
+        for i in range(n):
+            store.add_url(f"c{i:08d}", f"https://www.example.com/some/long/path/{i}")
+        print(f"populate:  {time.perf_counter() - started:8.2f}s for {n:,} records")
+
+        started = time.perf_counter()
+        journal.snapshot()
+        print(f"snapshot:  {time.perf_counter() - started:8.2f}s")
+
+        for i in range(tail):
+            store.increment_clicks(f"c{i:08d}")
+            store.add_url(f"t{i:08d}", f"https://www.example.com/tail/{i}")
+        journal.stop()
+        del store
+
+        recovered = URLStore()
+        result = WriteAheadLog(directory).recover(recovered)
+        rate = (result['snapshot_records'] + result['log_entries']) / result['seconds']
+        print(f"recovery:  {result['seconds']:8.2f}s for {result['snapshot_records']:,} snapshot "
+              f"records + {result['log_entries']:,} log entries ({rate:,.0f} entries/s)")
+
+
+if __name__ == '__main__':
+    main()
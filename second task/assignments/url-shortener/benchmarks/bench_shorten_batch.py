@@ -0,0 +1,54 @@
+"""
+Per-URL throughput of POST /api/shorten against POST /api/shorten/batch.
+
+Drives the Flask app in-process through its test client, so the numbers
+include request parsing, validation, code allocation, the store insert and
+JSON encoding, but no socket I/O; a real HTTP round trip per URL only widens
+the gap. Run from the url-shortener directory:
+
+    python -m benchmarks.bench_shorten_batch
+"""
+import json
+import logging
+import time
+
+from app.main import app
+from app.models import url_store
+
+N = 20_000
+BATCH_SIZES = (10, 100, 1000)
+
+
+def report(name, seconds, baseline=None):
+    speedup = f"  {baseline / seconds:5.1f}x" if baseline else ""
+    print(f"{name:<24} {N / seconds:>10.0f} URLs/s{speedup}")
+
+
+def main():
+    # Every shorten logs at INFO; measure the code, not the terminal
+    logging.disable(logging.CRITICAL)
+    urls = [f"https://www.example.com/articles/{i}?ref=bench" for i in range(N)]
+    client = app.test_client()
+
+    url_store.clear()
+    started = time.perf_counter()
+    for url in urls:
+        client.post('/api/shorten', data=json.dumps({'url': url}),
+                    content_type='application/json')
+    single = time.perf_counter() - started
+    report("single", single)
+
+    for size in BATCH_SIZES:
+        url_store.clear()
+        started = time.perf_counter()
+        for start in range(0, N, size):
+            response = client.post('/api/shorten/batch',
+                                   data=json.dumps({'urls': urls[start:start + size]}),
+                                   content_type='application/json')
+            assert response.get_json()['created'] == len(urls[start:start + size])
+        report(f"batch of {size}", time.perf_counter() - started, single)
+    url_store.clear()
+
+
+if __name__ == '__main__':
+    main()
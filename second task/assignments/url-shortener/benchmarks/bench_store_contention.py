@@ -0,0 +1,60 @@
+"""
+Lock contention of URLStore versus ShardedURLStore, and of locked versus
+per-thread click counters.
+
+Many threads run a redirect-heavy mix (get_url + increment_clicks, with
+occasional add_url) against each store. Run from the url-shortener directory:
+
+    python -m benchmarks.bench_store_contention
+"""
+import logging
+import random
+import threading
+import time
+
+from app.models import ShardedURLStore, URLStore
+
+NUM_CODES = 10_000
+OPS_PER_THREAD = 20_000
+
+
+def run(store, num_threads):
+    codes = [f"c{i:06d}" for i in range(NUM_CODES)]
+    for code in codes:
+        store.add_url(code, f"https://example.com/{code}")
+
+    def worker(seed):
+        rng = random.Random(seed)
+        for i in range(OPS_PER_THREAD):
+            if i % 100 == 0:
+                store.add_url(f"t{seed}-{i}", 'https://example.com/new')
+            else:
+                code = rng.choice(codes)
+                store.get_url(code)
+                store.increment_clicks(code)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(num_threads)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return num_threads * OPS_PER_THREAD / elapsed
+
+
+def main():
+    # Per-operation logging would serialize every thread on the handler lock
+    logging.disable(logging.CRITICAL)
+
+    for num_threads in (1, 4, 16, 64):
+        single = run(URLStore(), num_threads)
+        sharded = run(ShardedURLStore(num_shards=16), num_threads)
+        per_thread = run(URLStore(per_thread_counters=True), num_threads)
+        print(f"{num_threads:>3} threads: URLStore {single:>10,.0f} ops/s   "
+              f"ShardedURLStore {sharded:>10,.0f} ops/s   "
+              f"URLStore per-thread counters {per_thread:>10,.0f} ops/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+Per-URL cost of validate_url.
+
+Compares the original implementation (regex compiled on every call, a
+second urlparse pass and INFO logging of every URL) against the current
+one, with and without the verdict cache, and the batch validate_urls
+generator in-thread and fanned out to a process pool. The corpus is
+generated realistic links: mixed hosts, paths and tracking query strings,
+a few percent invalid, and Zipf-distributed repeats. Run from the
+url-shortener directory:
+
+    python -m benchmarks.bench_validate
+"""
+import logging
+import os
+import random
+import re
+import timeit
+from urllib.parse import urlparse
+
+from app import utils
+
+N = 50_000
+ROUNDS = 3
+
+legacy_logger = logging.getLogger('bench_validate.legacy')
+
+
+def legacy_validate_url(url):
+    """validate_url as it was before it was precompiled."""
+    legacy_logger.info(f"Validating URL: {url}")
+
+    if not url or not isinstance(url, str):
+        legacy_logger.warning(f"Invalid URL type or empty: {url}")
+        return False
+
+    url_pattern = re.compile(
+        r'^https?://'
+        r'(?:(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+[A-Z]{2,6}\.?|'
+        r'localhost|'
+        r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})'
+        r'(?::\d+)?'
+        r'(?:/?|[/?]\S+)$', re.IGNORECASE)
+
+    if not url_pattern.match(url):
+        legacy_logger.warning(f"URL failed pattern validation: {url}")
+        return False
+
+    try:
+        parsed = urlparse(url)
+        if not parsed.scheme or not parsed.netloc:
+            return False
+        if parsed.scheme not in ['http', 'https']:
+            return False
+        legacy_logger.info(f"URL validation successful: {url}")
+        return True
+    except Exception as e:
+        legacy_logger.error(f"URL validation error for {url}: {str(e)}")
+        return False
+
+
+def build_corpus(size, seed=1):
+    """Generate `size` URLs, about half of them repeats of popular ones."""
+    rng = random.Random(seed)
+    hosts = ['www.example.com', 'news.example.org', 'shop.example.co.uk', 'blog.example.io',
+             'cdn.example.net', 'docs.example.dev', 'localhost', '192.168.0.10']
+    words = ['article', 'product', 'item', 'posts', '2024', 'summer-sale', 'index.html',
+             'category', 'search', 'user', 'profile', 'video']
+    invalid = ['ftp://files.example.com/a', 'not a url', 'http://', 'javascript:alert(1)',
+               'https://exa mple.com/', '']
+
+    unique = []
+    for _ in range(size // 2):
+        if rng.random() < 0.03:
+            unique.append(rng.choice(invalid))
+            continue
+        path = '/'.join(rng.choice(words) for _ in range(rng.randint(0, 4)))
+        url = f"{rng.choice(['http', 'https'])}://{rng.choice(hosts)}/{path}"
+        if rng.random() < 0.4:
+            url += f"?utm_source=newsletter&utm_medium=email&id={rng.randint(1, 10 ** 6)}"
+        unique.append(url)
+
+    weights = [1 / (rank + 1) for rank in range(len(unique))]
+    return unique + rng.choices(unique, weights=weights, k=size - len(unique))
+
+
+def report(name, seconds):
+    print(f"{name:<36} {seconds / (N * ROUNDS) * 1e9:>10.0f} ns/URL")
+
+
+def run(function, corpus):
+    return timeit.timeit(lambda: [function(url) for url in corpus], number=ROUNDS)
+
+
+def main():
+    corpus = build_corpus(N)
+
+    # The legacy version logs every URL at INFO; measure it with a handler
+    # that discards records so no terminal I/O is timed
+    legacy_logger.setLevel(logging.INFO)
+    legacy_logger.addHandler(logging.NullHandler())
+    legacy_logger.propagate = False
+    report("legacy, logging at INFO", run(legacy_validate_url, corpus))
+    legacy_logger.setLevel(logging.CRITICAL)
+    report("legacy, logging off", run(legacy_validate_url, corpus))
+
+    utils.configure_url_cache(0)
+    report("precompiled", run(utils.validate_url, corpus))
+
+    utils.configure_url_cache(65536)
+    report("precompiled + verdict cache", run(utils.validate_url, corpus))
+    print(f"cache: {utils.url_cache_info()}")
+    utils.configure_url_cache(0)
+
+    report("validate_urls", timeit.timeit(
+        lambda: sum(1 for _ in utils.validate_urls(corpus)), number=ROUNDS))
+    processes = max(os.cpu_count() or 1, 2)
+    report(f"validate_urls, {processes} processes", timeit.timeit(
+        lambda: sum(1 for _ in utils.validate_urls(corpus, processes=processes)),
+        number=ROUNDS))
+
+
+if __name__ == '__main__':
+    main()
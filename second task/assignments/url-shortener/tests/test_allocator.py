@@ -0,0 +1,179 @@
+import threading
+import time
+from types import SimpleNamespace
+from app.allocator import (BlockLeaseAllocator, CodePool, FeistelPermutation, SequenceAllocator,
+                           create_allocator, encode_code, decode_code, init_lease_table)
+from app.utils import SAFE_CHARS
+
+def test_encode_decode_roundtrip():
+    """Test that encoding into the code alphabet is reversible."""
+    for number in [0, 1, 56, 57, 123456, 57 ** 6 - 1]:
+        code = encode_code(number)
+        assert len(code) == 6
+        assert all(c in SAFE_CHARS for c in code)
+        assert decode_code(code) == number
+
+def test_encode_grows_past_minimum_length():
+    """Test that codes grow instead of wrapping once the length is exhausted."""
+    code = encode_code(57 ** 6)
+    assert len(code) == 7
+    assert decode_code(code) == 57 ** 6
+
+def test_sequence_allocator_concurrent_uniqueness():
+    """Test that concurrent threads never receive the same code."""
+    allocator = SequenceAllocator()
+    codes = []
+    codes_lock = threading.Lock()
+
+    def worker():
+        local = [allocator.next_code() for _ in range(500)]
+        with codes_lock:
+            codes.extend(local)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(codes) == 4000
+    assert len(set(codes)) == 4000
+
+def test_feistel_permutation_is_bijective():
+    """Test that the permutation maps the domain onto itself without repeats."""
+    domain = 57 ** 2
+    permutation = FeistelPermutation(domain, b'test-key')
+    images = [permutation.permute(i) for i in range(domain)]
+    assert sorted(images) == list(range(domain))
+    # A keyed permutation should not leave the sequence in order
+    assert images[:10] != list(range(10))
+
+def test_feistel_permutation_depends_on_key():
+    """Test that different keys produce different code orders."""
+    first = FeistelPermutation(57 ** 6, b'key-one')
+    second = FeistelPermutation(57 ** 6, b'key-two')
+    assert [first.permute(i) for i in range(20)] != [second.permute(i) for i in range(20)]
+
+def test_permuted_allocator_codes_are_unique():
+    """Test that permuted codes keep the fixed length and never repeat."""
+    allocator = SequenceAllocator(permutation=FeistelPermutation(57 ** 6, b'test-key'))
+    codes = [allocator.next_code() for _ in range(5000)]
+    assert all(len(code) == 6 for code in codes)
+    assert len(set(codes)) == len(codes)
+
+def test_block_lease_allocators_share_code_space(tmp_path):
+    """Test that allocators leasing from one file never mint the same code."""
+    lease_path = str(tmp_path / 'leases.db')
+    key = init_lease_table(lease_path)
+    workers = [
+        BlockLeaseAllocator(lease_path, block_size=50,
+                            permutation=FeistelPermutation(57 ** 6, key))
+        for _ in range(4)
+    ]
+
+    codes = []
+    for _ in range(120):
+        for worker in workers:
+            codes.append(worker.next_code())
+
+    assert len(codes) == 480
+    assert len(set(codes)) == 480
+
+def test_block_lease_allocator_leases_contiguous_blocks(tmp_path):
+    """Test that each worker consumes its own contiguous block."""
+    lease_path = str(tmp_path / 'leases.db')
+    first = BlockLeaseAllocator(lease_path, block_size=10)
+    second = BlockLeaseAllocator(lease_path, block_size=10)
+
+    assert decode_code(first.next_code()) == 0
+    assert decode_code(second.next_code()) == 10
+    assert decode_code(first.next_code()) == 1
+
+def test_next_codes_allocates_in_sequence(tmp_path):
+    """Test that batch allocation matches one-at-a-time allocation, across lease blocks."""
+    single = SequenceAllocator(permutation=FeistelPermutation(57 ** 6, b'test-key'))
+    batched = SequenceAllocator(permutation=FeistelPermutation(57 ** 6, b'test-key'))
+    assert batched.next_codes(100) == [single.next_code() for _ in range(100)]
+    assert batched.next_code() == single.next_code()
+
+    leased = BlockLeaseAllocator(str(tmp_path / 'lease.db'), block_size=10)
+    other = BlockLeaseAllocator(str(tmp_path / 'lease.db'), block_size=10)
+    assert decode_code(leased.next_code()) == 0
+    assert decode_code(other.next_code()) == 10
+    numbers = [decode_code(code) for code in leased.next_codes(15)]
+    assert numbers == list(range(1, 10)) + list(range(20, 26))
+
+def _wait_for(condition, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+def test_code_pool_refills_to_high_watermark():
+    """Test that the background thread fills the pool and refills after draining."""
+    pool = CodePool(SequenceAllocator(), low_watermark=5, high_watermark=20)
+    pool.start()
+    try:
+        assert _wait_for(lambda: pool.get_metrics()['size'] == 20)
+
+        codes = [pool.next_code() for _ in range(16)]
+        assert len(set(codes)) == 16
+        assert _wait_for(lambda: pool.get_metrics()['size'] == 20)
+
+        metrics = pool.get_metrics()
+        assert metrics['hits'] == 16
+        assert metrics['misses'] == 0
+        assert metrics['refills'] >= 2
+    finally:
+        pool.stop()
+
+def test_code_pool_falls_back_when_empty():
+    """Test that an empty pool still returns a code, minted inline."""
+    pool = CodePool(SequenceAllocator(), low_watermark=1, high_watermark=4)
+
+    # Not started, so every request misses and mints inline
+    assert pool.next_code() == encode_code(0)
+    metrics = pool.get_metrics()
+    assert metrics['misses'] == 1
+
+def test_code_pool_next_codes_drains_then_mints():
+    """Test that a batch takes pooled codes first and mints the shortfall."""
+    pool = CodePool(SequenceAllocator(), low_watermark=1, high_watermark=4)
+    assert pool.next_codes(3) == [encode_code(0), encode_code(1), encode_code(2)]
+    assert pool.next_codes(2) == [encode_code(3), encode_code(4)]
+    metrics = pool.get_metrics()
+    assert metrics['misses'] == 5
+
+def test_durable_store_allocator_resumes_after_restart(tmp_path):
+    """Test that a restarted allocator on a durable store never reissues codes."""
+    config = SimpleNamespace(SHORT_CODE_LENGTH=6, SHORT_CODE_STRATEGY='permuted',
+                             SHORT_CODE_KEY='fixed-key', SHORT_CODE_LEASE_PATH=None,
+                             SHORT_CODE_BLOCK_SIZE=10, STORE_BACKEND='memory',
+                             WAL_DIR=str(tmp_path / 'wal'), SQLITE_PATH=None)
+    before = create_allocator(config).next_codes(25)
+    after = create_allocator(config).next_codes(25)
+    assert not set(before) & set(after)
+
+    config.WAL_DIR = None
+    assert type(create_allocator(config)) is SequenceAllocator
+
+def test_allocator_only_looks_up_codes_on_retry():
+    """Test that plain allocation never consults the store and retries skip codes in use."""
+    used = {encode_code(number) for number in (0, 1, 2, 5)}
+    lookups = []
+
+    def is_used(code):
+        lookups.append(code)
+        return code in used
+
+    allocator = SequenceAllocator(is_used=is_used)
+    assert allocator.next_code() == encode_code(0)
+    assert allocator.next_codes(2) == [encode_code(1), encode_code(2)]
+    assert lookups == []
+
+    assert allocator.next_unused_code() == encode_code(3)
+    assert allocator.next_unused_codes(3) == [encode_code(4), encode_code(6), encode_code(7)]
+    pool = CodePool(allocator, low_watermark=1, high_watermark=4)
+    assert pool.next_unused_codes(1) == [encode_code(8)]
@@ -8,7 +8,7 @@ def client():
     app.config['TESTING'] = True
     with app.test_client() as client:
         # Clear the URL store before each test
-        url_store._urls.clear()
+        url_store.clear()
         yield client
 
 def test_health_check(client):
@@ -287,4 +287,361 @@ def test_url_validation_comprehensive(client):
         response = client.post('/api/shorten',
                               data=json.dumps({'url': url}),
                               content_type='application/json')
-        assert response.status_code == 400, f"Invalid URL should have failed: {url}"
\ No newline at end of file
+        assert response.status_code == 400, f"Invalid URL should have failed: {url}"
+
+def test_metrics_endpoint(client):
+    """Test the internal metrics endpoint."""
+    response = client.get('/api/metrics')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert 'code_pool' in data
+    assert 'enabled' in data['code_pool']
+
+def test_shorten_skips_codes_taken_by_imports(client, monkeypatch):
+    """Test that a collision with imported codes retries past every taken code."""
+    from app import main
+    from app.allocator import SequenceAllocator, encode_code
+    monkeypatch.setattr(main, 'code_source', SequenceAllocator(is_used=url_store.contains))
+    monkeypatch.setitem(app.config, 'DEDUPE_ENABLED', False)
+    for number in range(3):
+        url_store.add_url(encode_code(number), f"https://example.com/imported/{number}")
+    
+    response = client.post('/api/shorten',
+                          data=json.dumps({'url': 'https://example.com/new'}),
+                          content_type='application/json')
+    assert response.status_code == 201
+    assert response.get_json()['short_code'] == encode_code(3)
+
+def test_shorten_dedupe_mode_returns_existing_code(client, monkeypatch):
+    """Test that dedupe mode returns the same code for equivalent URLs."""
+    monkeypatch.setitem(app.config, 'DEDUPE_ENABLED', True)
+    
+    response = client.post('/api/shorten',
+                          data=json.dumps({'url': 'https://www.example.com/dedupe'}),
+                          content_type='application/json')
+    assert response.status_code == 201
+    short_code = response.get_json()['short_code']
+    assert len(short_code) == 6
+    
+    response = client.post('/api/shorten',
+                          data=json.dumps({'url': 'HTTPS://WWW.Example.com/dedupe'}),
+                          content_type='application/json')
+    assert response.status_code == 200
+    assert response.get_json()['short_code'] == short_code
+    assert url_store.get_total_urls() == 1
+
+def test_shorten_rejects_trailing_newline(client):
+    """Test that a URL with a trailing newline is not accepted."""
+    response = client.post('/api/shorten',
+                          data=json.dumps({'url': 'http://example.com/a\n'}),
+                          content_type='application/json')
+    assert response.status_code == 400
+
+def test_shorten_batch_returns_results_in_order(client):
+    """Test that a batch shortens valid URLs and fails only the bad entries."""
+    urls = ['https://www.example.com/batch/1', 'not a url', 'https://www.example.com/batch/2', 42]
+    response = client.post('/api/shorten/batch',
+                          data=json.dumps({'urls': urls}),
+                          content_type='application/json')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['created'] == 2
+    assert [result['status'] for result in data['results']] == [201, 400, 201, 400]
+    
+    first, second = data['results'][0], data['results'][2]
+    assert first['short_code'] != second['short_code']
+    assert first['short_url'].endswith(first['short_code'])
+    assert client.get(f"/{second['short_code']}").location == urls[2]
+    
+    for payload in ({'urls': []}, {'urls': 'https://www.example.com'}, {'url': 'x'}):
+        response = client.post('/api/shorten/batch',
+                              data=json.dumps(payload),
+                              content_type='application/json')
+        assert response.status_code == 400
+
+def test_shorten_batch_dedupe_mode(client, monkeypatch):
+    """Test that a batch reuses existing codes and repeats within itself."""
+    monkeypatch.setitem(app.config, 'DEDUPE_ENABLED', True)
+    
+    response = client.post('/api/shorten',
+                          data=json.dumps({'url': 'https://www.example.com/dedupe'}),
+                          content_type='application/json')
+    existing = response.get_json()['short_code']
+    
+    urls = ['https://www.example.com/new', 'HTTPS://WWW.Example.com/dedupe', 'https://www.example.com/new']
+    response = client.post('/api/shorten/batch',
+                          data=json.dumps({'urls': urls}),
+                          content_type='application/json')
+    results = response.get_json()['results']
+    assert [result['status'] for result in results] == [201, 200, 200]
+    assert results[1]['short_code'] == existing
+    assert results[2]['short_code'] == results[0]['short_code']
+    assert url_store.get_total_urls() == 2
+
+def test_shorten_canonicalizes_urls(client, monkeypatch):
+    """Test that equivalent spellings of a URL share one link."""
+    from app import main
+    from app.canonical import URLCanonicalizer
+    monkeypatch.setitem(app.config, 'DEDUPE_ENABLED', True)
+    monkeypatch.setattr(main, 'canonicalizer', URLCanonicalizer())
+    
+    response = client.post('/api/shorten',
+                          data=json.dumps({'url': 'http://www.example.com/b'}),
+                          content_type='application/json')
+    assert response.status_code == 201
+    short_code = response.get_json()['short_code']
+    
+    response = client.post('/api/shorten',
+                          data=json.dumps({'url': 'HTTP://WWW.Example.com:80/a/../b?utm_source=x'}),
+                          content_type='application/json')
+    assert response.status_code == 200
+    assert response.get_json()['short_code'] == short_code
+    assert url_store.get_total_urls() == 1
+    
+    # Case alone is folded by plain dedupe, so it is not a rewrite hit
+    for endpoint, body in (('/api/shorten', {'url': 'HTTP://WWW.EXAMPLE.COM/b'}),
+                           ('/api/shorten/batch', {'urls': ['HTTP://WWW.EXAMPLE.COM/b']})):
+        response = client.post(endpoint, data=json.dumps(body), content_type='application/json')
+        assert response.status_code == 200
+    
+    metrics = client.get('/api/metrics').get_json()['canonicalization']
+    assert metrics['rewritten'] == 3
+    assert metrics['dedupe_hits'] == 1
+
+def test_shorten_refuses_blocked_domains(client, monkeypatch):
+    """Test that blocked domains and their subdomains cannot be shortened."""
+    from app import main
+    from app.blocklist import DomainBlocklist
+    monkeypatch.setattr(main, 'blocklist', DomainBlocklist(['malware.example.com']))
+    
+    response = client.post('/api/shorten',
+                          data=json.dumps({'url': 'https://cdn.malware.example.com/payload'}),
+                          content_type='application/json')
+    assert response.status_code == 403
+    
+    response = client.post('/api/shorten',
+                          data=json.dumps({'url': 'https://www.example.com/safe'}),
+                          content_type='application/json')
+    assert response.status_code == 201
+    
+    metrics = client.get('/api/metrics').get_json()['blocklist']
+    assert metrics['lookups'] == 2
+    assert metrics['blocked'] == 1
+
+def test_disabled_link_returns_gone(client):
+    """Test that a disabled link answers 410 and does not count the click."""
+    response = client.post('/api/shorten',
+                          data=json.dumps({'url': 'https://www.example.com/disabled'}),
+                          content_type='application/json')
+    short_code = response.get_json()['short_code']
+    assert client.get(f'/{short_code}').status_code == 302
+    
+    assert url_store.disable_codes([short_code]) == 1
+    assert client.get(f'/{short_code}').status_code == 410
+    assert client.get(f'/api/stats/{short_code}').get_json()['clicks'] == 1
+
+def test_domain_links_endpoint(client):
+    """Test paging through the links on one host."""
+    codes = set()
+    for i in range(5):
+        # The fully qualified spelling indexes under the same host
+        host = 'hosted.example.com.' if i == 4 else 'hosted.example.com'
+        response = client.post('/api/shorten',
+                              data=json.dumps({'url': f'https://{host}/page/{i}'}),
+                              content_type='application/json')
+        codes.add(response.get_json()['short_code'])
+    client.get(f'/{sorted(codes)[0]}')
+    
+    seen = []
+    cursor = None
+    while True:
+        query = f'?limit=2&cursor={cursor}' if cursor else '?limit=2'
+        response = client.get(f'/api/domains/Hosted.Example.com./links{query}')
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data['host'] == 'hosted.example.com'
+        assert data['total_links'] == 5
+        assert data['total_clicks'] == 1
+        seen.extend(link['short_code'] for link in data['links'])
+        cursor = data['next_cursor']
+        if cursor is None:
+            break
+    assert sorted(seen) == sorted(codes)
+    
+    assert client.get('/api/domains/hosted.example.com/links?limit=0').status_code == 400
+    assert client.get('/api/domains/hosted.example.com/links?limit=5000').status_code == 400
+    data = client.get('/api/domains/unknown.example.com/links').get_json()
+    assert data['links'] == [] and data['total_links'] == 0
+
+def test_export_then_import_round_trip(client, monkeypatch):
+    """Test that an export re-imports into an empty store with codes and clicks intact."""
+    monkeypatch.setitem(app.config, 'BULK_CHUNK_SIZE', 2)
+    codes = []
+    for i in range(5):
+        response = client.post('/api/shorten',
+                              data=json.dumps({'url': f'https://www.example.com/export/{i}'}),
+                              content_type='application/json')
+        codes.append(response.get_json()['short_code'])
+    client.get(f'/{codes[1]}')
+    client.get(f'/{codes[1]}')
+    url_store.disable_codes([codes[3]])
+    
+    response = client.get('/api/export')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    lines = response.get_data(as_text=True).splitlines()
+    exported = {entry['short_code']: entry for entry in map(json.loads, lines)}
+    assert set(exported) == set(codes)
+    assert exported[codes[1]]['clicks'] == 2
+    
+    url_store.clear()
+    body = '\n'.join(lines + ['', '{"url": "https://www.example.com/fresh"}', 'not json',
+                              '{"url": "ftp://nope"}'])
+    response = client.post('/api/import', data=body, content_type='application/x-ndjson')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert (data['imported'], data['skipped'], data['failed']) == (6, 0, 2)
+    assert [error['line'] for error in data['errors']] == [8, 9]
+    
+    stats = client.get(f'/api/stats/{codes[1]}').get_json()
+    assert stats['clicks'] == 2
+    assert stats['created_at'] == exported[codes[1]]['created_at']
+    assert client.get(f'/{codes[3]}').status_code == 410
+    assert client.get(f'/{codes[0]}').location == 'https://www.example.com/export/0'
+    
+    # Importing the same export again only skips
+    data = client.post('/api/import', data='\n'.join(lines)).get_json()
+    assert (data['imported'], data['skipped'], data['failed']) == (0, 5, 0)
+    assert url_store.get_total_urls() == 6
+
+def test_import_checks_fields_and_urls_like_shorten(client, monkeypatch):
+    """Test that imports reject loosely typed fields, canonicalize, blocklist and clamp future times."""
+    from app import main
+    from app.blocklist import DomainBlocklist
+    from app.canonical import URLCanonicalizer
+    monkeypatch.setattr(main, 'canonicalizer', URLCanonicalizer())
+    monkeypatch.setattr(main, 'blocklist', DomainBlocklist(['malware.example.com']))
+    
+    lines = [
+        {'short_code': 'imp001', 'url': 'https://www.example.com/a', 'disabled': 'false'},
+        {'short_code': 'imp002', 'url': 'https://www.example.com/b', 'clicks': True},
+        {'short_code': 'imp003', 'url': 'https://cdn.malware.example.com/c'},
+        {'short_code': 'imp004', 'url': 'HTTPS://WWW.Example.com/d?utm_source=x', 'disabled': False},
+        {'short_code': 'imp005', 'url': 'https://www.example.com/e', 'created_at': '2999-01-01T00:00:00Z'},
+        {'short_code': 'imp006', 'url': 42},
+    ]
+    body = '\n'.join(json.dumps(line) for line in lines)
+    data = client.post('/api/import', data=body, content_type='application/x-ndjson').get_json()
+    assert (data['imported'], data['failed']) == (2, 4)
+    assert [error['line'] for error in data['errors']] == [1, 2, 6, 3]
+    assert data['errors'][3]['error'] == 'URL domain is blocked'
+    
+    assert client.get('/imp004').location == 'https://www.example.com/d'
+    created_at = client.get('/api/stats/imp005').get_json()['created_at']
+    assert created_at < '2999'
+    links_per_hour = client.get('/api/stats').get_json()['links_per_hour']
+    assert sum(bucket['count'] for bucket in links_per_hour) == 2
+
+def test_timeseries_endpoint(client):
+    """Test the click time series endpoint."""
+    response = client.post('/api/shorten',
+                          data=json.dumps({'url': 'https://www.example.com/history'}),
+                          content_type='application/json')
+    short_code = response.get_json()['short_code']
+    client.get(f'/{short_code}')
+    client.get(f'/{short_code}')
+    
+    response = client.get(f'/api/stats/{short_code}/timeseries?resolution=minute&limit=5')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['resolution'] == 'minute'
+    assert len(data['buckets']) == 5
+    assert sum(bucket['clicks'] for bucket in data['buckets']) == 2
+    
+    response = client.get(f'/api/stats/{short_code}/timeseries?resolution=day')
+    assert len(response.get_json()['buckets']) == 90
+    
+    assert client.get(f'/api/stats/{short_code}/timeseries?resolution=week').status_code == 400
+    assert client.get(f'/api/stats/{short_code}/timeseries?limit=0').status_code == 400
+    assert client.get('/api/stats/nonexistent/timeseries').status_code == 404
+
+def test_stats_unique_clicks(client):
+    """Test that stats report unique visitors by IP and user agent."""
+    response = client.post('/api/shorten',
+                          data=json.dumps({'url': 'https://www.example.com/unique'}),
+                          content_type='application/json')
+    short_code = response.get_json()['short_code']
+    
+    for agent in ('agent-a', 'agent-b', 'agent-a'):
+        client.get(f'/{short_code}', headers={'User-Agent': agent})
+    
+    data = client.get(f'/api/stats/{short_code}').get_json()
+    assert data['clicks'] == 3
+    assert data['unique_clicks'] == 2
+
+def test_breakdown_endpoint(client):
+    """Test clicks broken down by referrer host and user agent family."""
+    response = client.post('/api/shorten',
+                          data=json.dumps({'url': 'https://www.example.com/breakdown'}),
+                          content_type='application/json')
+    short_code = response.get_json()['short_code']
+    
+    firefox = 'Mozilla/5.0 (X11; Linux x86_64; rv:120.0) Gecko/20100101 Firefox/120.0'
+    client.get(f'/{short_code}', headers={'User-Agent': firefox,
+                                          'Referer': 'https://news.example.com/item?id=1'})
+    client.get(f'/{short_code}', headers={'User-Agent': firefox,
+                                          'Referer': 'https://news.example.com/'})
+    client.get(f'/{short_code}', headers={'User-Agent': 'curl/8.4.0'})
+    
+    response = client.get(f'/api/stats/{short_code}/breakdown')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['referrers']['top'] == [{'name': 'news.example.com', 'clicks': 2},
+                                        {'name': '(direct)', 'clicks': 1}]
+    assert data['user_agents']['top'] == [{'name': 'Firefox', 'clicks': 2},
+                                          {'name': 'curl', 'clicks': 1}]
+    assert data['referrers']['other'] == data['user_agents']['other'] == 0
+    
+    assert client.get('/api/stats/nonexistent/breakdown').status_code == 404
+
+def test_top_links_endpoint(client):
+    """Test the top links endpoint ranks links by clicks."""
+    codes = []
+    for i in range(3):
+        response = client.post('/api/shorten',
+                              data=json.dumps({'url': f'https://www.example.com/top{i}'}),
+                              content_type='application/json')
+        codes.append(response.get_json()['short_code'])
+    for clicks, short_code in zip((1, 3, 2), codes):
+        for _ in range(clicks):
+            client.get(f'/{short_code}')
+    
+    response = client.get('/api/stats/top?k=2&window=1m')
+    assert response.status_code == 200
+    links = response.get_json()['links']
+    assert [link['short_code'] for link in links] == [codes[1], codes[2]]
+    assert links[0]['clicks'] == 3
+    
+    assert client.get('/api/stats/top?window=1w').status_code == 400
+    assert client.get('/api/stats/top?k=0').status_code == 400
+
+def test_global_stats_endpoint(client):
+    """Test that global totals track links and clicks as they happen."""
+    data = client.get('/api/stats').get_json()
+    assert data['links'] == 0
+    assert data['clicks'] == 0
+    assert len(data['links_per_hour']) == 24
+    
+    for i in range(2):
+        response = client.post('/api/shorten',
+                              data=json.dumps({'url': f'https://www.example.com/total{i}'}),
+                              content_type='application/json')
+        short_code = response.get_json()['short_code']
+    for _ in range(3):
+        client.get(f'/{short_code}')
+    
+    data = client.get('/api/stats').get_json()
+    assert data['links'] == 2
+    assert data['clicks'] == 3
+    assert data['links_per_hour'][-1]['count'] + data['links_per_hour'][-2]['count'] == 2
+    assert sum(bucket['count'] for bucket in data['clicks_per_hour']) == 3
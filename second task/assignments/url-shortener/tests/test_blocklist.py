@@ -0,0 +1,94 @@
+import os
+import time
+
+from app.blocklist import BlocklistSweeper, DomainBlocklist, normalize_domain
+from app.models import ShardedURLStore, URLStore
+
+
+def test_normalize_domain():
+    """Test the accepted blocklist line formats."""
+    assert normalize_domain('Example.COM\n') == 'example.com'
+    assert normalize_domain('*.example.com  # phishing') == 'example.com'
+    assert normalize_domain('.example.com.') == 'example.com'
+    assert normalize_domain('# comment') is None
+    assert normalize_domain('   ') is None
+
+
+def test_blocklist_matches_domain_and_subdomains():
+    """Test that a listed domain blocks itself and everything below it."""
+    blocklist = DomainBlocklist(['bad.example', 'evil.co.uk'])
+    assert blocklist.match('bad.example') == 'bad.example'
+    assert blocklist.match('Login.Bad.Example.') == 'bad.example'
+    assert blocklist.match('a.b.evil.co.uk') == 'evil.co.uk'
+    assert blocklist.match('notbad.example') is None
+    assert blocklist.match('co.uk') is None
+    assert blocklist.match(None) is None
+
+    metrics = blocklist.get_metrics()
+    assert metrics['lookups'] == 6
+    assert metrics['blocked'] == 3
+    assert 0 < metrics['latency_ns']['p50'] <= metrics['latency_ns']['p99']
+
+
+def test_blocklist_reloads_changed_file(tmp_path):
+    """Test that the list follows its file and survives the file vanishing."""
+    path = tmp_path / 'blocklist.txt'
+    path.write_text('bad.example\n')
+    blocklist = DomainBlocklist(path=str(path))
+    assert blocklist.match('bad.example') == 'bad.example'
+    assert blocklist.reload() is False
+
+    path.write_text('worse.example\n')
+    os.utime(path, ns=(0, 10 ** 18))
+    assert blocklist.reload() is True
+    assert blocklist.match('bad.example') is None
+    assert blocklist.match('www.worse.example') == 'worse.example'
+
+    path.unlink()
+    assert blocklist.reload(force=True) is False
+    assert blocklist.match('worse.example') == 'worse.example'
+
+
+def test_blocklist_keeps_list_and_polling_on_undecodable_file(tmp_path):
+    """Test that a file that is not UTF-8 keeps the old list and the reload thread alive."""
+    path = tmp_path / 'blocklist.txt'
+    path.write_text('bad.example\n')
+    blocklist = DomainBlocklist(path=str(path), reload_interval=0.01)
+    blocklist.start()
+    try:
+        path.write_bytes(b'worse.example\n\xff\xfe\n')
+        os.utime(path, ns=(0, 10 ** 18))
+        assert blocklist.reload() is False
+        assert blocklist.match('bad.example') == 'bad.example'
+        assert blocklist._thread.is_alive()
+
+        path.write_text('worse.example\n')
+        os.utime(path, ns=(0, 2 * 10 ** 18))
+        deadline = time.monotonic() + 5
+        while blocklist.match('worse.example') is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert blocklist.match('worse.example') == 'worse.example'
+        assert blocklist.match('bad.example') is None
+    finally:
+        blocklist.stop()
+
+
+def test_sweeper_disables_links_on_new_domains():
+    """Test that newly blocked domains are swept out of existing links in chunks."""
+    for store in (URLStore(), ShardedURLStore(num_shards=4)):
+        store.add_url('keep01', 'https://www.example.com/a')
+        store.add_url('bad001', 'https://bad.example/a')
+        store.add_url('bad002', 'http://cdn.bad.example:8080/b')
+        store.add_url('late01', 'https://late.example/c')
+        sweeper = BlocklistSweeper(store, chunk_size=1)
+
+        blocklist = DomainBlocklist(['bad.example'], on_change=sweeper.submit)
+        sweeper.start()
+        blocklist.replace(['bad.example', 'late.example'])
+        sweeper.stop()
+
+        assert [store.resolve(code)[1] for code in ('keep01', 'bad001', 'bad002', 'late01')] == \
+            [False, True, True, True]
+        metrics = sweeper.get_metrics()
+        assert metrics['links_disabled'] == 3
+        assert 1 <= metrics['sweeps'] <= 2
@@ -0,0 +1,67 @@
+from app.breakdown import Breakdown, ClickBreakdowns
+from app.utils import classify_user_agent, referrer_host
+
+
+def test_breakdown_is_bounded_and_keeps_the_total():
+    """Test that one-off values fold into "other" without growing memory."""
+    breakdown = Breakdown(top_n=3)
+    for i in range(200):
+        breakdown.add('popular.example.com', 5)
+        breakdown.add('steady.example.com', 2)
+        breakdown.add(f'spam{i}.example.com')
+
+    assert len(breakdown.counts) <= 6
+    top, other = breakdown.top()
+    assert [name for name, _ in top[:2]] == ['popular.example.com', 'steady.example.com']
+    assert top[0][1] >= 1000
+    assert sum(count for _, count in top) + other == 1600
+
+
+def test_breakdown_spam_tail_does_not_displace_real_values():
+    """Test that many one-click values land in "other" instead of the top list."""
+    breakdown = Breakdown()
+    for i in range(15):
+        breakdown.add(f'real{i}.example.com', 20)
+    for i in range(500):
+        breakdown.add(f'spam{i}.example.com')
+
+    top, other = breakdown.top()
+    assert len(top) == 10
+    assert all(name.startswith('real') and clicks == 20 for name, clicks in top)
+    assert other == 5 * 20 + 500
+
+
+def test_click_breakdowns_defaults():
+    """Test that missing referrers and agents get their own buckets."""
+    breakdowns = ClickBreakdowns()
+    breakdowns.add(None, None)
+    data = breakdowns.to_dict()
+    assert data['referrers']['top'] == [{'name': '(direct)', 'clicks': 1}]
+    assert data['user_agents']['top'] == [{'name': 'unknown', 'clicks': 1}]
+
+
+def test_classify_user_agent():
+    """Test user agent families, including browsers that impersonate others."""
+    chrome = ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+              '(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
+    edge = chrome + ' Edg/120.0.0.0'
+    safari = ('Mozilla/5.0 (Macintosh; Intel Mac OS X 14_1) AppleWebKit/605.1.15 '
+              '(KHTML, like Gecko) Version/17.1 Safari/605.1.15')
+    assert classify_user_agent(chrome) == 'Chrome'
+    assert classify_user_agent(edge) == 'Edge'
+    assert classify_user_agent(safari) == 'Safari'
+    assert classify_user_agent('Googlebot/2.1 (+http://www.google.com/bot.html)') == 'bot'
+    assert classify_user_agent('python-requests/2.31.0') == 'python'
+    assert classify_user_agent('SomethingElse/1.0') == 'other'
+    assert classify_user_agent('') is None
+
+    hits = classify_user_agent.cache_info().hits
+    classify_user_agent(chrome)
+    assert classify_user_agent.cache_info().hits == hits + 1
+
+
+def test_referrer_host():
+    """Test that referrers are reduced to their host."""
+    assert referrer_host('https://News.Example.com:8443/a?b=c') == 'news.example.com'
+    assert referrer_host('') is None
+    assert referrer_host('not a url') is None
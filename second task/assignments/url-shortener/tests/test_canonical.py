@@ -0,0 +1,34 @@
+from app.canonical import URLCanonicalizer, remove_dot_segments
+
+
+def test_remove_dot_segments():
+    """Test RFC 3986 dot segment removal."""
+    assert remove_dot_segments('/a/b/c/./../../g') == '/a/g'
+    assert remove_dot_segments('/a/../b') == '/b'
+    assert remove_dot_segments('/a/./') == '/a/'
+    assert remove_dot_segments('/../..') == '/'
+    assert remove_dot_segments('/index.html') == '/index.html'
+
+
+def test_equivalent_urls_share_a_canonical_form():
+    """Test every rewrite rule and the per-rule counters."""
+    canonicalizer = URLCanonicalizer()
+    assert canonicalizer.canonicalize('HTTP://Example.com:80/a/../b?utm_source=x') == 'http://example.com/b'
+    assert canonicalizer.canonicalize('http://example.com/b') == 'http://example.com/b'
+    assert (canonicalizer.canonicalize('https://bücher.example/x?b=2&a=%2F&fbclid=9#top')
+            == 'https://xn--bcher-kva.example/x?a=%2F&b=2#top')
+    assert canonicalizer.canonicalize('https://example.com:8443') == 'https://example.com:8443/'
+
+    metrics = canonicalizer.get_metrics()
+    assert metrics['urls'] == 4
+    assert metrics['rewritten'] == 3
+    assert metrics['rules'] == {'case': 1, 'default_port': 1, 'dot_segments': 1,
+                                'query_order': 1, 'tracking_params': 2, 'idna': 1}
+
+
+def test_unparseable_urls_are_left_for_validation():
+    """Test that URLs the parser rejects come back unchanged."""
+    canonicalizer = URLCanonicalizer(strip_params=['ref'])
+    for url in ('not a url', 'http://[::1/', '', None):
+        assert canonicalizer.canonicalize(url) == url
+    assert canonicalizer.canonicalize('http://a.example/?ref=1&REF=2&q=1') == 'http://a.example/?q=1'
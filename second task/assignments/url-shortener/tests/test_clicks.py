@@ -0,0 +1,56 @@
+import threading
+import time
+from app.clicks import ClickPipeline
+from app.models import URLStore
+
+def test_click_pipeline_applies_buffered_clicks():
+    """Test that recorded clicks reach the store after a flush."""
+    store = URLStore()
+    store.add_url('abc123', 'https://example.com')
+    pipeline = ClickPipeline(store.apply_clicks)
+
+    for _ in range(5):
+        pipeline.record('abc123')
+    pipeline.record('missing')  # unknown codes are dropped by the store
+
+    assert store.get_stats('abc123')['clicks'] == 0
+    assert pipeline.flush() == 6
+    stats = store.get_stats('abc123')
+    assert stats['clicks'] == 5
+    assert stats['last_accessed'] is not None
+
+def test_click_pipeline_collects_from_many_threads():
+    """Test that per-thread buffers lose no clicks, including from exited threads."""
+    store = URLStore()
+    store.add_url('abc123', 'https://example.com')
+    pipeline = ClickPipeline(store.apply_clicks, flush_interval=0.001)
+    pipeline.start()
+
+    def worker():
+        for _ in range(500):
+            pipeline.record('abc123')
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    pipeline.stop()
+
+    assert store.get_stats('abc123')['clicks'] == 4000
+    assert pipeline.get_metrics()['thread_buffers'] <= 1
+
+def test_click_pipeline_flush_if_stale_respects_bound():
+    """Test that stale readers force a flush and fresh readers do not."""
+    store = URLStore()
+    store.add_url('abc123', 'https://example.com')
+    pipeline = ClickPipeline(store.apply_clicks, max_staleness=0.02)
+
+    pipeline.flush()
+    pipeline.record('abc123')
+    pipeline.flush_if_stale()
+    assert store.get_stats('abc123')['clicks'] == 0
+
+    time.sleep(0.03)
+    pipeline.flush_if_stale()
+    assert store.get_stats('abc123')['clicks'] == 1
@@ -0,0 +1,52 @@
+from app.hll import HyperLogLog, visitor_hash
+from app.models import ClickDetails, URLStore
+
+def test_hyperloglog_sparse_and_dense_estimates():
+    """Test that estimates stay close through the sparse to dense switch."""
+    sketch = HyperLogLog()
+    for i in range(500):
+        sketch.add(visitor_hash(f"10.0.{i // 256}.{i % 256}", 'test-agent'))
+        sketch.add(visitor_hash(f"10.0.{i // 256}.{i % 256}", 'test-agent'))  # repeat visit
+    assert sketch.is_sparse
+    assert abs(sketch.estimate() - 500) <= 15
+
+    for i in range(500, 20000):
+        sketch.add(visitor_hash(str(i), 'test-agent'))
+    assert not sketch.is_sparse
+    assert sketch.memory_bytes() == 4096
+    assert abs(sketch.estimate() - 20000) <= 20000 * 0.05
+
+def test_hyperloglog_copy_is_independent():
+    """Test that copies do not share registers with the original."""
+    sketch = HyperLogLog(precision=4)
+    sketch.add(visitor_hash('a'))
+    clone = sketch.copy()
+    for i in range(100):
+        clone.add(visitor_hash(str(i)))
+    assert sketch.estimate() == 1
+    assert clone.estimate() > 1
+
+def test_hyperloglog_merge_matches_union():
+    """Test that merging sketches, sparse or dense, estimates the union."""
+    for size in (50, 5000):
+        left, right, union = HyperLogLog(), HyperLogLog(), HyperLogLog()
+        for i in range(size):
+            left.add(visitor_hash('left', str(i)))
+            union.add(visitor_hash('left', str(i)))
+        for i in range(size // 2, size * 2):
+            right.add(visitor_hash('left', str(i)))
+            union.add(visitor_hash('left', str(i)))
+        left.merge(right)
+        assert left.estimate() == union.estimate()
+        assert right.estimate() < union.estimate()
+
+def test_store_counts_unique_visitors():
+    """Test that repeat visitors count as clicks but not as unique clicks."""
+    for store in (URLStore(), URLStore(per_thread_counters=True)):
+        store.add_url('abc123', 'https://example.com')
+        for visitor in ('alice', 'bob', 'alice', 'alice'):
+            store.increment_clicks('abc123', ClickDetails(visitor_hash(visitor)))
+        store.increment_clicks('abc123')  # no fingerprint available
+        stats = store.get_stats('abc123')
+        assert stats['clicks'] == 5
+        assert stats['unique_clicks'] == 2
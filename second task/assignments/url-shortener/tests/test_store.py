@@ -0,0 +1,599 @@
+from app.bloom import BloomFilter
+import sqlite3
+import sys
+import threading
+from datetime import datetime, timezone
+from app.models import ShardedURLStore, URLRecord, URLStore, format_timestamp, parse_timestamp
+from app.persistence import WriteAheadLog
+
+def test_bloom_filter_has_no_false_negatives():
+    """Test that every added key is reported as possibly present."""
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    keys = [f"code{i}" for i in range(1000)]
+    for key in keys:
+        bloom.add(key)
+
+    assert all(bloom.might_contain(key) for key in keys)
+
+    false_positives = sum(bloom.might_contain(f"other{i}") for i in range(10000))
+    assert false_positives < 300  # ~1% expected, generous bound
+
+def test_store_with_bloom_filter_short_circuits_misses():
+    """Test that a store with a Bloom filter rejects unknown codes."""
+    store = URLStore(bloom_filter=BloomFilter(capacity=100))
+    assert store.add_url('abc123', 'https://example.com')
+
+    assert store.might_contain('abc123')
+    assert store.get_url('abc123') == 'https://example.com'
+    assert store.get_stats('abc123')['url'] == 'https://example.com'
+    assert store.contains('abc123')
+
+    assert store.get_url('zzz999') is None
+    assert store.get_stats('zzz999') is None
+    assert not store.contains('zzz999')
+    assert not store.increment_clicks('zzz999')
+
+def test_store_clear_resets_bloom_filter():
+    """Test that clearing the store also clears its Bloom filter."""
+    store = URLStore(bloom_filter=BloomFilter(capacity=100))
+    store.add_url('abc123', 'https://example.com')
+    store.clear()
+
+    assert not store.might_contain('abc123')
+    assert store.get_url('abc123') is None
+    assert store.get_metrics()['bloom_filter']['items'] == 0
+
+def test_add_or_get_url_deduplicates_by_canonical_url():
+    """Test that a repeated canonical URL returns the existing code."""
+    store = URLStore()
+    assert store.add_or_get_url('abc123', 'https://example.com/a', 'https://example.com/a') == ('abc123', True)
+    assert store.add_or_get_url('def456', 'HTTPS://EXAMPLE.com/a', 'https://example.com/a') == ('abc123', False)
+    assert store.get_total_urls() == 1
+
+    # A taken code for a different URL is reported as a collision
+    assert store.add_or_get_url('abc123', 'https://example.com/b', 'https://example.com/b') == (None, False)
+
+    metrics = store.get_metrics()['dedupe_index']
+    assert metrics['entries'] == 1
+    assert metrics['memory_bytes'] > 0
+
+def test_dedupe_index_memory_counts_keys_in_both_stores():
+    """Test that both stores count dedupe keys not shared with a record's URL."""
+    single, sharded = URLStore(), ShardedURLStore(num_shards=1)
+    for store in (single, sharded):
+        store.add_or_get_url('abc123', 'https://example.com/a', 'https://example.com/a')
+        empty_keys = store.get_metrics()['dedupe_index']['memory_bytes']
+        store.add_or_get_url('def456', 'HTTPS://EXAMPLE.com/b', 'https://example.com/b')
+        assert store.get_metrics()['dedupe_index']['memory_bytes'] > empty_keys
+    assert single.get_metrics()['dedupe_index'] == sharded.get_metrics()['dedupe_index']
+
+    sharded.clear()
+    assert sharded.get_metrics()['dedupe_index']['memory_bytes'] == sys.getsizeof({})
+
+def test_sharded_store_matches_url_store_interface():
+    """Test that the sharded store behaves like the single-lock store."""
+    store = ShardedURLStore(num_shards=4)
+    for i in range(100):
+        assert store.add_url(f"code{i:03d}", f"https://example.com/{i}")
+    assert not store.add_url('code000', 'https://example.com/dup')
+
+    assert store.get_total_urls() == 100
+    assert store.get_url('code042') == 'https://example.com/42'
+    assert store.increment_clicks('code042')
+    assert store.get_stats('code042')['clicks'] == 1
+    assert store.get_url('missing') is None
+    assert len(store.get_existing_codes()) == 100
+
+    store.clear()
+    assert store.get_total_urls() == 0
+
+def test_sharded_store_concurrent_clicks():
+    """Test that concurrent click increments are not lost across shards."""
+    store = ShardedURLStore(num_shards=8)
+    codes = [f"code{i}" for i in range(16)]
+    for code in codes:
+        store.add_url(code, 'https://example.com')
+
+    def worker():
+        for _ in range(100):
+            for code in codes:
+                store.increment_clicks(code)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert all(store.get_stats(code)['clicks'] == 400 for code in codes)
+
+def test_per_thread_counters_merge_on_read():
+    """Test that per-thread click slots are summed into stats and scans."""
+    store = URLStore(per_thread_counters=True)
+    store.add_url('abc123', 'https://example.com')
+    assert not store.increment_clicks('missing')
+
+    def worker():
+        for _ in range(250):
+            store.increment_clicks('abc123')
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    store.increment_clicks('abc123')
+
+    stats = store.get_stats('abc123')
+    assert stats['clicks'] == 1001
+    assert stats['last_accessed'] is not None
+    assert [record.clicks for _, record in store.iter_records()] == [1001]
+    # Slots of the exited workers were folded into the record
+    assert store.get_metrics()['click_counters']['slots'] == 1
+
+    store.clear()
+    store.add_url('abc123', 'https://example.com')
+    assert store.get_stats('abc123')['clicks'] == 0
+
+def test_per_thread_counters_aggregate_details_and_fold_on_write(monkeypatch):
+    """Test that counter entries stay small and are folded by clicks, not only by reads."""
+    from app import models
+    from app.models import ClickCounters, ClickDetails
+    from app.hll import visitor_hash
+    minute = 60 * 1_000_000
+
+    counters = ClickCounters(fold_entries=3, fold_age=10 * minute)
+    for i in range(1000):
+        assert not counters.add('a', 5, ClickDetails(visitor_hash(str(i % 10)), 'ref.example', 'Chrome'))
+    [(clicks, _, visitors, referrals)] = counters.read('a')
+    assert clicks == 1000 and visitors.estimate() == 10
+    assert referrals == {('ref.example', 'Chrome'): 1000}
+
+    counters.add('b', 5)
+    counters.add('c', 5)
+    # The first click of a new minute closes every entry of the last one
+    assert counters.add('a', minute)
+    assert len(counters.drain()) == 3
+    assert not counters.add('b', minute)
+    counters = ClickCounters(fold_entries=100, fold_age=minute)
+    counters.add('a', 0)
+    assert not counters.add('a', minute)
+    assert counters.add('b', 2 * minute)
+
+    # A store folds as soon as a thread's backlog crosses the threshold
+    clock = [0]
+    monkeypatch.setattr(models, 'now_micros', lambda: clock[0])
+    store = URLStore(per_thread_counters=True)
+    store._counters.fold_entries = 8
+    codes = [f"code{i}" for i in range(20)]
+    for code in codes:
+        store.add_url(code, 'https://example.com')
+    for step in range(10):
+        clock[0] = step * minute
+        for code in codes:
+            store.increment_clicks(code, ClickDetails(visitor_hash(code), None, 'Chrome'))
+            assert store.get_metrics()['click_counters']['unfolded_entries'] < 8
+    stats = store.get_stats('code3')
+    assert (stats['clicks'], stats['unique_clicks']) == (10, 1)
+    assert store.get_breakdowns('code3')['user_agents']['top'] == [{'name': 'Chrome', 'clicks': 10}]
+
+def test_per_thread_counters_close_codes_that_are_not_clicked_again(monkeypatch):
+    """Test that a thread clicking many distinct codes keeps only its latest minute open."""
+    from app import models
+    from app.models import ClickDetails
+    minute = 60 * 1_000_000
+    clock = [0]
+    monkeypatch.setattr(models, 'now_micros', lambda: clock[0])
+    store = URLStore(per_thread_counters=True)
+    codes = [f"code{i}" for i in range(2000)]
+    store.add_urls([(code, 'https://example.com') for code in codes])
+    
+    for position, code in enumerate(codes):
+        clock[0] = position // 100 * minute
+        store.increment_clicks(code, ClickDetails(None, None, 'Chrome'))
+        assert store.get_metrics()['click_counters']['counters'] <= 100
+    assert store.get_totals()['clicks'] == 2000
+    assert store.get_stats('code0')['clicks'] == 1
+    
+    # Within one minute, the open entries are capped by count
+    store._counters.open_entries = 50
+    for code in codes:
+        store.increment_clicks(code, ClickDetails(None, None, 'Chrome'))
+        assert store.get_metrics()['click_counters']['counters'] <= 50
+    assert store.get_totals()['clicks'] == 4000
+    assert store.get_stats('code0')['clicks'] == 2
+
+def test_batch_adds_match_single_adds():
+    """Test that batch inserts report per-item outcomes in order."""
+    for store in (URLStore(), ShardedURLStore(num_shards=4)):
+        store.add_url('taken', 'https://example.com/old')
+        items = [(f"b{i}", f"https://example.com/{i}") for i in range(20)]
+        assert store.add_urls(items + [('taken', 'https://example.com/new')]) == [True] * 20 + [False]
+        assert store.get_url('b7') == 'https://example.com/7'
+        assert store.get_total_urls() == 21
+
+        store.add_or_get_url('d0', 'https://example.com/d', 'https://example.com/d')
+        results = store.add_or_get_urls([
+            ('d1', 'https://example.com/e', 'https://example.com/e'),
+            ('d2', 'https://example.com/d', 'https://example.com/d'),
+            ('d3', 'https://example.com/e', 'https://example.com/e'),
+            ('b0', 'https://example.com/f', 'https://example.com/f'),
+        ])
+        assert results == [('d1', True), ('d0', False), ('d1', False), (None, False)]
+        assert store.add_or_get_url('d9', 'https://example.com/e', 'https://example.com/e') == ('d1', False)
+
+def test_import_records_keeps_history_and_skips_taken_codes():
+    """Test that imported records keep their state and never overwrite links."""
+    for store in (URLStore(), ShardedURLStore(num_shards=4)):
+        store.add_or_get_url('old', 'https://example.com/a', 'https://example.com/a')
+        results = store.import_records([
+            ('old', URLRecord('https://example.com/z', 1_000_000)),
+            ('imp1', URLRecord('https://example.com/b', 2_000_000, clicks=7, last_accessed=3_000_000,
+                               canonical_url='https://example.com/b')),
+            ('imp2', URLRecord('https://example.com/a', 4_000_000, canonical_url='https://example.com/a',
+                               disabled=True)),
+        ])
+        assert results == [False, True, True]
+        assert store.get_url('old') == 'https://example.com/a'
+        stats = store.get_stats('imp1')
+        assert stats['clicks'] == 7
+        assert stats['created_at'] == format_timestamp(2_000_000)
+        assert store.resolve('imp2') == ('https://example.com/a', True)
+        assert store.get_totals()['clicks'] == 7
+        # Dedupe still resolves to the link that was there first
+        assert store.add_or_get_url('new', 'https://example.com/a', 'https://example.com/a') == ('old', False)
+        assert store.add_or_get_url('new', 'https://example.com/b', 'https://example.com/b') == ('imp1', False)
+
+def test_parse_timestamp_inverts_format_timestamp():
+    """Test that exported timestamps parse back to the same microsecond."""
+    for micros in (0, 1_700_000_000_123_456):
+        assert parse_timestamp(format_timestamp(micros)) == micros
+    assert parse_timestamp(None) is None
+    assert parse_timestamp('2024-01-01T00:00:00') == parse_timestamp('2024-01-01T00:00:00+00:00')
+
+def test_links_by_host_pages_through_every_link():
+    """Test that host listings chain cursors and report host-wide totals."""
+    for store in (URLStore(), URLStore(per_thread_counters=True), ShardedURLStore(num_shards=4)):
+        for i in range(7):
+            store.add_url(f"a{i}", f"https://example.com/{i}")
+        store.add_url('other', 'https://www.example.com/')
+        store.increment_clicks('a1')
+        store.increment_clicks('a1')
+        store.increment_clicks('a5')
+        store.increment_clicks('other')
+
+        codes = []
+        cursor = None
+        while True:
+            page = store.get_links_by_host('example.com', cursor, limit=3)
+            assert len(page['links']) <= 3
+            assert page['total_links'] == 7
+            assert page['total_clicks'] == 3
+            codes.extend(link['short_code'] for link in page['links'])
+            cursor = page['next_cursor']
+            if cursor is None:
+                break
+        assert sorted(codes) == [f"a{i}" for i in range(7)]
+
+        page = store.get_links_by_host('example.com', limit=10)
+        clicks = {link['short_code']: link['clicks'] for link in page['links']}
+        assert clicks['a1'] == 2 and clicks['a5'] == 1
+        assert page['next_cursor'] is None
+        assert store.get_links_by_host('missing.example', limit=10) == {
+            'links': [], 'next_cursor': None, 'total_links': 0, 'total_clicks': 0}
+        try:
+            store.get_links_by_host('example.com', 'bogus')
+            assert False, "malformed cursor accepted"
+        except ValueError:
+            pass
+
+def test_store_totals_are_maintained_on_write(tmp_path):
+    """Test that global totals follow adds, clicks, recovery and clear."""
+    for store in (URLStore(), URLStore(per_thread_counters=True), ShardedURLStore(num_shards=4)):
+        store.add_url('abc123', 'https://example.com/a')
+        store.add_url('def456', 'https://example.com/b')
+        store.increment_clicks('abc123')
+        store.increment_clicks('def456')
+        store.increment_clicks('def456')
+        totals = store.get_totals()
+        assert (totals['links'], totals['clicks']) == (2, 3)
+        assert sum(count for _, count in totals['links_per_hour']) == 2
+        assert sum(count for _, count in totals['clicks_per_hour']) == 3
+
+        store.clear()
+        assert (store.get_totals()['links'], store.get_totals()['clicks']) == (0, 0)
+
+    store, journal = _journaled_store(str(tmp_path))
+    store.add_url('abc123', 'https://example.com')
+    store.increment_clicks('abc123')
+    store.increment_clicks('abc123')
+    journal.stop()
+    recovered, journal = _journaled_store(str(tmp_path))
+    assert recovered.get_totals()['clicks'] == 2
+    journal.stop()
+
+def test_sharded_store_deduplicates_across_shards():
+    """Test that dedupe works regardless of which shard holds the code."""
+    store = ShardedURLStore(num_shards=4)
+    assert store.add_or_get_url('abc123', 'https://example.com', 'https://example.com') == ('abc123', True)
+    assert store.add_or_get_url('xyz789', 'https://example.com', 'https://example.com') == ('abc123', False)
+    assert store.get_total_urls() == 1
+
+def test_format_timestamp_matches_isoformat():
+    """Test that integer timestamps format exactly like datetime.isoformat()."""
+    moment = datetime(2024, 1, 1, 10, 0, 0, 123456, tzinfo=timezone.utc)
+    micros = int((moment - datetime(1970, 1, 1, tzinfo=timezone.utc)).total_seconds()) * 1_000_000 + 123456
+    assert format_timestamp(micros) == moment.isoformat()
+    assert format_timestamp(None) is None
+
+def test_url_record_stats_layout():
+    """Test that stats keep the same keys and value types as before, plus unique_clicks."""
+    store = URLStore()
+    store.add_url('abc123', 'https://example.com')
+    stats = store.get_stats('abc123')
+    assert set(stats) == {'url', 'clicks', 'unique_clicks', 'created_at', 'last_accessed'}
+    assert stats['last_accessed'] is None
+    assert datetime.fromisoformat(stats['created_at']).tzinfo is not None
+
+    store.increment_clicks('abc123')
+    stats = store.get_stats('abc123')
+    assert stats['clicks'] == 1
+    assert datetime.fromisoformat(stats['last_accessed']) >= datetime.fromisoformat(stats['created_at'])
+
+def test_url_record_has_no_instance_dict():
+    """Test that records are slotted."""
+    assert not hasattr(URLRecord('https://example.com', 0), '__dict__')
+
+def _journaled_store(directory, store_class=URLStore, **kwargs):
+    store = store_class()
+    journal = WriteAheadLog(str(directory), snapshot_interval=0, **kwargs)
+    journal.recover(store)
+    journal.start(store)
+    return store, journal
+
+def test_write_ahead_log_recovers_adds_and_clicks(tmp_path):
+    """Test that a restarted store recovers records and click counts from the log."""
+    store, journal = _journaled_store(tmp_path)
+    store.add_url('abc123', 'https://example.com/a')
+    store.add_or_get_url('def456', 'https://example.com/b', 'https://example.com/b')
+    for _ in range(3):
+        store.increment_clicks('abc123')
+    before = store.get_stats('abc123')
+    journal.stop()
+
+    recovered, journal = _journaled_store(tmp_path)
+    assert recovered.get_total_urls() == 2
+    assert recovered.get_stats('abc123') == before
+    # The dedupe index is rebuilt from the log as well
+    assert recovered.add_or_get_url('zzz999', 'https://example.com/b', 'https://example.com/b') == ('def456', False)
+    assert journal.get_metrics()['last_recovery']['log_entries'] == 5
+    journal.stop()
+
+def test_write_ahead_log_keeps_entries_after_a_failed_write(tmp_path):
+    """Test that a failed commit neither drops its entries nor reports them durable."""
+    class FailingFile:
+        def __init__(self, file):
+            self.file = file
+        def write(self, data):
+            self.file.write(data[:5])
+            raise OSError("disk full")
+        def __getattr__(self, name):
+            return getattr(self.file, name)
+
+    store, journal = _journaled_store(tmp_path, fsync_interval=60)
+    store.add_url('aaa111', 'https://example.com/a')
+    journal._commit()
+    durable = journal.get_metrics()['durable_lsn']
+
+    journal._file = FailingFile(journal._file)
+    store.add_url('bbb222', 'https://example.com/b')
+    try:
+        journal._commit()
+        assert False, "the failed write was not reported"
+    except OSError:
+        pass
+    assert journal.get_metrics()['durable_lsn'] == durable
+
+    store.add_url('ccc333', 'https://example.com/c')
+    journal._commit()
+    assert journal.get_metrics()['durable_lsn'] == durable + 2
+    journal.stop()
+
+    recovered, journal = _journaled_store(tmp_path)
+    assert [recovered.get_url(code) for code in ('aaa111', 'bbb222', 'ccc333')] == \
+        ['https://example.com/a', 'https://example.com/b', 'https://example.com/c']
+    journal.stop()
+
+def test_write_ahead_log_snapshot_plus_tail(tmp_path):
+    """Test recovery from a snapshot followed by writes made after it."""
+    store, journal = _journaled_store(tmp_path, store_class=ShardedURLStore)
+    for i in range(50):
+        store.add_url(f"code{i:02d}", f"https://example.com/{i}")
+    store.increment_clicks('code07')
+    assert journal.snapshot() == 50
+
+    store.add_url('late01', 'https://example.com/late')
+    store.increment_clicks('code07')
+    journal.stop()
+
+    segments = [name for name in tmp_path.iterdir() if name.name.startswith('wal-')]
+    assert len(segments) == 1  # pre-snapshot segments are removed
+
+    recovered, journal = _journaled_store(tmp_path, store_class=ShardedURLStore)
+    assert recovered.get_total_urls() == 51
+    assert recovered.get_stats('code07')['clicks'] == 2
+    assert recovered.get_url('late01') == 'https://example.com/late'
+    journal.stop()
+
+def test_write_ahead_log_sync_commit_is_durable_on_return(tmp_path):
+    """Test that sync commit only returns once the entry is on disk."""
+    store, journal = _journaled_store(tmp_path, sync_commit=True, fsync_interval=10)
+    store.add_url('abc123', 'https://example.com')
+    assert journal.get_metrics()['pending_entries'] == 0
+    assert journal.get_metrics()['entries_written'] == 1
+    journal.stop()
+
+def test_write_ahead_log_ignores_torn_tail(tmp_path):
+    """Test that a partially written final entry is skipped on recovery."""
+    store, journal = _journaled_store(tmp_path)
+    store.add_url('abc123', 'https://example.com')
+    journal.stop()
+
+    segment = sorted(p for p in tmp_path.iterdir() if p.name.startswith('wal-'))[-1]
+    with open(segment, 'a') as f:
+        f.write('A\tdef456\t1700000000')
+
+    recovered, journal = _journaled_store(tmp_path)
+    assert recovered.get_total_urls() == 1
+    journal.stop()
+
+def test_write_ahead_log_survives_unsafe_urls_and_malformed_entries(tmp_path):
+    """Test that control characters in fields and corrupt lines cannot block recovery."""
+    from app.utils import validate_url
+    assert not validate_url('http://example.com/a\n')
+
+    store, journal = _journaled_store(tmp_path)
+    store.add_url('abc123', 'http://example.com/a\n')
+    store.add_or_get_url('def456', 'http://example.com/b\tc\\d', 'http://example.com/b\r')
+    assert journal.snapshot() == 2
+    store.add_url('ghi789', 'http://example.com/e\n\t')
+    store.increment_clicks('ghi789')
+    journal.stop()
+
+    segment = sorted(p for p in tmp_path.iterdir() if p.name.startswith('wal-'))[-1]
+    with open(segment, 'a') as f:
+        f.write('A\tshort\n')
+        f.write('C\tghi789\tmany\t\n')
+
+    recovered, journal = _journaled_store(tmp_path)
+    assert recovered.get_url('abc123') == 'http://example.com/a\n'
+    assert recovered.get_url('def456') == 'http://example.com/b\tc\\d'
+    assert recovered.get_url('ghi789') == 'http://example.com/e\n\t'
+    assert recovered.get_stats('ghi789')['clicks'] == 1
+    assert recovered.add_or_get_url('x', 'http://example.com/b\r', 'http://example.com/b\r') == ('def456', False)
+    assert journal.get_metrics()['last_recovery']['skipped_entries'] == 2
+    journal.stop()
+
+def test_disabled_links_survive_snapshot_and_log_replay(tmp_path):
+    """Test that disabling links is journaled and recovered."""
+    store, journal = _journaled_store(tmp_path)
+    for code in ('abc123', 'def456', 'ghi789'):
+        store.add_url(code, f"https://example.com/{code}")
+    assert store.disable_codes(['abc123', 'missing']) == 1
+    assert store.disable_codes(['abc123']) == 0
+    assert store.resolve('abc123') == ('https://example.com/abc123', True)
+    assert store.resolve('def456') == ('https://example.com/def456', False)
+    assert store.resolve('missing') == (None, False)
+    journal.snapshot()
+    store.disable_codes(['def456'])
+    journal.stop()
+
+    recovered, journal = _journaled_store(tmp_path, store_class=ShardedURLStore)
+    assert recovered.resolve('abc123')[1] is True
+    assert recovered.resolve('def456')[1] is True
+    assert recovered.resolve('ghi789')[1] is False
+    journal.stop()
+
+def test_sqlite_store_matches_url_store_interface(tmp_path):
+    """Test the SQLite store against the URLStore interface."""
+    from app.sqlite_store import SQLiteURLStore
+    store = SQLiteURLStore(str(tmp_path / 'urls.db'), flush_interval=60)
+    try:
+        assert store.add_url('abc123', 'https://example.com')
+        assert not store.add_url('abc123', 'https://example.com/dup')
+        assert store.get_url('abc123') == 'https://example.com'
+        assert store.get_url('missing') is None
+        assert store.contains('abc123')
+        assert store.get_total_urls() == 1
+
+        # Clicks are buffered but visible to stats before the flush
+        assert store.increment_clicks('abc123')
+        assert store.increment_clicks('abc123')
+        assert not store.increment_clicks('missing')
+        stats = store.get_stats('abc123')
+        assert stats['clicks'] == 2
+        assert stats['last_accessed'] is not None
+
+        assert store.flush() == 1
+        assert store.get_stats('abc123')['clicks'] == 2
+
+        assert store.add_or_get_url('def456', 'https://example.com/b', 'https://example.com/b') == ('def456', True)
+        assert store.add_or_get_url('ghi789', 'https://example.com/b', 'https://example.com/b') == ('def456', False)
+        assert [code for code, _ in store.iter_records(chunk_size=1)] == ['abc123', 'def456']
+
+        assert store.disable_codes(['def456', 'missing']) == 1
+        assert store.resolve('def456') == ('https://example.com/b', True)
+        assert store.resolve('abc123') == ('https://example.com', False)
+        assert [record.disabled for _, record in store.iter_records()] == [False, True]
+
+        assert store.add_urls([('jkl012', 'https://other.example/c'), ('abc123', 'https://other.example/x')]) == [True, False]
+        assert store.add_or_get_urls([('mno345', 'https://example.com/b', 'https://example.com/b'),
+                                      ('pqr678', 'https://other.example/d', 'https://other.example/d')]) == [
+            ('def456', False), ('pqr678', True)]
+        assert store.get_total_urls() == 4
+
+        assert store.import_records([('abc123', URLRecord('https://other.example/y', 1)),
+                                     ('stu901', URLRecord('https://other.example/z', 1, clicks=4))]) == [False, True]
+        assert store.get_stats('stu901')['clicks'] == 4
+        assert store.get_totals()['clicks'] == 6
+
+        # Host listings count buffered clicks without flushing them
+        store.increment_clicks('def456')
+        store.increment_clicks('stu901')
+        flushes = store.get_metrics()['persistence']['click_buffer']['flushes']
+        page = store.get_links_by_host('example.com', limit=1)
+        assert [link['short_code'] for link in page['links']] == ['abc123']
+        assert (page['total_links'], page['total_clicks']) == (2, 3)
+        page = store.get_links_by_host('example.com', page['next_cursor'], limit=1)
+        assert [link['short_code'] for link in page['links']] == ['def456']
+        assert page['links'][0]['clicks'] == 1
+        assert page['next_cursor'] is None
+        assert store.get_links_by_host('other.example')['total_clicks'] == 5
+        assert store.get_metrics()['persistence']['click_buffer']['flushes'] == flushes
+    finally:
+        store.close()
+
+def test_sqlite_store_closes_connections_of_exited_threads(tmp_path):
+    """Test that a thread-per-request pattern does not accumulate connections."""
+    from app.sqlite_store import SQLiteURLStore
+    store = SQLiteURLStore(str(tmp_path / 'urls.db'), flush_interval=60)
+    try:
+        store.add_url('abc123', 'https://example.com')
+        opened = []
+        for _ in range(20):
+            thread = threading.Thread(target=lambda: opened.append(store._conn()))
+            thread.start()
+            thread.join()
+        # Each new thread's connection replaces the exited thread's one
+        assert len(store._connections) <= 3
+        try:
+            opened[0].execute('SELECT 1')
+            assert False, "connection of an exited thread is still open"
+        except sqlite3.ProgrammingError:
+            pass
+        assert store.get_url('abc123') == 'https://example.com'
+    finally:
+        store.close()
+
+def test_sqlite_store_concurrent_clicks_from_many_threads(tmp_path):
+    """Test that per-thread connections and batched clicks lose no updates."""
+    from app.sqlite_store import SQLiteURLStore
+    store = SQLiteURLStore(str(tmp_path / 'urls.db'), flush_interval=0.005)
+    try:
+        store.add_url('abc123', 'https://example.com')
+
+        def worker():
+            for _ in range(200):
+                store.increment_clicks('abc123')
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert store.get_stats('abc123')['clicks'] == 800
+        store.flush()
+        assert store.get_stats('abc123')['clicks'] == 800
+    finally:
+        store.close()
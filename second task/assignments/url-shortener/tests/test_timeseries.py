@@ -0,0 +1,42 @@
+from app.models import URLStore
+from app.timeseries import MINUTE_MICROS, BucketRing, ClickTimeSeries
+
+def test_bucket_ring_keeps_newest_buckets():
+    """Test that the ring rolls forward and drops buckets older than its size."""
+    ring = BucketRing(width=10, size=3)
+    ring.add(5)
+    ring.add(15, 2)
+    ring.add(25)
+    assert ring.buckets(now=25, limit=3) == [(0, 1), (10, 2), (20, 1)]
+
+    ring.add(45)  # skips bucket 30 and evicts 0 and 10
+    assert ring.buckets(now=45, limit=3) == [(20, 1), (30, 0), (40, 1)]
+
+    ring.add(5)  # too old to be kept
+    assert ring.buckets(now=45, limit=3) == [(20, 1), (30, 0), (40, 1)]
+    assert ring.buckets(now=95, limit=3) == [(70, 0), (80, 0), (90, 0)]
+
+def test_click_time_series_rolls_up_resolutions():
+    """Test that clicks appear at every resolution with bounded memory."""
+    history = ClickTimeSeries()
+    base = 1_700_000_000 * 1_000_000
+    for minute in range(120):
+        history.add(base + minute * MINUTE_MICROS)
+    now = base + 119 * MINUTE_MICROS
+
+    assert len(history.buckets('minute', now)) == 60
+    assert sum(clicks for _, clicks in history.buckets('minute', now)) == 60
+    assert sum(clicks for _, clicks in history.buckets('hour', now)) == 120
+    assert sum(clicks for _, clicks in history.buckets('day', now)) == 120
+    assert history.memory_bytes() == (60 + 48 + 90) * 4
+
+def test_store_timeseries_includes_per_thread_counters():
+    """Test that open per-thread counter entries show up in the history."""
+    for store in (URLStore(), URLStore(per_thread_counters=True)):
+        store.add_url('abc123', 'https://example.com')
+        assert sum(clicks for _, clicks in store.get_timeseries('abc123')) == 0
+        for _ in range(3):
+            store.increment_clicks('abc123')
+        assert sum(clicks for _, clicks in store.get_timeseries('abc123', 'hour')) == 3
+        assert store.get_stats('abc123')['clicks'] == 3
+        assert store.get_timeseries('missing') is None
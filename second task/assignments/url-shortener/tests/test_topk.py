@@ -0,0 +1,60 @@
+import random
+from collections import Counter
+from app.topk import SpaceSaving, TopLinks, WINDOWS
+
+def test_space_saving_tracks_heavy_hitters():
+    """Test that frequent keys are found with bounded overcounts."""
+    rng = random.Random(7)
+    stream = [f"hot{i}" for i in range(5) for _ in range(200)]
+    stream += [f"cold{rng.randrange(5000)}" for _ in range(5000)]
+    rng.shuffle(stream)
+
+    summary = SpaceSaving(capacity=50)
+    for key in stream:
+        summary.add(key)
+    truth = Counter(stream)
+
+    assert len(summary.counts) == 50
+    for i in range(5):
+        key = f"hot{i}"
+        assert key in summary.counts
+        assert truth[key] <= summary.counts[key] <= truth[key] + summary.errors[key]
+
+def test_top_links_windows_slide():
+    """Test that clicks leave a window once their sub-window expires."""
+    top_links = TopLinks(capacity=10)
+    width = WINDOWS['1m'][0] // WINDOWS['1m'][1]
+    now = 1_700_000_000 * 1_000_000
+    top_links.record('old', count=5, timestamp=now - WINDOWS['1m'][0] - width)
+    top_links.record('b', count=2, timestamp=now)
+    top_links.record('a', count=3, timestamp=now)
+    top_links.record_batch({'b': [4, now, []]})
+
+    def top(k, window):
+        return [(code, clicks) for code, clicks, _ in top_links.top(k, window, now=now)]
+
+    assert top(5, '1m') == [('b', 6), ('a', 3)]
+    assert top(3, '1h') == [('b', 6), ('old', 5), ('a', 3)]
+    assert top(5, '24h')[0] == ('b', 6)
+    assert [code for code, _, _ in top_links.top(5, '1m', keep=lambda code: code != 'b', now=now)] == ['a']
+
+def test_striped_top_links_match_a_single_stripe():
+    """Test that splitting links over stripes gives the same ranking when nothing is evicted."""
+    rng = random.Random(11)
+    now = 1_700_000_000 * 1_000_000
+    clicks = [(f"code{rng.randrange(40)}", rng.randrange(1, 5)) for _ in range(500)]
+    single = TopLinks(capacity=400)
+    striped = TopLinks(capacity=400, stripes=8)
+    for short_code, count in clicks[:250]:
+        single.record(short_code, count=count, timestamp=now)
+        striped.record(short_code, count=count, timestamp=now)
+    totals = {}
+    for short_code, count in clicks[250:]:
+        totals[short_code] = [totals.get(short_code, [0])[0] + count, now, []]
+    single.record_batch(totals)
+    striped.record_batch(totals)
+
+    # Ties may come out in a different order, so compare the counts
+    assert sorted(striped.top(40, '1h', now=now)) == sorted(single.top(40, '1h', now=now))
+    assert striped.get_metrics()['tracked_keys'] == single.get_metrics()['tracked_keys']
+    assert striped.get_metrics()['stripes'] == 8
@@ -0,0 +1,55 @@
+from app import utils
+from urllib.parse import urlparse
+from app.utils import check_url, url_host, validate_url
+
+
+def test_check_url_reasons():
+    """Test that rejections say why and valid URLs give no reason."""
+    assert check_url('https://www.example.com/path?q=1') is None
+    assert check_url('http://localhost:5000/') is None
+    assert check_url('') == "empty or not a string"
+    assert check_url(None) == "empty or not a string"
+    assert check_url('ftp://example.com/') == "not a valid http(s) URL"
+
+
+def test_validate_url_verdict_cache(monkeypatch):
+    """Test that cached verdicts match uncached ones and are bounded."""
+    monkeypatch.setattr(utils, '_cached_check_url', None)
+    urls = ['https://www.example.com/a', 'not a url', 'https://www.example.com/a', ['a list']]
+    expected = [validate_url(url) for url in urls]
+
+    utils.configure_url_cache(2)
+    assert [validate_url(url) for url in urls] == expected
+    info = utils.url_cache_info()
+    assert info['hits'] == 1 and info['misses'] == 2
+    validate_url('https://www.example.com/b')
+    assert utils.url_cache_info()['size'] == 2
+
+    utils.configure_url_cache(0)
+    assert utils.url_cache_info() == {"enabled": False}
+
+
+def test_validate_urls_in_order():
+    """Test that batch verdicts match validate_url, in input order."""
+    urls = ['https://www.example.com/a', 'not a url', '', 'http://localhost/x'] * 30
+    results = list(utils.validate_urls(iter(urls)))
+    assert [index for index, _, _ in results] == list(range(len(urls)))
+    assert [ok for _, ok, _ in results] == [validate_url(url) for url in urls]
+    assert results[1][2] == "not a valid http(s) URL"
+
+
+def test_validate_urls_process_pool():
+    """Test that fanning out to a process pool gives the same verdicts."""
+    urls = [f'https://www.example.com/{i}' if i % 7 else 'bad url' for i in range(500)]
+    serial = list(utils.validate_urls(urls))
+    assert list(utils.validate_urls(urls, processes=2, chunk_size=64)) == serial
+
+def test_url_host_fast_path_matches_urlparse():
+    """Test that hosts read without urlparse agree with urlparse's hostname."""
+    urls = ["https://Example.COM./a", "http://example.com:8080?q=1", "http://example.com#top",
+            "https://example.com", "http:///path", "HTTPS://Example.com/", "http://user:pw@Host.com/",
+            "http://[::1]:80/", "http://exa\tmple.com/", "http://example.com\n", "http://%41.com/",
+            "http://bücher.de/", "ftp://files.example.com/", "example.com/path"]
+    for url in urls:
+        hostname = urlparse(url).hostname
+        assert url_host(url) == ((hostname.rstrip('.') or None) if hostname else None), url